@@ -0,0 +1,380 @@
+"""Throughput and latency of every API route, with baselines to catch regressions.
+
+Seeds a store with --users users, --courses courses and --enrollments-per-user
+enrollments for each user, then drives the app in-process (no sockets, so runs
+are repeatable) route by route and through two mixed workloads:
+
+    browse      listings, lookups, stats and course rosters
+    enrollment  enrolling, completing and checking a user's enrollments
+
+Writes that consume records (deletes, deactivations, enrollments) act on rows
+prepared for them before the clock starts, so every request succeeds and the
+seeded data stays the same for the routes measured after them.
+
+    python -m benchmarks.endpoints --save baseline.json
+    python -m benchmarks.endpoints --baseline baseline.json --threshold 0.2
+
+With --baseline the run exits 1 when any scenario's throughput fell or its
+median latency rose by more than the threshold. The storage engine comes from
+the usual EDUTRACK_* variables.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import httpx
+from services.config import Settings
+from services.database import create_store, set_store
+from services.repository import Repository
+
+# (method, path, keyword arguments for httpx)
+Request = Tuple[str, str, dict]
+
+
+@dataclass
+class Context:
+    store: Repository
+    rng: random.Random
+    user_ids: List[int]
+    course_ids: List[int]
+    enrollment_ids: List[int]
+    # Records set aside for one scenario by its prepare step
+    prepared: List = field(default_factory=list)
+    counter: int = 0
+
+    def unique(self) -> int:
+        self.counter += 1
+        return self.counter
+
+
+@dataclass
+class Scenario:
+    name: str
+    build: Callable[[Context], Request]
+    expected: Sequence[int] = (200,)
+    # Share of --requests this scenario runs; whole-table exports are expensive
+    scale: float = 1.0
+    prepare: Optional[Callable[[Context, int], List]] = None
+
+
+def _users(ctx: Context, count: int) -> List[int]:
+    created = ctx.store.create_users([
+        (f"Bench {ctx.unique()}", f"bench-{ctx.unique()}@example.com") for _ in range(count)
+    ])
+    return [user["id"] for user in created]
+
+
+def _courses(ctx: Context, count: int) -> List[int]:
+    return [course["id"] for course in ctx.store.create_courses([("Bench", "Prepared")] * count)]
+
+
+def _enrollments(ctx: Context, count: int) -> List[int]:
+    course_id = ctx.rng.choice(ctx.course_ids)
+    created = ctx.store.create_enrollments([(user_id, course_id) for user_id in _users(ctx, count)], date.today())
+    return [enrollment["id"] for enrollment in created]
+
+
+def _pop(ctx: Context):
+    return ctx.prepared.pop()
+
+
+def _ndjson(rows: List[dict]) -> dict:
+    body = "".join(json.dumps(row) + "\n" for row in rows)
+    return {"content": body, "headers": {"content-type": "application/x-ndjson"}}
+
+
+def _new_user(ctx: Context) -> dict:
+    number = ctx.unique()
+    return {"name": f"New {number}", "email": f"new-{number}@example.com"}
+
+
+SCENARIOS = [
+    # users.py
+    Scenario("users.create", lambda ctx: ("POST", "/api/users/", {"json": _new_user(ctx)}), (201,)),
+    Scenario("users.list", lambda ctx: ("GET", "/api/users/", {"params": {"limit": 50}})),
+    Scenario("users.search_name", lambda ctx: (
+        "GET", "/api/users/search", {"params": {"name": f"user {ctx.rng.randrange(1000)}", "limit": 50}}
+    )),
+    Scenario("users.search_domain", lambda ctx: (
+        "GET", "/api/users/search", {"params": {"domain": "example.com", "limit": 50}}
+    )),
+    Scenario("users.list_active", lambda ctx: ("GET", "/api/users/", {"params": {"limit": 50, "is_active": True}})),
+    Scenario("users.get", lambda ctx: ("GET", f"/api/users/{ctx.rng.choice(ctx.user_ids)}", {})),
+    Scenario("users.batch_get", lambda ctx: (
+        "POST", "/api/users/batch-get", {"json": {"ids": ctx.rng.sample(ctx.user_ids, 100)}}
+    ), scale=0.2),
+    Scenario("users.update", lambda ctx: (
+        "PUT", f"/api/users/{ctx.rng.choice(ctx.user_ids)}", {"json": {"name": f"Renamed {ctx.unique()}"}}
+    )),
+    Scenario("users.deactivate", lambda ctx: ("PATCH", f"/api/users/{_pop(ctx)}/deactivate", {}), prepare=_users),
+    Scenario("users.delete", lambda ctx: ("DELETE", f"/api/users/{_pop(ctx)}", {}), (204,), prepare=_users),
+    Scenario("users.import", lambda ctx: (
+        "POST", "/api/users/import", _ndjson([_new_user(ctx) for _ in range(100)])
+    ), scale=0.05),
+    Scenario("users.export", lambda ctx: ("GET", "/api/users/export", {}), scale=0.01),
+    # courses.py
+    Scenario("courses.create", lambda ctx: (
+        "POST", "/api/courses/", {"json": {"title": f"Course {ctx.unique()}", "description": "New"}}
+    ), (201,)),
+    Scenario("courses.list", lambda ctx: ("GET", "/api/courses/", {"params": {"limit": 50}})),
+    Scenario("courses.list_open", lambda ctx: ("GET", "/api/courses/", {"params": {"limit": 50, "is_open": True}})),
+    Scenario("courses.get", lambda ctx: ("GET", f"/api/courses/{ctx.rng.choice(ctx.course_ids)}", {})),
+    Scenario("courses.batch_get", lambda ctx: (
+        "POST", "/api/courses/batch-get", {"json": {"ids": ctx.rng.sample(ctx.course_ids, 50)}}
+    ), scale=0.2),
+    Scenario("courses.update", lambda ctx: (
+        "PUT", f"/api/courses/{ctx.rng.choice(ctx.course_ids)}", {"json": {"description": f"Rev {ctx.unique()}"}}
+    )),
+    Scenario("courses.close", lambda ctx: ("PATCH", f"/api/courses/{_pop(ctx)}/close", {}), prepare=_courses),
+    Scenario("courses.delete", lambda ctx: ("DELETE", f"/api/courses/{_pop(ctx)}", {}), (204,), prepare=_courses),
+    Scenario("courses.search", lambda ctx: (
+        "GET", "/api/courses/search", {"params": {"q": f"seeded {ctx.rng.randrange(10)}"}}
+    )),
+    Scenario("courses.stats", lambda ctx: ("GET", f"/api/courses/{ctx.rng.choice(ctx.course_ids)}/stats", {})),
+    Scenario("courses.stats_list", lambda ctx: ("GET", "/api/courses/stats", {"params": {"limit": 50}})),
+    Scenario("courses.enrollments", lambda ctx: (
+        "GET", f"/api/courses/{ctx.rng.choice(ctx.course_ids)}/enrollments", {}
+    ), scale=0.2),
+    Scenario("courses.enrollments_expanded", lambda ctx: (
+        "GET", f"/api/courses/{ctx.rng.choice(ctx.course_ids)}/enrollments", {"params": {"expand": "enrollment"}}
+    ), scale=0.2),
+    Scenario("courses.import", lambda ctx: (
+        "POST", "/api/courses/import",
+        _ndjson([{"title": f"Imported {ctx.unique()}", "description": "Bulk"} for _ in range(100)]),
+    ), scale=0.05),
+    Scenario("courses.export", lambda ctx: ("GET", "/api/courses/export", {}), scale=0.05),
+    # enrollments.py
+    Scenario("enrollments.create", lambda ctx: (
+        "POST", "/api/enrollments/", {"json": {"user_id": _pop(ctx), "course_id": ctx.rng.choice(ctx.course_ids)}}
+    ), (201,), prepare=_users),
+    Scenario("enrollments.bulk", lambda ctx: (
+        "POST", "/api/enrollments/bulk",
+        {"json": {"items": [
+            {"user_id": _pop(ctx), "course_id": ctx.rng.choice(ctx.course_ids)} for _ in range(100)
+        ]}},
+    ), scale=0.05, prepare=lambda ctx, count: _users(ctx, count * 100)),
+    Scenario("enrollments.list", lambda ctx: ("GET", "/api/enrollments/", {"params": {"limit": 50}})),
+    Scenario("enrollments.list_completed", lambda ctx: (
+        "GET", "/api/enrollments/", {"params": {"limit": 50, "completed": True}}
+    )),
+    Scenario("enrollments.list_expanded", lambda ctx: (
+        "GET", "/api/enrollments/", {"params": {"limit": 50, "expand": "user,course"}}
+    )),
+    Scenario("enrollments.get", lambda ctx: ("GET", f"/api/enrollments/{ctx.rng.choice(ctx.enrollment_ids)}", {})),
+    Scenario("enrollments.batch_get", lambda ctx: (
+        "POST", "/api/enrollments/batch-get", {"json": {"ids": ctx.rng.sample(ctx.enrollment_ids, 100)}}
+    ), scale=0.2),
+    Scenario("enrollments.for_user", lambda ctx: (
+        "GET", f"/api/enrollments/user/{ctx.rng.choice(ctx.user_ids)}", {}
+    )),
+    Scenario("enrollments.complete", lambda ctx: (
+        "PATCH", f"/api/enrollments/{ctx.rng.choice(ctx.enrollment_ids)}/complete", {}
+    )),
+    Scenario("enrollments.delete", lambda ctx: (
+        "DELETE", f"/api/enrollments/{_pop(ctx)}", {}
+    ), (204,), prepare=_enrollments),
+]
+
+BY_NAME = {scenario.name: scenario for scenario in SCENARIOS}
+
+# Weighted scenario names; each request of a mix picks one at random. Prepared
+# records are a single pool, so at most one scenario per mix may prepare
+MIXES = {
+    "browse": [
+        ("courses.list_open", 25), ("courses.get", 20), ("users.get", 20), ("courses.stats", 15),
+        ("users.list", 10), ("courses.enrollments", 5), ("enrollments.for_user", 5),
+    ],
+    "enrollment": [
+        ("enrollments.create", 20), ("enrollments.complete", 20), ("enrollments.for_user", 30),
+        ("courses.get", 20), ("courses.stats", 10),
+    ],
+}
+
+
+def seed(store: Repository, users: int, courses: int, per_user: int, rng: random.Random) -> Context:
+    course_ids = [course["id"] for course in store.create_courses([
+        (f"Course {i}", f"Seeded course {i}") for i in range(courses)
+    ])]
+    user_ids = [user["id"] for user in store.create_users([
+        (f"User {i}", f"user{i}@example.com") for i in range(users)
+    ])]
+    pairs = [
+        (user_id, course_id)
+        for user_id in user_ids
+        for course_id in rng.sample(course_ids, min(per_user, len(course_ids)))
+    ]
+    enrollment_ids = []
+    for start in range(0, len(pairs), 10000):
+        created = store.create_enrollments(pairs[start:start + 10000], date(2025, 9, 1))
+        enrollment_ids.extend(enrollment["id"] for enrollment in created)
+    # Some finished courses, so completed filters have rows to find
+    for enrollment_id in rng.sample(enrollment_ids, len(enrollment_ids) // 4):
+        store.update_enrollment(enrollment_id, {"completed": True})
+    return Context(store, rng, user_ids, course_ids, enrollment_ids)
+
+
+async def drive(
+    client: httpx.AsyncClient, ctx: Context, pick: Callable[[], Scenario], requests: int, concurrency: int
+) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            scenario = pick()
+            method, path, kwargs = scenario.build(ctx)
+            started = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            await response.aread()
+            latencies.append(time.perf_counter() - started)
+            errors += response.status_code not in scenario.expected
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def percentile(share: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * share))] * 1000
+
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "errors": errors,
+    }
+
+
+async def run(ctx: Context, names: List[str], requests: int, concurrency: int) -> Dict[str, dict]:
+    from main import app
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in names:
+            if name.startswith("mix:"):
+                weighted = MIXES[name[4:]]
+                scenarios = [BY_NAME[scenario] for scenario, _ in weighted]
+                weights = [weight for _, weight in weighted]
+                count = requests
+                for scenario in scenarios:
+                    if scenario.prepare is not None:
+                        ctx.prepared = scenario.prepare(ctx, count)
+                pick = lambda: ctx.rng.choices(scenarios, weights)[0]
+            else:
+                scenario = BY_NAME[name]
+                count = max(1, int(requests * scenario.scale))
+                if scenario.prepare is not None:
+                    ctx.prepared = scenario.prepare(ctx, count)
+                pick = lambda scenario=scenario: scenario
+            results[name] = await drive(client, ctx, pick, count, concurrency)
+            print(format_row(name, results[name]), flush=True)
+    return results
+
+
+def format_row(name: str, result: dict, note: str = "") -> str:
+    return (
+        f"{name:<28} {result['requests']:>8} {result['rps']:>9.0f} {result['p50_ms']:>8.2f} "
+        f"{result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['errors']:>6} {note}"
+    ).rstrip()
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Names of scenarios slower than the baseline by more than `threshold`"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        slower = result["p50_ms"] > before["p50_ms"] * (1 + threshold)
+        fewer = result["rps"] < before["rps"] * (1 - threshold)
+        if slower or fewer:
+            regressions.append(
+                f"{name}: {before['rps']:.0f} -> {result['rps']:.0f} rps, "
+                f"p50 {before['p50_ms']:.2f} -> {result['p50_ms']:.2f} ms"
+            )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--enrollments-per-user", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--only", help="comma-separated scenario names or prefixes, e.g. users,mix:browse")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against results saved earlier with --save")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, as a fraction")
+    args = parser.parse_args(argv)
+
+    names = [scenario.name for scenario in SCENARIOS] + [f"mix:{mix}" for mix in MIXES]
+    if args.only:
+        prefixes = args.only.split(",")
+        names = [name for name in names if any(name.startswith(prefix) for prefix in prefixes)]
+
+    config = Settings.from_env()
+    with tempfile.TemporaryDirectory() as directory:
+        if "EDUTRACK_SQLITE_PATH" not in os.environ:
+            config.sqlite_path = os.path.join(directory, "endpoints.db")
+        store = create_store(config)
+        set_store(store)
+        try:
+            ctx = seed(store, args.users, args.courses, args.enrollments_per_user, random.Random(args.seed))
+            print(f"{'scenario':<28} {'requests':>8} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+            results = asyncio.run(run(ctx, names, args.requests, args.concurrency))
+        finally:
+            store.close()
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "storage": config.storage,
+            "users": args.users,
+            "courses": args.courses,
+            "enrollments_per_user": args.enrollments_per_user,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w") as output:
+            json.dump(report, output, indent=2)
+
+    errors = sum(result["errors"] for result in results.values())
+    if errors:
+        print(f"{errors} requests returned an unexpected status")
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as saved:
+        baseline = json.load(saved)
+    settings_changed = [
+        key for key, value in report["meta"].items()
+        if key not in ("created", "requests") and baseline["meta"].get(key) != value
+    ]
+    if settings_changed:
+        print("note: the baseline was recorded with different " + ", ".join(settings_changed))
+    regressions = compare(results, baseline["results"], args.threshold)
+    for line in regressions:
+        print("REGRESSION", line)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,166 @@
+"""Latency and throughput of sync versus async route handlers under concurrency.
+
+Starts uvicorn with two apps whose handlers have identical bodies, one written
+as `def` (run in the threadpool) and one as `async def` (run on the event
+loop through AsyncRepository), and drives each with many concurrent HTTP
+clients: 80% GET /users/{id}, 20% GET /users?limit=50.
+
+    python -m benchmarks.load --concurrency 50,200 --requests 20000
+    EDUTRACK_STORAGE=sqlite python -m benchmarks.load
+
+The storage engine comes from the usual EDUTRACK_* variables; the apps seed
+their own data.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+import httpx
+from fastapi import FastAPI, HTTPException
+from schemas import User
+from services.async_store import AsyncRepository
+from services.config import Settings
+from services.database import create_store
+from services.serialization import EncodedJSONResponse, encode_list, encode_record
+
+USERS = 10000
+
+
+def _seeded_store():
+    store = create_store(Settings.from_env())
+    if not store.list_users(limit=1)[0]:
+        store.create_users([(f"User {i}", f"user{i}@example.com") for i in range(USERS)])
+    return store
+
+
+def sync_app() -> FastAPI:
+    store = _seeded_store()
+    app = FastAPI()
+
+    @app.get("/users/{user_id}")
+    def get_user(user_id: int):
+        user = store.get_user(user_id)
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return EncodedJSONResponse(encode_record(User, user))
+
+    @app.get("/users")
+    def list_users(limit: int = 100):
+        users, _ = store.list_users(0, limit)
+        return EncodedJSONResponse(encode_list(User, users))
+
+    return app
+
+
+def async_app() -> FastAPI:
+    store = AsyncRepository(_seeded_store())
+    app = FastAPI()
+
+    @app.get("/users/{user_id}")
+    async def get_user(user_id: int):
+        user = await store.get_user(user_id)
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return EncodedJSONResponse(encode_record(User, user))
+
+    @app.get("/users")
+    async def list_users(limit: int = 100):
+        users, _ = await store.list_users(0, limit)
+        return EncodedJSONResponse(encode_list(User, users))
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_server(factory: str, port: int, env: dict) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"benchmarks.load:{factory}", "--factory",
+         "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/users/1").status_code == 200:
+                return server
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f"{factory} did not start")
+
+
+async def drive(port: int, concurrency: int, requests: int) -> dict:
+    rng = random.Random(0)
+    paths = [
+        f"/users/{rng.randrange(1, USERS + 1)}" if rng.random() < 0.8 else "/users?limit=50"
+        for _ in range(requests)
+    ]
+    latencies: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        queue = iter(paths)
+
+        async def worker():
+            nonlocal errors
+            for path in queue:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                except httpx.TransportError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p99": latencies[int(len(latencies) * 0.99)] * 1000,
+        "errors": errors,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="10,50,200")
+    parser.add_argument("--requests", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    print(f"{'handlers':>8} {'clients':>8} {'rps':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, EDUTRACK_SEED_SAMPLE_DATA="false")
+        env.setdefault("EDUTRACK_SQLITE_PATH", os.path.join(directory, "load.db"))
+        for factory in ("sync_app", "async_app"):
+            port = _free_port()
+            server = start_server(factory, port, env)
+            try:
+                for concurrency in (int(value) for value in args.concurrency.split(",")):
+                    result = asyncio.run(drive(port, concurrency, args.requests))
+                    print(
+                        f"{factory[:-4]:>8} {concurrency:>8} {result['rps']:>8.0f} "
+                        f"{result['p50']:>8.2f} {result['p99']:>8.2f} {result['errors']:>7}"
+                    )
+            finally:
+                server.terminate()
+                server.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
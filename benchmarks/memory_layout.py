@@ -0,0 +1,67 @@
+"""Memory footprint of the in-memory engine's dict and compact layouts.
+
+Seeds each layout with the same data and reports traced allocations, in total
+and per enrollment (records plus every index).
+
+    python -m benchmarks.memory_layout --users 20000 --courses 500 --enrollments-per-user 10
+"""
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+from datetime import date, timedelta
+from services.memory_store import InMemoryRepository
+
+
+def seed(store: InMemoryRepository, users: int, courses: int, per_user: int) -> int:
+    rng = random.Random(0)
+    course_ids = [store.create_course(f"Course {i}", "Benchmark course")["id"] for i in range(courses)]
+    start = date(2025, 9, 1)
+    created = 0
+    for i in range(users):
+        user_id = store.create_user(f"User {i}", f"user{i}@example.com")["id"]
+        pairs = [(user_id, course_id) for course_id in rng.sample(course_ids, per_user)]
+        for enrollment in store.create_enrollments(pairs, start + timedelta(days=i % 30)):
+            created += 1
+            if rng.random() < 0.3:
+                store.update_enrollment(enrollment["id"], {"completed": True})
+    return created
+
+
+def measure(compact: bool, users: int, courses: int, per_user: int) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    store = InMemoryRepository(compact=compact)
+    enrollments = seed(store, users, courses, per_user)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del store
+    return {"layout": "compact" if compact else "dict", "bytes": used, "enrollments": enrollments}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--courses", type=int, default=500)
+    parser.add_argument("--enrollments-per-user", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    results = [
+        measure(compact, args.users, args.courses, args.enrollments_per_user)
+        for compact in (False, True)
+    ]
+    print(f"{'layout':>8} {'MiB':>8} {'bytes/enrollment':>17}")
+    for result in results:
+        print(
+            f"{result['layout']:>8} {result['bytes'] / 2**20:>8.1f} "
+            f"{result['bytes'] / result['enrollments']:>17.0f}"
+        )
+    print(f"compact uses {results[1]['bytes'] / results[0]['bytes']:.0%} of the dict layout")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
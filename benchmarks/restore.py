@@ -0,0 +1,73 @@
+"""Restart time of the durable memory engine against dataset size.
+
+For each size, writes users, courses and enrollments (one enrollment per
+user-course draw), snapshots, appends a log tail of updates, then times a
+fresh start: snapshot load plus tail replay.
+
+    python -m benchmarks.restore --sizes 100000,1000000 --tail 10000
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from services.persistence import SNAPSHOT_FILE, PersistentMemoryRepository
+
+
+def build(directory: str, records: int, tail: int, compact: bool) -> None:
+    """Create `records` enrollments over records/4 users and records/1000 courses"""
+    rng = random.Random(0)
+    store = PersistentMemoryRepository(directory, fsync="never", snapshot_interval=0, compact=compact)
+    users = max(1, records // 4)
+    courses = max(4, records // 1000)
+    user_ids = [user["id"] for user in store.create_users(
+        [(f"User {i}", f"user{i}@example.com") for i in range(users)]
+    )]
+    course_ids = [course["id"] for course in store.create_courses(
+        [(f"Course {i}", "Benchmark course") for i in range(courses)]
+    )]
+    start = date(2025, 9, 1)
+    per_user = records // users
+    for i, user_id in enumerate(user_ids):
+        pairs = [(user_id, course_id) for course_id in rng.sample(course_ids, per_user)]
+        store.create_enrollments(pairs, start + timedelta(days=i % 30))
+    store.snapshot()
+    enrollment_count = len(store.enrollments_db)
+    for _ in range(tail):
+        store.update_enrollment(rng.randrange(1, enrollment_count + 1), {"completed": True})
+    # Stop without the shutdown snapshot, so the tail stays in the log
+    store.log.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="enrollment counts")
+    parser.add_argument("--tail", type=int, default=10000, help="log entries after the snapshot")
+    parser.add_argument("--compact", action="store_true", help="use the compact record layout")
+    args = parser.parse_args(argv)
+
+    print(f"{'enrollments':>12} {'records':>10} {'snapshot MiB':>13} {'restore s':>10} {'records/s':>11}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        directory = tempfile.mkdtemp(prefix="edutrack-restore-")
+        try:
+            build(directory, size, args.tail, args.compact)
+            snapshot_bytes = os.path.getsize(os.path.join(directory, SNAPSHOT_FILE))
+            started = time.perf_counter()
+            store = PersistentMemoryRepository(directory, snapshot_interval=0, compact=args.compact)
+            seconds = time.perf_counter() - started
+            records = len(store.users_db) + len(store.courses_db) + len(store.enrollments_db)
+            store.log.close()
+            print(
+                f"{size:>12} {records:>10} {snapshot_bytes / 2**20:>13.1f} "
+                f"{seconds:>10.3f} {records / seconds:>11.0f}"
+            )
+        finally:
+            shutil.rmtree(directory)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""Latency of course search over a large synthetic catalog.
+
+Loads courses whose titles and descriptions draw words from a skewed
+vocabulary, so some words occur in most courses and others in a handful.
+Reports the time to build the index and per-query latency for rare, common,
+multi-word and prefix queries, plus the cost of keeping the index current.
+
+    python -m benchmarks.search --courses 1000000
+    python -m benchmarks.search --courses 200000 --engine sqlite
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, List
+from services.memory_store import InMemoryRepository
+from services.repository import Repository
+from services.sqlite_store import SQLiteRepository
+
+VOCABULARY_SIZE = 20000
+QUERIES = {
+    "rare word": lambda rng, words: words[rng.randrange(5000, VOCABULARY_SIZE)],
+    "common word": lambda rng, words: words[rng.randrange(0, 10)],
+    "two words": lambda rng, words: f"{words[rng.randrange(0, 50)]} {words[rng.randrange(50, 500)]}",
+    "prefix": lambda rng, words: words[rng.randrange(0, 2000)][:3],
+}
+
+
+def make_words() -> List[str]:
+    rng = random.Random(0)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    return sorted(words, key=lambda word: (hash(word) & 0xFFFF, word))
+
+
+def make_courses(count: int, words: List[str]):
+    rng = random.Random(1)
+    # Word frequency falls off roughly as 1/rank
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    for _ in range(count):
+        yield (
+            " ".join(rng.choices(words, cum_weights=cumulative, k=rng.randint(2, 5))).title(),
+            " ".join(rng.choices(words, cum_weights=cumulative, k=rng.randint(10, 30))),
+        )
+
+
+def load(store: Repository, count: int, words: List[str]) -> None:
+    courses = list(make_courses(count, words))
+    if isinstance(store, InMemoryRepository):
+        ids = list(range(1, count + 1))
+        titles, descriptions = zip(*courses)
+        store.bulk_load(((), (), (), ()), (ids, titles, descriptions, [True] * count), ((), (), (), (), ()))
+        store.advance_ids(1, count + 1, 1)
+    else:
+        for start in range(0, count, 10000):
+            store.create_courses(courses[start:start + 10000])
+
+
+def timed(call: Callable) -> float:
+    started = time.perf_counter()
+    call()
+    return (time.perf_counter() - started) * 1000
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=200, help="Queries per kind")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--engine", choices=("memory", "sqlite"), default="memory")
+    args = parser.parse_args(argv)
+
+    words = make_words()
+    directory = tempfile.mkdtemp()
+    if args.engine == "memory":
+        store = InMemoryRepository(compact=True)
+    else:
+        store = SQLiteRepository(os.path.join(directory, "search.db"))
+
+    print(f"loading {args.courses} courses ...")
+    print(f"loaded in {timed(lambda: load(store, args.courses, words)) / 1000:.1f}s")
+    print(f"index ready after first search in {timed(lambda: store.search_courses('warmup', 1)) / 1000:.1f}s")
+
+    rng = random.Random(2)
+    print(f"{'query':>12} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'avg hits':>9}")
+    for kind, make_query in QUERIES.items():
+        samples, hits = [], 0
+        for _ in range(args.queries):
+            query = make_query(rng, words)
+            started = time.perf_counter()
+            hits += len(store.search_courses(query, args.limit))
+            samples.append((time.perf_counter() - started) * 1000)
+        print(
+            f"{kind:>12} {statistics.median(samples):>8.2f} {percentile(samples, 0.99):>8.2f} "
+            f"{max(samples):>8.2f} {hits / args.queries:>9.1f}"
+        )
+
+    course_ids = [rng.randrange(1, args.courses + 1) for _ in range(args.queries)]
+    writes = [
+        timed(lambda course_id=course_id: store.update_course(
+            course_id, {"title": " ".join(rng.sample(words[:1000], 3))}
+        ))
+        for course_id in course_ids
+    ]
+    print(f"title update with reindexing: p50 {statistics.median(writes):.2f} ms, "
+          f"p99 {percentile(writes, 0.99):.2f} ms")
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""Throughput of list response serialization: FastAPI's model path vs the fast path.
+
+Builds N user and enrollment records in the memory engine, then encodes them
+as one list both ways and checks that the bodies are byte-identical.
+
+    python -m benchmarks.serialization --rows 100000 --repeat 3
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import date, timedelta
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from schemas import Enrollment, User
+from services.memory_store import InMemoryRepository
+from services.serialization import encode_list
+
+
+def seed(store: InMemoryRepository, rows: int) -> None:
+    course_id = store.create_course("Benchmark course", "Serialization benchmark")["id"]
+    users = store.create_users([(f"User {i}", f"user{i}@example.com") for i in range(rows)])
+    start = date(2025, 9, 1)
+    for i, user in enumerate(users):
+        store.create_enrollment(user["id"], course_id, start + timedelta(days=i % 30))
+
+
+def model_path(model, records) -> bytes:
+    field = create_response_field(name="response", type_=List[model])
+    content = asyncio.run(serialize_response(field=field, response_content=records))
+    return JSONResponse(content).body
+
+
+def best_of(repeat: int, encode) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = encode()
+        timings.append(time.perf_counter() - started)
+    return min(timings), body
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--compact", action="store_true", help="use the compact record layout")
+    args = parser.parse_args(argv)
+
+    store = InMemoryRepository(compact=args.compact)
+    seed(store, args.rows)
+    tables = [
+        ("users", User, list(store.users_db.values())),
+        ("enrollments", Enrollment, list(store.enrollments_db.values())),
+    ]
+
+    print(f"{'list':>12} {'path':>6} {'seconds':>8} {'rows/s':>10} {'MiB':>6}")
+    for name, model, records in tables:
+        model_seconds, expected = best_of(args.repeat, lambda: model_path(model, records))
+        fast_seconds, actual = best_of(args.repeat, lambda: encode_list(model, records))
+        if actual != expected:
+            print(f"{name}: fast path output differs from the model path", file=sys.stderr)
+            return 1
+        for path, seconds in (("model", model_seconds), ("fast", fast_seconds)):
+            print(
+                f"{name:>12} {path:>6} {seconds:>8.3f} {len(records) / seconds:>10.0f} "
+                f"{len(expected) / 2**20:>6.1f}"
+            )
+        print(f"{name:>12} speedup {model_seconds / fast_seconds:.1f}x, bodies identical")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,163 @@
+"""Concurrent stress test for the storage engines.
+
+Each worker thread runs a mix of signups, enrollments, completions, deletes and
+reads. Afterwards the store is checked for duplicate IDs, duplicate emails,
+duplicate (user, course) pairs and index drift, and throughput is reported per
+thread count. `--global-lock` runs the same load through a single store-wide
+lock for comparison with the striped locking of the in-memory engine.
+
+    python -m benchmarks.stress_store --threads 1,2,4,8 --ops 5000
+"""
+import argparse
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from services.config import Settings
+from services.database import create_store
+from services.repository import AlreadyEnrolledError, DuplicateEmailError, Repository
+
+
+class GlobalLockStore:
+    """Proxy that serializes every store call behind one lock"""
+
+    def __init__(self, store: Repository):
+        self._store = store
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        method = getattr(self._store, name)
+
+        def locked(*args, **kwargs):
+            with self._lock:
+                return method(*args, **kwargs)
+
+        return locked
+
+
+def worker(store, index: int, ops: int, courses: list, shared_emails: int, errors: list) -> None:
+    rng = random.Random(index)
+    mine = []
+    try:
+        for n in range(ops):
+            roll = rng.random()
+            if roll < 0.25:
+                # Some signups collide on purpose to exercise the email index
+                email = (
+                    f"shared{rng.randrange(shared_emails)}@example.com"
+                    if roll < 0.05 else f"user{index}-{n}@example.com"
+                )
+                try:
+                    mine.append(store.create_user(f"User {index}-{n}", email)["id"])
+                except DuplicateEmailError:
+                    pass
+            elif roll < 0.6 and mine:
+                try:
+                    store.create_enrollment(rng.choice(mine), rng.choice(courses), date.today())
+                except AlreadyEnrolledError:
+                    pass
+            elif roll < 0.7 and mine:
+                enrollments = store.get_enrollments_for_user(rng.choice(mine))
+                if enrollments:
+                    store.update_enrollment(rng.choice(enrollments)["id"], {"completed": True})
+            elif roll < 0.75 and mine:
+                enrollments = store.get_enrollments_for_user(rng.choice(mine))
+                if enrollments:
+                    store.delete_enrollment(rng.choice(enrollments)["id"])
+            elif roll < 0.9:
+                store.list_enrollments(course_id=rng.choice(courses), limit=50)
+            elif mine:
+                store.get_user(rng.choice(mine))
+    except Exception as exc:
+        errors.append(exc)
+
+
+def check_invariants(store: Repository) -> list:
+    problems = []
+    users, after_id = [], 0
+    while True:
+        page, after_id = store.list_users(after_id, 1000)
+        users.extend(page)
+        if after_id is None:
+            break
+    enrollments, after_id = [], 0
+    while True:
+        page, after_id = store.list_enrollments(after_id, 1000)
+        enrollments.extend(page)
+        if after_id is None:
+            break
+
+    if len({user["id"] for user in users}) != len(users):
+        problems.append("duplicate user IDs")
+    if len({user["email"].lower() for user in users}) != len(users):
+        problems.append("duplicate emails")
+    if len({e["id"] for e in enrollments}) != len(enrollments):
+        problems.append("duplicate enrollment IDs")
+    if len({(e["user_id"], e["course_id"]) for e in enrollments}) != len(enrollments):
+        problems.append("duplicate (user, course) enrollments")
+    for enrollment in enrollments:
+        found = store.find_enrollment(enrollment["user_id"], enrollment["course_id"])
+        if found is None or found["id"] != enrollment["id"]:
+            problems.append(f"pair index out of sync for enrollment {enrollment['id']}")
+            break
+    by_user = sum(len(store.get_enrollments_for_user(user["id"])) for user in users)
+    if by_user != len(enrollments):
+        problems.append("user adjacency index out of sync")
+    return problems
+
+
+def run(engine: str, threads: int, ops: int, global_lock: bool, workdir: Path) -> dict:
+    config = Settings(storage=engine, sqlite_path=str(workdir / f"stress-{threads}.db"))
+    store = create_store(config)
+    store.reset()
+    courses = [store.create_course(f"Course {i}", "Stress course")["id"] for i in range(50)]
+    target = GlobalLockStore(store) if global_lock else store
+    errors: list = []
+    started = time.perf_counter()
+    workers = [
+        threading.Thread(target=worker, args=(target, index, ops, courses, 100, errors))
+        for index in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    problems = [repr(error) for error in errors] + check_invariants(store)
+    store.close()
+    return {
+        "threads": threads,
+        "ops": threads * ops,
+        "seconds": elapsed,
+        "ops_per_second": threads * ops / elapsed,
+        "problems": problems,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--engine", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--threads", default="1,2,4,8", help="comma-separated thread counts")
+    parser.add_argument("--ops", type=int, default=5000, help="operations per thread")
+    parser.add_argument("--global-lock", action="store_true", help="serialize every call behind one lock")
+    args = parser.parse_args(argv)
+
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"{'threads':>7} {'ops':>8} {'seconds':>8} {'ops/s':>10}  invariants")
+        for threads in (int(value) for value in args.threads.split(",")):
+            result = run(args.engine, threads, args.ops, args.global_lock, Path(workdir))
+            status = "ok" if not result["problems"] else "; ".join(result["problems"])
+            failed = failed or bool(result["problems"])
+            print(
+                f"{result['threads']:>7} {result['ops']:>8} {result['seconds']:>8.2f} "
+                f"{result['ops_per_second']:>10.0f}  {status}"
+            )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
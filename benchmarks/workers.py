@@ -0,0 +1,140 @@
+"""Throughput of the API as the number of worker processes grows.
+
+Runs `uvicorn main:app --workers N` on the SQLite engine for each N and drives
+it from several client processes with a mix of 80% GET /api/users/{id}, 15%
+GET /api/users and 5% POST /api/users. Every email is posted twice, so each
+run also checks that the workers never hand out the same ID twice and never
+accept a duplicate email.
+
+    python -m benchmarks.workers --workers 1,2,4 --clients 4 --requests 20000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+import httpx
+from benchmarks.load import _free_port
+from services.config import Settings
+from services.database import create_store
+
+USERS = 10000
+
+
+def start_server(workers: int, port: int, env: dict):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--workers", str(workers),
+         "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        env=dict(env, EDUTRACK_WORKERS=str(workers)),
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/").status_code == 200:
+                return server
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f"server with {workers} workers did not start")
+
+
+async def drive(port: int, client: int, concurrency: int, requests: int) -> dict:
+    # Paired clients replay the same sequence, so each email arrives twice
+    rng = random.Random(client // 2)
+    created: List[int] = []
+    rejected = 0
+    errors = 0
+    posted = 0
+
+    def next_request():
+        nonlocal posted
+        roll = rng.random()
+        if roll < 0.05:
+            posted += 1
+            email = f"bench{client // 2}-{posted}@example.com"
+            return "POST", "/api/users/", {"name": "Bench", "email": email}
+        if roll < 0.20:
+            return "GET", "/api/users/?limit=50", None
+        return "GET", f"/api/users/{rng.randrange(1, USERS + 1)}", None
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as http:
+        remaining = requests
+
+        async def worker():
+            nonlocal remaining, rejected, errors
+            while remaining > 0:
+                remaining -= 1
+                method, path, body = next_request()
+                try:
+                    response = await http.request(method, path, json=body)
+                except httpx.TransportError:
+                    errors += 1
+                    continue
+                if method == "POST" and response.status_code == 201:
+                    created.append(response.json()["id"])
+                elif method == "POST" and response.status_code == 400:
+                    rejected += 1
+                elif response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {"requests": requests, "elapsed": elapsed, "created": created, "rejected": rejected, "errors": errors}
+
+
+def run_client(args) -> dict:
+    return asyncio.run(drive(*args))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--clients", type=int, default=4, help="client processes")
+    parser.add_argument("--concurrency", type=int, default=25, help="connections per client")
+    parser.add_argument("--requests", type=int, default=10000, help="requests per client")
+    args = parser.parse_args(argv)
+
+    print(f"{'workers':>7} {'rps':>8} {'created':>8} {'rejected':>8} {'errors':>7} {'unique ids':>10}")
+    for workers in (int(value) for value in args.workers.split(",")):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "workers.db")
+            store = create_store(Settings(storage="sqlite", sqlite_path=path))
+            store.create_users([(f"User {i}", f"user{i}@example.com") for i in range(USERS)])
+            store.close()
+            env = dict(
+                os.environ,
+                EDUTRACK_STORAGE="sqlite",
+                EDUTRACK_SQLITE_PATH=path,
+                EDUTRACK_SEED_SAMPLE_DATA="false",
+            )
+            port = _free_port()
+            server = start_server(workers, port, env)
+            try:
+                with multiprocessing.Pool(args.clients) as pool:
+                    results = pool.map(run_client, [
+                        (port, client, args.concurrency, args.requests) for client in range(args.clients)
+                    ])
+            finally:
+                server.terminate()
+                server.wait()
+        created = [user_id for result in results for user_id in result["created"]]
+        elapsed = max(result["elapsed"] for result in results)
+        total = sum(result["requests"] for result in results)
+        print(
+            f"{workers:>7} {total / elapsed:>8.0f} {len(created):>8} "
+            f"{sum(result['rejected'] for result in results):>8} "
+            f"{sum(result['errors'] for result in results):>7} "
+            f"{'yes' if len(created) == len(set(created)) else 'NO':>10}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -1,11 +1,26 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from routes import users, courses, enrollments
+from routes import admin, changes, users, courses, enrollments
+from services.compression import CompressionMiddleware
+from services.config import settings
+from services.database import get_store
+from services.metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from services.profiling import ProfilingMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Flush pending log writes and, for a durable memory store, leave a snapshot
+    get_store().close()
+
 
 app = FastAPI(
     title="EduTrack Lite API",
     description="A course enrollment and tracking system",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -16,11 +31,21 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if settings.compression:
+    # Inside the metrics and profiling middleware, so they see the bytes sent
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_size)
+# Passes requests straight through unless profiling is configured
+app.add_middleware(ProfilingMiddleware)
+if settings.metrics:
+    # Outermost, so the timings include CORS handling
+    app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
 app.include_router(courses.router, prefix="/api/courses", tags=["Courses"])
 app.include_router(enrollments.router, prefix="/api/enrollments", tags=["Enrollments"])
+app.include_router(changes.router, prefix="/api/changes", tags=["Changes"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 
 @app.get("/")
 def root():
@@ -30,6 +55,12 @@ def root():
         "version": "1.0.0"
     }
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Request and data-layer metrics in the Prometheus text format"""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Several workers are separate processes, so uvicorn must import the app itself
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=settings.workers)
\ No newline at end of file
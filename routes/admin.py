@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import PlainTextResponse
+from services.async_store import AsyncRepository
+from services.config import settings
+from services.database import get_async_store
+from services.profiling import profile_buffer
+from services.response_cache import response_cache
+from services.changes import DELETED, change_log
+from routes.dependencies import require_admin_token
+
+router = APIRouter()
+
+
+@router.get("/cache", dependencies=[Depends(require_admin_token)])
+async def get_cache_stats():
+    """Get hit/miss counters and size of the GET-by-id response cache"""
+    return response_cache.stats()
+
+@router.post("/compact", dependencies=[Depends(require_admin_token)])
+async def compact_storage(store: AsyncRepository = Depends(get_async_store)):
+    """Purge enrollments left behind by deleted users or courses, and tombstones past the retention"""
+    removed = await store.purge_orphans()
+    response_cache.invalidate_many("enrollment", removed)
+    change_log.record_many("enrollment", DELETED, [(enrollment_id, None) for enrollment_id in removed])
+    pruned = await store.prune_deletions(settings.deletion_retention)
+    return {"removed_enrollments": len(removed), "pruned_deletions": pruned}
+
+@router.get("/profiles", dependencies=[Depends(require_admin_token)])
+async def list_profiles():
+    """List captured request profiles, newest first"""
+    return [profile.summary() for profile in profile_buffer.list()]
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin_token)])
+async def download_profile(profile_id: int, text: bool = False):
+    """Download a captured profile: pstats data, collapsed stacks, or with `text` a readable report"""
+    profile = profile_buffer.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    if text or profile.format == "collapsed":
+        return PlainTextResponse(profile.as_text())
+    return Response(
+        profile.data,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile.id}.prof"'},
+    )
\ No newline at end of file
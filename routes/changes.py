@@ -0,0 +1,122 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Optional, Tuple
+from fastapi import APIRouter, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from schemas import Change, ChangePage
+from services.changes import ChangeLog, ChangesExpired, change_log
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+router = APIRouter()
+
+# Changes sent per read while a stream catches up
+STREAM_BATCH = 500
+# Comment line sent on an idle stream so proxies keep the connection open
+STREAM_HEARTBEAT_SECONDS = 15.0
+
+EPOCH_DESCRIPTION = "Epoch the `since` position came from; positions from another epoch answer 410"
+
+
+def _require_enabled() -> None:
+    if not change_log.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The change log is disabled"
+        )
+
+
+def _expired(since: int, latest: int, epoch: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_410_GONE,
+        detail=f"Changes after {since} are not available; reload and continue from {latest} in epoch {epoch}"
+    )
+
+
+def _parse_event_id(event_id: str) -> Tuple[Optional[str], int]:
+    """(epoch, seq) from an event ID sent as "<epoch>:<seq>", or as a bare seq"""
+    epoch, _, seq = event_id.rpartition(":")
+    if not seq.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid Last-Event-ID"
+        )
+    return epoch or None, int(seq)
+
+
+@router.get("/", response_model=ChangePage)
+async def get_changes(
+    since: int = Query(0, ge=0, description="Sequence number of the last change already seen"),
+    epoch: Optional[str] = Query(None, max_length=64, description=EPOCH_DESCRIPTION),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Get the changes made after `since`, oldest first"""
+    _require_enabled()
+    try:
+        changes = change_log.read(since, limit, epoch)
+    except ChangesExpired as exc:
+        raise _expired(since, exc.latest, exc.epoch)
+    return {
+        "changes": changes,
+        "next_since": changes[-1]["seq"] if changes else since,
+        "latest": change_log.latest,
+        "epoch": change_log.epoch,
+    }
+
+
+async def stream_changes(
+    log: ChangeLog, since: int, is_disconnected: Callable[[], Awaitable[bool]], epoch: Optional[str] = None
+) -> AsyncIterator[str]:
+    """Server-sent events: each change as it is recorded, starting after `since`
+
+    Event IDs are "<epoch>:<seq>", so a client that reconnects to a restarted
+    server is told to reload instead of resuming from a stale position.
+    """
+    subscriber = log.subscribe()
+    try:
+        while not await is_disconnected():
+            # Cleared before reading, so a change recorded meanwhile still wakes the wait
+            subscriber.event.clear()
+            try:
+                changes = log.read(since, STREAM_BATCH, epoch)
+            except ChangesExpired as exc:
+                yield f"event: expired\ndata: {{\"latest\": {exc.latest}, \"epoch\": \"{exc.epoch}\"}}\n\n"
+                return
+            epoch = log.epoch
+            if changes:
+                since = changes[-1]["seq"]
+                yield "".join(
+                    f"id: {epoch}:{change['seq']}\nevent: change\n"
+                    f"data: {Change.model_validate(change).model_dump_json()}\n\n"
+                    for change in changes
+                )
+                continue
+            try:
+                await asyncio.wait_for(subscriber.event.wait(), STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+    finally:
+        log.unsubscribe(subscriber)
+
+
+@router.get("/stream")
+async def stream_changes_endpoint(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Sequence number of the last change already seen"),
+    epoch: Optional[str] = Query(None, max_length=64, description=EPOCH_DESCRIPTION),
+    last_event_id: Optional[str] = Header(None, max_length=100),
+):
+    """Stream changes as server-sent events; reconnecting clients resume from Last-Event-ID.
+
+    Without `since` the stream starts with the next change. A client that fell
+    too far behind, or whose position is from before a restart, gets an
+    `expired` event and must reload.
+    """
+    _require_enabled()
+    if last_event_id is not None:
+        epoch, since = _parse_event_id(last_event_id)
+    if since is None:
+        since, epoch = change_log.latest, change_log.epoch
+    return StreamingResponse(
+        stream_changes(change_log, since, request.is_disconnected, epoch),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
\ No newline at end of file
@@ -1,102 +1,303 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
-from schemas import Course, CourseCreate, CourseUpdate, User
-from services.database import courses_db, users_db, enrollments_db, get_next_course_id
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from typing import FrozenSet, List, Optional, Tuple, Union
+from schemas import (
+    Course, CourseBatch, CourseCreate, CourseDelta, CourseEnrollee, CourseStats, CourseUpdate, Enrollment,
+    ImportResult, User, UserDelta
+)
+from services.bulk import (
+    CSV_MEDIA_TYPE, NDJSON_MEDIA_TYPE, ImportRow, ImportSummary,
+    import_courses as import_course_rows, iter_export, iter_import_rows, run_import,
+    validation_error_message
+)
+from services.async_store import AsyncRepository
+from services.database import get_async_store
+from services.config import settings
+from services.pagination import MAX_PAGE_SIZE, iter_pages
+from services.repository import CASCADE, SOFT_DELETE, Delta, HasEnrollmentsError
+from services.response_cache import cached_record_response, collection_etag, not_modified, response_cache
+from services.changes import CREATED, DELETED, UPDATED, change_log, snapshot
+from services.serialization import (
+    batch_response, delta_response, expand_records, expanded_list_response, list_response, stream_list_response
+)
+from services.text_search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT
+from routes.dependencies import (
+    MAX_VERSION, UPDATED_SINCE_DESCRIPTION, Expand, ListStream, Pagination, batch_get_ids, read_delta,
+    reject_with_updated_since
+)
 
 router = APIRouter()
 
 
 @router.post("/", response_model=Course, status_code=status.HTTP_201_CREATED)
-def create_course(course: CourseCreate):
+async def create_course(course: CourseCreate, store: AsyncRepository = Depends(get_async_store)):
     """Create a new course"""
-    course_id = get_next_course_id()
-    new_course = {
-        "id": course_id,
-        "title": course.title,
-        "description": course.description,
-        "is_open": True
-    }
-    courses_db[course_id] = new_course
-    return new_course
+    created = await store.create_course(course.title, course.description)
+    change_log.record("course", CREATED, created["id"], snapshot(Course, created))
+    return created
 
 
-@router.get("/", response_model=List[Course])
-def get_all_courses():
-    """Get all courses"""
-    return list(courses_db.values())
+@router.get("/", response_model=Union[List[Course], CourseDelta])
+async def get_all_courses(
+    request: Request,
+    response: Response,
+    page: Pagination = Depends(),
+    is_open: Optional[bool] = None,
+    updated_since: Optional[int] = Query(None, ge=0, le=MAX_VERSION, description=UPDATED_SINCE_DESCRIPTION),
+    stream: ListStream = Depends(),
+    store: AsyncRepository = Depends(get_async_store),
+):
+    """Get all courses, one page at a time or streamed; `updated_since` returns only what changed"""
+    reject_with_updated_since(
+        updated_since, cursor=page.after_id > 0, is_open=is_open is not None, stream=stream.enabled
+    )
+    if updated_since is not None:
+        delta = await read_delta(store.list_course_changes(updated_since, page.limit), updated_since)
+        return delta_response(Course, delta)
+    if stream.enabled:
+        pages = iter_pages(lambda after_id, limit: store.list_courses(after_id, limit, is_open), page.after_id)
+        return stream_list_response((expand_records(Course, courses, ()) async for courses in pages), stream.ndjson)
+    courses, next_after_id = await store.list_courses(page.after_id, page.limit, is_open)
+    page.set_next_cursor(response, next_after_id)
+    unchanged = not_modified(request, response, collection_etag(courses, extra=next_after_id))
+    if unchanged is not None:
+        return unchanged
+    return list_response(Course, courses, response)
+
+
+@router.post("/batch-get", response_model=CourseBatch)
+async def batch_get_courses(
+    ids: List[int] = Depends(batch_get_ids),
+    store: AsyncRepository = Depends(get_async_store),
+):
+    """Get many courses by ID in one request; IDs with no course are listed as missing"""
+    return batch_response(Course, ids, await store.get_courses_many(ids))
+
+
+@router.get("/search", response_model=List[Course])
+async def search_courses(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find in title or description"),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    store: AsyncRepository = Depends(get_async_store),
+):
+    """Search course titles and descriptions, best match first; the last word matches as a prefix"""
+    return list_response(Course, await store.search_courses(q, limit), response)
+
+
+def _parse_course_row(row: ImportRow) -> Union[Tuple[str, str], str]:
+    if isinstance(row, str):
+        return row
+    try:
+        course = CourseCreate.model_validate(row)
+    except ValidationError as exc:
+        return validation_error_message(exc)
+    return course.title, course.description
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_courses(request: Request, store: AsyncRepository = Depends(get_async_store)):
+    """Create courses from an NDJSON or CSV upload with title and description fields"""
+    try:
+        rows = iter_import_rows(request.headers.get("content-type", ""), request.stream())
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=str(exc)
+        )
+    summary = ImportSummary()
+
+    def import_chunk(chunk):
+        parsed = [(line, _parse_course_row(row)) for line, row in chunk]
+        created = import_course_rows(store.sync, parsed, summary)
+        change_log.record_many("course", CREATED, [(course["id"], snapshot(Course, course)) for course in created])
+
+    await run_import(rows, import_chunk)
+    return summary.as_dict()
+
+
+@router.get("/export")
+async def export_courses(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    store: AsyncRepository = Depends(get_async_store),
+):
+    """Stream every course as NDJSON or CSV"""
+    media_type = CSV_MEDIA_TYPE if export_format == "csv" else NDJSON_MEDIA_TYPE
+    return StreamingResponse(
+        iter_export(store.sync.list_courses, tuple(Course.model_fields), export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="courses.{export_format}"'},
+    )
+
+
+def _with_completion_rate(stats: dict) -> dict:
+    enrolled = stats["enrolled"]
+    return {**stats, "completion_rate": stats["completed"] / enrolled if enrolled else 0.0}
+
+
+@router.get("/stats", response_model=List[CourseStats])
+async def get_all_course_stats(
+    response: Response,
+    page: Pagination = Depends(),
+    store: AsyncRepository = Depends(get_async_store),
+):
+    """Get enrollment and completion counts for every course, one page at a time"""
+    stats, next_after_id = await store.list_course_stats(page.after_id, page.limit)
+    page.set_next_cursor(response, next_after_id)
+    return [_with_completion_rate(course_stats) for course_stats in stats]
 
 
 @router.get("/{course_id}", response_model=Course)
-def get_course(course_id: int):
+async def get_course(
+    course_id: int,
+    request: Request,
+    store: AsyncRepository = Depends(get_async_store),
+):
     """Get a specific course by ID"""
-    if course_id not in courses_db:
+    response = await cached_record_response(request, "course", course_id, Course, store.get_course)
+    if response is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Course not found"
         )
-    return courses_db[course_id]
+    return response
 
 
 @router.put("/{course_id}", response_model=Course)
-def update_course(course_id: int, course_update: CourseUpdate):
+async def update_course(
+    course_id: int,
+    course_update: CourseUpdate,
+    store: AsyncRepository = Depends(get_async_store),
+):
     """Update a course"""
-    if course_id not in courses_db:
+    update_data = course_update.model_dump(exclude_unset=True)
+    course = await store.update_course(course_id, update_data)
+    response_cache.invalidate("course", course_id)
+    if course is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Course not found"
         )
-    
-    course = courses_db[course_id]
-    update_data = course_update.model_dump(exclude_unset=True)
-    course.update(update_data)
+    change_log.record("course", UPDATED, course_id, snapshot(Course, course))
     return course
 
 
 @router.delete("/{course_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_course(course_id: int):
-    """Delete a course"""
-    if course_id not in courses_db:
+async def delete_course(course_id: int, store: AsyncRepository = Depends(get_async_store)):
+    """Delete a course; its enrollments are handled per the configured delete policy"""
+    policy = settings.delete_policy
+    # Enrollments removed by a cascade must leave the response cache too
+    dependents = [] if policy != CASCADE else [
+        enrollment["id"] for enrollment in await store.get_enrollments_for_course(course_id)
+    ]
+    try:
+        deleted = await store.delete_course(course_id, policy)
+    except HasEnrollmentsError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Course has enrollments"
+        )
+    response_cache.invalidate("course", course_id)
+    response_cache.invalidate_many("enrollment", dependents)
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Course not found"
         )
-    del courses_db[course_id]
+    if policy == SOFT_DELETE:
+        course = await store.get_course(course_id)
+        if course is not None:
+            change_log.record("course", UPDATED, course_id, snapshot(Course, course))
+        return
+    change_log.record_many("enrollment", DELETED, [(enrollment_id, None) for enrollment_id in dependents])
+    change_log.record("course", DELETED, course_id)
 
 
 @router.patch("/{course_id}/close", response_model=Course)
-def close_course_enrollment(course_id: int):
+async def close_course_enrollment(course_id: int, store: AsyncRepository = Depends(get_async_store)):
     """Close enrollment for a course"""
-    if course_id not in courses_db:
+    course = await store.update_course(course_id, {"is_open": False})
+    response_cache.invalidate("course", course_id)
+    if course is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Course not found"
         )
-    
-    courses_db[course_id]["is_open"] = False
-    return courses_db[course_id]
+    change_log.record("course", UPDATED, course_id, snapshot(Course, course))
+    return course
 
 
-@router.get("/{course_id}/enrollments", response_model=List[User])
-def get_course_enrollments(course_id: int):
-    """Get all users enrolled in a specific course"""
-    if course_id not in courses_db:
+@router.get("/{course_id}/stats", response_model=CourseStats)
+async def get_course_stats(course_id: int, store: AsyncRepository = Depends(get_async_store)):
+    """Get enrollment and completion counts for a course"""
+    stats = await store.get_course_stats(course_id)
+    if stats is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Course not found"
         )
+    return _with_completion_rate(stats)
+
+
+@router.get(
+    "/{course_id}/enrollments",
+    response_model=Union[List[CourseEnrollee], UserDelta],
+    response_model_exclude_unset=True,
+)
+async def get_course_enrollments(
+    course_id: int,
+    request: Request,
+    response: Response,
+    expand: FrozenSet[str] = Depends(Expand("enrollment")),
+    updated_since: Optional[int] = Query(None, ge=0, le=MAX_VERSION, description=UPDATED_SINCE_DESCRIPTION),
+    store: AsyncRepository = Depends(get_async_store),
+):
+    """Get all users enrolled in a specific course; `expand=enrollment` adds each user's enrollment.
+
+    With `updated_since`, returns the enrollees who joined or whose user record
+    changed since that version, and the IDs of users who left the course.
+    """
+    reject_with_updated_since(updated_since, expand=bool(expand))
+    if await store.get_course(course_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
+    # Read before the enrollments, so later enrollee writes show up again next time at worst
+    delta = None
+    if updated_since is not None:
+        delta = await read_delta(
+            store.list_enrollment_changes(updated_since, MAX_PAGE_SIZE, course_id=course_id), updated_since
+        )
     
     # Find all enrollments for this course
-    enrolled_user_ids = [
-        enrollment["user_id"] 
-        for enrollment in enrollments_db.values() 
-        if enrollment["course_id"] == course_id
-    ]
+    enrollments = await store.get_enrollments_for_course(course_id)
+    enrolled_user_ids = [enrollment["user_id"] for enrollment in enrollments]
     
-    # Get user details
-    enrolled_users = [
-        users_db[user_id] 
-        for user_id in enrolled_user_ids 
-        if user_id in users_db
-    ]
+    # Get user details in one lookup, skipping a user deleted meanwhile
+    users = await store.get_users_many(enrolled_user_ids)
+    enrolled_users = [users[user_id] for user_id in enrolled_user_ids if user_id in users]
     
-    return enrolled_users
\ No newline at end of file
+    if delta is not None:
+        joined = {enrollment["user_id"] for enrollment in delta.changed}
+        enrolled = set(enrolled_user_ids)
+        left = dict.fromkeys(
+            tombstone["user_id"] for tombstone in delta.deleted if tombstone["user_id"] not in enrolled
+        )
+        return delta_response(User, Delta(
+            [user for user in enrolled_users if user["id"] in joined or user["version"] > updated_since],
+            [{"id": user_id} for user_id in left],
+            delta.version,
+            delta.more,
+        ))
+    etag = collection_etag(enrolled_users, enrollments)
+    unchanged = not_modified(request, response, etag)
+    if unchanged is not None:
+        return unchanged
+    if "enrollment" in expand:
+        by_user = {enrollment["user_id"]: enrollment for enrollment in enrollments}
+        return expanded_list_response(
+            User, enrolled_users, [("enrollment", Enrollment, "id", by_user)], response
+        )
+    return list_response(User, enrolled_users, response)
\ No newline at end of file
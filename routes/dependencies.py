@@ -0,0 +1,145 @@
+from typing import Awaitable, FrozenSet, List, Optional, Tuple
+from fastapi import Header, HTTPException, Query, Request, Response, status
+from schemas import BatchGetRequest
+from services.bulk import MAX_BATCH_GET_IDS, NDJSON_MEDIA_TYPE
+from services.negotiation import choose
+from services.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, decode_key_cursor,
+    encode_cursor, encode_key_cursor
+)
+from services.profiling import admin_token_matches
+from services.repository import Delta, DeltaExpiredError
+
+
+class Pagination:
+    """`limit`/`cursor` query parameters shared by the list endpoints"""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    ):
+        try:
+            self.after_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        self.limit = limit
+
+    def set_next_cursor(self, response: Response, next_after_id: Optional[int]) -> None:
+        """Advertise the next page, if there is one"""
+        if next_after_id is not None:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(next_after_id)
+
+
+class ListStream:
+    """Whether to send a whole list as one streamed response, and in which format.
+
+    `Accept: application/x-ndjson` streams NDJSON, one record per line, and
+    `stream=true` alone streams a JSON array. A stream runs from `cursor` to the
+    end of the list and ignores `limit`.
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        stream: bool = Query(False, description="Stream every record from the cursor on instead of a page"),
+    ):
+        accepted = choose(
+            request.headers.get("accept"), ("application/json", NDJSON_MEDIA_TYPE), client_order=True
+        )
+        self.ndjson = accepted == NDJSON_MEDIA_TYPE
+        self.enabled = stream or self.ndjson
+
+
+class KeyPagination:
+    """`limit`/`cursor` query parameters of endpoints paging through a (key, ID) ordered index"""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    ):
+        try:
+            self.after = decode_key_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        self.limit = limit
+
+    def set_next_cursor(self, response: Response, next_after: Optional[Tuple[str, int]]) -> None:
+        """Advertise the next page, if there is one"""
+        if next_after is not None:
+            response.headers[NEXT_CURSOR_HEADER] = encode_key_cursor(next_after)
+
+
+# Versions are SQLite integers, which stop at 2**63 - 1
+MAX_VERSION = 2 ** 63 - 1
+UPDATED_SINCE_DESCRIPTION = (
+    "Version from the previous delta, or 0 to start; returns only what was written or deleted after it"
+)
+
+
+def reject_with_updated_since(updated_since: Optional[int], **given: bool) -> None:
+    """Refuse the named list parameters when a delta is requested; deltas page by version instead"""
+    names = [name for name, present in given.items() if present]
+    if updated_since is not None and names:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"updated_since cannot be combined with {', '.join(names)}"
+        )
+
+
+async def read_delta(delta: Awaitable[Delta], since: int) -> Delta:
+    """Await a delta read, answering 410 when `since` is older than the deletes still kept"""
+    try:
+        return await delta
+    except DeltaExpiredError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=f"Deletes after {since} are not available; reload the list (horizon {exc.horizon})"
+        )
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Reject the request unless it carries the configured EDUTRACK_ADMIN_TOKEN"""
+    if not admin_token_matches(x_admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin token required"
+        )
+
+
+class Expand:
+    """`expand` query parameter naming related records to embed, e.g. `expand=user,course`"""
+
+    def __init__(self, *allowed: str):
+        self.allowed = allowed
+
+    def __call__(
+        self, expand: Optional[str] = Query(None, description="Comma-separated related records to embed")
+    ) -> FrozenSet[str]:
+        if not expand:
+            return frozenset()
+        names = frozenset(name.strip() for name in expand.split(",") if name.strip())
+        unknown = sorted(names - set(self.allowed))
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot expand {', '.join(unknown)}; expected {', '.join(self.allowed)}"
+            )
+        return names
+
+
+def batch_get_ids(body: BatchGetRequest) -> List[int]:
+    """IDs of a batch-get request, de-duplicated in request order"""
+    if len(body.ids) > MAX_BATCH_GET_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A batch get may request at most {MAX_BATCH_GET_IDS} IDs"
+        )
+    return list(dict.fromkeys(body.ids))
\ No newline at end of file
@@ -1,120 +1,305 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from typing import Any, FrozenSet, List, Optional, Union
 from datetime import date
-from schemas import Enrollment, EnrollmentCreate, EnrollmentComplete
-from services.database import (
-    enrollments_db, users_db, courses_db, get_next_enrollment_id
+from schemas import (
+    Course, Enrollment, EnrollmentBatch, EnrollmentCreate, EnrollmentComplete, EnrollmentDelta,
+    EnrollmentExpanded, BulkEnrollmentRequest, BulkEnrollmentResult, User
+)
+from services.bulk import MAX_BULK_ITEMS, BulkEnrollmentItem, bulk_enroll, iter_lines
+from services.async_store import AsyncRepository
+from services.database import get_async_store
+from services.pagination import MAX_PAGE_SIZE, iter_pages
+from services.repository import AlreadyEnrolledError, ParentNotFoundError
+from services.response_cache import cached_record_response, collection_etag, not_modified, response_cache
+from services.changes import CREATED, DELETED, UPDATED, change_log, snapshot
+from services.serialization import (
+    Embed, batch_response, delta_response, expand_records, expanded_list_response, list_response,
+    stream_list_response
+)
+from routes.dependencies import (
+    MAX_VERSION, UPDATED_SINCE_DESCRIPTION, Expand, ListStream, Pagination, batch_get_ids, read_delta,
+    reject_with_updated_since
 )
 
 router = APIRouter()
 
 
 @router.post("/", response_model=Enrollment, status_code=status.HTTP_201_CREATED)
-def enroll_user(enrollment: EnrollmentCreate):
+async def enroll_user(enrollment: EnrollmentCreate, store: AsyncRepository = Depends(get_async_store)):
     """Enroll a user in a course"""
     # Check if user exists
-    if enrollment.user_id not in users_db:
+    user = await store.get_user(enrollment.user_id)
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
     # Check if user is active
-    if not users_db[enrollment.user_id]["is_active"]:
+    if not user["is_active"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Only active users can enroll in courses"
         )
     
     # Check if course exists
-    if enrollment.course_id not in courses_db:
+    course = await store.get_course(enrollment.course_id)
+    if course is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Course not found"
         )
     
     # Check if course is open
-    if not courses_db[enrollment.course_id]["is_open"]:
+    if not course["is_open"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Course enrollment is closed"
         )
     
-    # Check if user is already enrolled
-    for existing_enrollment in enrollments_db.values():
-        if (existing_enrollment["user_id"] == enrollment.user_id and 
-            existing_enrollment["course_id"] == enrollment.course_id):
+    # Create enrollment; the store rejects a second enrollment in the same course
+    try:
+        created = await store.create_enrollment(enrollment.user_id, enrollment.course_id, date.today())
+    except AlreadyEnrolledError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User is already enrolled in this course"
+        )
+    except ParentNotFoundError as exc:
+        # The user or course was deleted after the checks above
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found" if exc.missing == "user" else "Course not found"
+        )
+    change_log.record("enrollment", CREATED, created["id"], snapshot(Enrollment, created))
+    return created
+
+
+def _parse_bulk_item(raw: Any) -> BulkEnrollmentItem:
+    try:
+        item = EnrollmentCreate.model_validate(raw)
+    except ValidationError:
+        return "Invalid item: expected user_id and course_id"
+    return item.user_id, item.course_id
+
+
+def _too_many_items() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"A bulk request may contain at most {MAX_BULK_ITEMS} items"
+    )
+
+
+@router.post("/bulk", response_model=BulkEnrollmentResult)
+async def bulk_enroll_users(
+    request: Request,
+    response: Response,
+    atomic: bool = False,
+    store: AsyncRepository = Depends(get_async_store),
+):
+    """Enroll many users at once.
+
+    Accepts either a JSON body `{"items": [{"user_id": ..., "course_id": ...}], "atomic": false}`
+    or an `application/x-ndjson` stream with one pair per line. With `atomic`, a
+    batch containing any invalid item is rejected as a whole with 409.
+    """
+    items: List[BulkEnrollmentItem] = []
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        async for line in iter_lines(request.stream()):
+            if len(items) == MAX_BULK_ITEMS:
+                raise _too_many_items()
+            try:
+                items.append(_parse_bulk_item(json.loads(line)))
+            except ValueError:
+                items.append("Invalid item: malformed JSON")
+    else:
+        try:
+            body = BulkEnrollmentRequest.model_validate(await request.json())
+        except (ValueError, ValidationError):
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User is already enrolled in this course"
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Expected a JSON object with an items list"
             )
-    
-    # Create enrollment
-    enrollment_id = get_next_enrollment_id()
-    new_enrollment = {
-        "id": enrollment_id,
-        "user_id": enrollment.user_id,
-        "course_id": enrollment.course_id,
-        "enrolled_date": date.today(),
-        "completed": False
+        if len(body.items) > MAX_BULK_ITEMS:
+            raise _too_many_items()
+        items = [_parse_bulk_item(raw) for raw in body.items]
+        atomic = atomic or body.atomic
+
+    applied, results = await run_in_threadpool(bulk_enroll, store.sync, items, date.today(), atomic)
+    if not applied:
+        response.status_code = status.HTTP_409_CONFLICT
+    created = [result["enrollment"] for result in results if result["status"] == "created"]
+    change_log.record_many(
+        "enrollment", CREATED, [(enrollment["id"], snapshot(Enrollment, enrollment)) for enrollment in created]
+    )
+    return {
+        "applied": applied,
+        "created": len(created),
+        "failed": sum(1 for result in results if result["status"] == "error"),
+        "results": results,
     }
-    enrollments_db[enrollment_id] = new_enrollment
-    return new_enrollment
 
 
-@router.get("/", response_model=List[Enrollment])
-def get_all_enrollments():
-    """Get all enrollments"""
-    return list(enrollments_db.values())
+@router.post("/batch-get", response_model=EnrollmentBatch)
+async def batch_get_enrollments(
+    ids: List[int] = Depends(batch_get_ids),
+    store: AsyncRepository = Depends(get_async_store),
+):
+    """Get many enrollments by ID in one request; IDs with no enrollment are listed as missing"""
+    return batch_response(Enrollment, ids, await store.get_enrollments_many(ids))
+
+
+async def _embeds(enrollments: List[dict], expand: FrozenSet[str], store: AsyncRepository) -> List[Embed]:
+    """The users and courses named in `expand`, one batched lookup per related table"""
+    embeds = []
+    if "user" in expand:
+        users = await store.get_users_many({enrollment["user_id"] for enrollment in enrollments})
+        embeds.append(("user", User, "user_id", users))
+    if "course" in expand:
+        courses = await store.get_courses_many({enrollment["course_id"] for enrollment in enrollments})
+        embeds.append(("course", Course, "course_id", courses))
+    return embeds
+
+
+async def _enrollment_list_response(
+    enrollments: List[dict],
+    expand: FrozenSet[str],
+    request: Request,
+    response: Response,
+    store: AsyncRepository,
+    next_after_id: Optional[int] = None,
+):
+    """List response for enrollments, with the users and courses named in `expand` embedded
+
+    Answers 304 when the client's copy, embeds included, is still current.
+    """
+    embeds = await _embeds(enrollments, expand, store)
+    etag = collection_etag(enrollments, *(found.values() for *_, found in embeds), extra=next_after_id)
+    unchanged = not_modified(request, response, etag)
+    if unchanged is not None:
+        return unchanged
+    if not expand:
+        return list_response(Enrollment, enrollments, response)
+    return expanded_list_response(Enrollment, enrollments, embeds, response)
+
+
+@router.get(
+    "/", response_model=Union[List[EnrollmentExpanded], EnrollmentDelta], response_model_exclude_unset=True
+)
+async def get_all_enrollments(
+    request: Request,
+    response: Response,
+    page: Pagination = Depends(),
+    user_id: Optional[int] = None,
+    course_id: Optional[int] = None,
+    completed: Optional[bool] = None,
+    expand: FrozenSet[str] = Depends(Expand("user", "course")),
+    updated_since: Optional[int] = Query(None, ge=0, le=MAX_VERSION, description=UPDATED_SINCE_DESCRIPTION),
+    stream: ListStream = Depends(),
+    store: AsyncRepository = Depends(get_async_store),
+):
+    """Get all enrollments, one page at a time or streamed; `updated_since` returns only what changed"""
+    reject_with_updated_since(
+        updated_since,
+        cursor=page.after_id > 0,
+        completed=completed is not None,
+        expand=bool(expand),
+        stream=stream.enabled,
+    )
+    if updated_since is not None:
+        delta = await read_delta(
+            store.list_enrollment_changes(updated_since, page.limit, user_id, course_id), updated_since
+        )
+        return delta_response(Enrollment, delta)
+    if stream.enabled:
+        async def stream_pages():
+            pages = iter_pages(
+                lambda after_id, limit: store.list_enrollments(after_id, limit, user_id, course_id, completed),
+                page.after_id,
+            )
+            async for enrollments in pages:
+                yield expand_records(Enrollment, enrollments, await _embeds(enrollments, expand, store))
+        return stream_list_response(stream_pages(), stream.ndjson)
+    enrollments, next_after_id = await store.list_enrollments(
+        page.after_id, page.limit, user_id, course_id, completed
+    )
+    page.set_next_cursor(response, next_after_id)
+    return await _enrollment_list_response(enrollments, expand, request, response, store, next_after_id)
 
 
 @router.get("/{enrollment_id}", response_model=Enrollment)
-def get_enrollment(enrollment_id: int):
+async def get_enrollment(
+    enrollment_id: int,
+    request: Request,
+    store: AsyncRepository = Depends(get_async_store),
+):
     """Get a specific enrollment by ID"""
-    if enrollment_id not in enrollments_db:
+    response = await cached_record_response(
+        request, "enrollment", enrollment_id, Enrollment, store.get_enrollment
+    )
+    if response is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Enrollment not found"
         )
-    return enrollments_db[enrollment_id]
+    return response
 
 
-@router.get("/user/{user_id}", response_model=List[Enrollment])
-def get_user_enrollments(user_id: int):
-    """Get all enrollments for a specific user"""
-    if user_id not in users_db:
+@router.get(
+    "/user/{user_id}",
+    response_model=Union[List[EnrollmentExpanded], EnrollmentDelta],
+    response_model_exclude_unset=True,
+)
+async def get_user_enrollments(
+    user_id: int,
+    request: Request,
+    response: Response,
+    expand: FrozenSet[str] = Depends(Expand("user", "course")),
+    updated_since: Optional[int] = Query(None, ge=0, le=MAX_VERSION, description=UPDATED_SINCE_DESCRIPTION),
+    store: AsyncRepository = Depends(get_async_store),
+):
+    """Get all enrollments for a specific user, or with `updated_since` only those changed since a version"""
+    reject_with_updated_since(updated_since, expand=bool(expand))
+    if await store.get_user(user_id) is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    user_enrollments = [
-        enrollment 
-        for enrollment in enrollments_db.values() 
-        if enrollment["user_id"] == user_id
-    ]
-    return user_enrollments
+    if updated_since is not None:
+        delta = await read_delta(
+            store.list_enrollment_changes(updated_since, MAX_PAGE_SIZE, user_id=user_id), updated_since
+        )
+        return delta_response(Enrollment, delta)
+    enrollments = await store.get_enrollments_for_user(user_id)
+    return await _enrollment_list_response(enrollments, expand, request, response, store)
 
 
 @router.patch("/{enrollment_id}/complete", response_model=Enrollment)
-def mark_course_complete(enrollment_id: int):
+async def mark_course_complete(enrollment_id: int, store: AsyncRepository = Depends(get_async_store)):
     """Mark a course enrollment as completed"""
-    if enrollment_id not in enrollments_db:
+    enrollment = await store.update_enrollment(enrollment_id, {"completed": True})
+    response_cache.invalidate("enrollment", enrollment_id)
+    if enrollment is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Enrollment not found"
         )
-    
-    enrollments_db[enrollment_id]["completed"] = True
-    return enrollments_db[enrollment_id]
+    change_log.record("enrollment", UPDATED, enrollment_id, snapshot(Enrollment, enrollment))
+    return enrollment
 
 
 @router.delete("/{enrollment_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_enrollment(enrollment_id: int):
+async def delete_enrollment(enrollment_id: int, store: AsyncRepository = Depends(get_async_store)):
     """Delete an enrollment"""
-    if enrollment_id not in enrollments_db:
+    deleted = await store.delete_enrollment(enrollment_id)
+    response_cache.invalidate("enrollment", enrollment_id)
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Enrollment not found"
         )
-    del enrollments_db[enrollment_id]
\ No newline at end of file
+    change_log.record("enrollment", DELETED, enrollment_id)
\ No newline at end of file
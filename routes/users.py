@@ -1,94 +1,230 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
-from schemas import User, UserCreate, UserUpdate
-from services.database import users_db, get_next_user_id
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from typing import List, Optional, Tuple, Union
+from schemas import ImportResult, User, UserBatch, UserCreate, UserDelta, UserUpdate
+from services.bulk import (
+    CSV_MEDIA_TYPE, NDJSON_MEDIA_TYPE, ImportRow, ImportSummary,
+    import_users as import_user_rows, iter_export, iter_import_rows, run_import,
+    validation_error_message
+)
+from services.async_store import AsyncRepository
+from services.database import get_async_store
+from services.config import settings
+from services.repository import CASCADE, SOFT_DELETE, DuplicateEmailError, HasEnrollmentsError
+from services.response_cache import cached_record_response, collection_etag, not_modified, response_cache
+from services.changes import CREATED, DELETED, UPDATED, change_log, snapshot
+from services.pagination import iter_pages
+from services.serialization import (
+    batch_response, delta_response, expand_records, list_response, stream_list_response
+)
+from routes.dependencies import (
+    MAX_VERSION, UPDATED_SINCE_DESCRIPTION, KeyPagination, ListStream, Pagination, batch_get_ids, read_delta,
+    reject_with_updated_since
+)
 
 router = APIRouter()
 
 
 @router.post("/", response_model=User, status_code=status.HTTP_201_CREATED)
-def create_user(user: UserCreate):
+async def create_user(user: UserCreate, store: AsyncRepository = Depends(get_async_store)):
     """Create a new user"""
-    # Check if email already exists
-    for existing_user in users_db.values():
-        if existing_user["email"] == user.email:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
-    
-    user_id = get_next_user_id()
-    new_user = {
-        "id": user_id,
-        "name": user.name,
-        "email": user.email,
-        "is_active": True
-    }
-    users_db[user_id] = new_user
-    return new_user
+    try:
+        created = await store.create_user(user.name, user.email)
+    except DuplicateEmailError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    change_log.record("user", CREATED, created["id"], snapshot(User, created))
+    return created
+
+
+@router.get("/", response_model=Union[List[User], UserDelta])
+async def get_all_users(
+    request: Request,
+    response: Response,
+    page: Pagination = Depends(),
+    is_active: Optional[bool] = None,
+    updated_since: Optional[int] = Query(None, ge=0, le=MAX_VERSION, description=UPDATED_SINCE_DESCRIPTION),
+    stream: ListStream = Depends(),
+    store: AsyncRepository = Depends(get_async_store),
+):
+    """Get all users, one page at a time or streamed; `updated_since` returns only what changed"""
+    reject_with_updated_since(
+        updated_since, cursor=page.after_id > 0, is_active=is_active is not None, stream=stream.enabled
+    )
+    if updated_since is not None:
+        delta = await read_delta(store.list_user_changes(updated_since, page.limit), updated_since)
+        return delta_response(User, delta)
+    if stream.enabled:
+        pages = iter_pages(lambda after_id, limit: store.list_users(after_id, limit, is_active), page.after_id)
+        return stream_list_response((expand_records(User, users, ()) async for users in pages), stream.ndjson)
+    users, next_after_id = await store.list_users(page.after_id, page.limit, is_active)
+    page.set_next_cursor(response, next_after_id)
+    unchanged = not_modified(request, response, collection_etag(users, extra=next_after_id))
+    if unchanged is not None:
+        return unchanged
+    return list_response(User, users, response)
+
+
+@router.post("/batch-get", response_model=UserBatch)
+async def batch_get_users(
+    ids: List[int] = Depends(batch_get_ids),
+    store: AsyncRepository = Depends(get_async_store),
+):
+    """Get many users by ID in one request; IDs with no user are listed as missing"""
+    return batch_response(User, ids, await store.get_users_many(ids))
+
+
+@router.get("/search", response_model=List[User])
+async def search_users(
+    response: Response,
+    page: KeyPagination = Depends(),
+    name: Optional[str] = Query(
+        None, min_length=1, max_length=200, description="Start of a name, from any of its words on"
+    ),
+    domain: Optional[str] = Query(
+        None, min_length=1, max_length=253, description="Email domain such as school.edu; includes subdomains"
+    ),
+    store: AsyncRepository = Depends(get_async_store),
+):
+    """Find users by name prefix and/or email domain, ordered by name (or by domain without a name)"""
+    if name is None and domain is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Give name, domain or both"
+        )
+    users, next_after = await store.search_users(name, domain, page.after, page.limit)
+    page.set_next_cursor(response, next_after)
+    return list_response(User, users, response)
+
+
+def _parse_user_row(row: ImportRow) -> Union[Tuple[str, str], str]:
+    if isinstance(row, str):
+        return row
+    try:
+        user = UserCreate.model_validate(row)
+    except ValidationError as exc:
+        return validation_error_message(exc)
+    return user.name, user.email
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_users(request: Request, store: AsyncRepository = Depends(get_async_store)):
+    """Create users from an NDJSON or CSV upload with name and email fields"""
+    try:
+        rows = iter_import_rows(request.headers.get("content-type", ""), request.stream())
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=str(exc)
+        )
+    summary = ImportSummary()
+    seen_emails = set()
+
+    def import_chunk(chunk):
+        parsed = [(line, _parse_user_row(row)) for line, row in chunk]
+        created = import_user_rows(store.sync, parsed, summary, seen_emails)
+        change_log.record_many("user", CREATED, [(user["id"], snapshot(User, user)) for user in created])
+
+    await run_import(rows, import_chunk)
+    return summary.as_dict()
 
 
-@router.get("/", response_model=List[User])
-def get_all_users():
-    """Get all users"""
-    return list(users_db.values())
+@router.get("/export")
+async def export_users(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    store: AsyncRepository = Depends(get_async_store),
+):
+    """Stream every user as NDJSON or CSV"""
+    media_type = CSV_MEDIA_TYPE if export_format == "csv" else NDJSON_MEDIA_TYPE
+    return StreamingResponse(
+        iter_export(store.sync.list_users, tuple(User.model_fields), export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="users.{export_format}"'},
+    )
 
 
 @router.get("/{user_id}", response_model=User)
-def get_user(user_id: int):
+async def get_user(user_id: int, request: Request, store: AsyncRepository = Depends(get_async_store)):
     """Get a specific user by ID"""
-    if user_id not in users_db:
+    response = await cached_record_response(request, "user", user_id, User, store.get_user)
+    if response is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    return users_db[user_id]
+    return response
 
 
 @router.put("/{user_id}", response_model=User)
-def update_user(user_id: int, user_update: UserUpdate):
+async def update_user(
+    user_id: int,
+    user_update: UserUpdate,
+    store: AsyncRepository = Depends(get_async_store),
+):
     """Update a user"""
-    if user_id not in users_db:
+    update_data = user_update.model_dump(exclude_unset=True)
+    
+    # The store rejects an email that is already registered to another user
+    try:
+        user = await store.update_user(user_id, update_data)
+    except DuplicateEmailError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    response_cache.invalidate("user", user_id)
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    
-    user = users_db[user_id]
-    update_data = user_update.model_dump(exclude_unset=True)
-    
-    # Check if email is being updated and if it already exists
-    if "email" in update_data and update_data["email"] != user["email"]:
-        for uid, existing_user in users_db.items():
-            if uid != user_id and existing_user["email"] == update_data["email"]:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Email already registered"
-                )
-    
-    user.update(update_data)
+    change_log.record("user", UPDATED, user_id, snapshot(User, user))
     return user
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(user_id: int):
-    """Delete a user"""
-    if user_id not in users_db:
+async def delete_user(user_id: int, store: AsyncRepository = Depends(get_async_store)):
+    """Delete a user; its enrollments are handled per the configured delete policy"""
+    policy = settings.delete_policy
+    # Enrollments removed by a cascade must leave the response cache too
+    dependents = [] if policy != CASCADE else [
+        enrollment["id"] for enrollment in await store.get_enrollments_for_user(user_id)
+    ]
+    try:
+        deleted = await store.delete_user(user_id, policy)
+    except HasEnrollmentsError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="User has enrollments"
+        )
+    response_cache.invalidate("user", user_id)
+    response_cache.invalidate_many("enrollment", dependents)
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    del users_db[user_id]
+    if policy == SOFT_DELETE:
+        user = await store.get_user(user_id)
+        if user is not None:
+            change_log.record("user", UPDATED, user_id, snapshot(User, user))
+        return
+    change_log.record_many("enrollment", DELETED, [(enrollment_id, None) for enrollment_id in dependents])
+    change_log.record("user", DELETED, user_id)
 
 
 @router.patch("/{user_id}/deactivate", response_model=User)
-def deactivate_user(user_id: int):
+async def deactivate_user(user_id: int, store: AsyncRepository = Depends(get_async_store)):
     """Deactivate a user"""
-    if user_id not in users_db:
+    user = await store.update_user(user_id, {"is_active": False})
+    response_cache.invalidate("user", user_id)
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    
-    users_db[user_id]["is_active"] = False
-    return users_db[user_id]
\ No newline at end of file
+    change_log.record("user", UPDATED, user_id, snapshot(User, user))
+    return user
\ No newline at end of file
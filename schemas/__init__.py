@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
-from datetime import date
+from typing import Any, Dict, List, Literal, Optional
+from datetime import date, datetime
 
 
 # User Schemas
@@ -19,6 +19,8 @@ class UserUpdate(BaseModel):
 class User(UserBase):
     id: int
     is_active: bool = True
+    # Raised by every write; see the updated_since list parameter
+    version: int = 0
 
     class Config:
         from_attributes = True
@@ -40,11 +42,19 @@ class CourseUpdate(BaseModel):
 class Course(CourseBase):
     id: int
     is_open: bool = True
+    version: int = 0
 
     class Config:
         from_attributes = True
 
 
+class CourseStats(BaseModel):
+    course_id: int
+    enrolled: int
+    completed: int
+    completion_rate: float
+
+
 # Enrollment Schemas
 class EnrollmentBase(BaseModel):
     user_id: int
@@ -60,6 +70,101 @@ class Enrollment(EnrollmentBase):
     id: int
     enrolled_date: date
     completed: bool = False
+    version: int = 0
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Expanded Schemas: list items with related records embedded via `expand=`
+class EnrollmentExpanded(Enrollment):
+    user: Optional[User] = None
+    course: Optional[Course] = None
+
+class CourseEnrollee(User):
+    enrollment: Optional[Enrollment] = None
+
+class BulkEnrollmentRequest(BaseModel):
+    items: List[Any]
+    atomic: bool = False
+
+class BulkEnrollmentItemResult(BaseModel):
+    index: int
+    user_id: Optional[int] = None
+    course_id: Optional[int] = None
+    status: str
+    enrollment: Optional[Enrollment] = None
+    error: Optional[str] = None
+
+class BulkEnrollmentResult(BaseModel):
+    applied: bool
+    created: int
+    failed: int
+    results: List[BulkEnrollmentItemResult]
+
+
+# Batch Get Schemas
+class BatchGetRequest(BaseModel):
+    ids: List[int]
+
+class UserBatch(BaseModel):
+    found: List[User]
+    missing: List[int]
+
+class CourseBatch(BaseModel):
+    found: List[Course]
+    missing: List[int]
+
+class EnrollmentBatch(BaseModel):
+    found: List[Enrollment]
+    missing: List[int]
+
+
+# Delta Schemas: what changed in a list after the version a client last saw
+class UserDelta(BaseModel):
+    changed: List[User]
+    deleted: List[int]
+    # Pass back as `updated_since`; with `more`, the next page is waiting
+    version: int
+    more: bool
+
+class CourseDelta(BaseModel):
+    changed: List[Course]
+    deleted: List[int]
+    version: int
+    more: bool
+
+class EnrollmentDelta(BaseModel):
+    changed: List[Enrollment]
+    deleted: List[int]
+    version: int
+    more: bool
+
+
+# Import Schemas
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportResult(BaseModel):
+    created: int
+    failed: int
+    errors: List[ImportRowError]
+
+
+# Change Feed Schemas
+class Change(BaseModel):
+    seq: int
+    at: datetime
+    entity: Literal["user", "course", "enrollment"]
+    op: Literal["created", "updated", "deleted"]
+    id: int
+    # The record as it was right after the change; None for deletes
+    data: Optional[Dict[str, Any]] = None
+
+class ChangePage(BaseModel):
+    changes: List[Change]
+    # Pass back as `since` to get the changes after this page
+    next_since: int
+    latest: int
+    # Pass back as `epoch` with `since`; it changes when the server restarts
+    epoch: str
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""Awaitable access to the storage engine for async route handlers.
+
+Engines that never block (the in-memory one) are called inline on the event
+loop, so a request costs no threadpool hop and concurrency is not capped by
+the threadpool size. Engines that block on I/O run in worker threads, at most
+`store.concurrency` at a time, which for SQLite matches the connection pool
+instead of parking threads on an empty pool.
+
+CPU-heavy work (bulk enrollment, imports, exports) keeps going to the
+threadpool through `sync`, the wrapped engine.
+"""
+import functools
+from typing import Any, Callable, Optional
+import anyio
+import anyio.to_thread
+from services.repository import Repository
+
+
+class AsyncRepository:
+    """Awaitable version of every Repository method, e.g. `await store.get_user(1)`"""
+
+    def __init__(self, store: Repository):
+        self.sync = store
+        # Created on first use; anyio limiters need a running event loop
+        self._limiter: Optional[anyio.CapacityLimiter] = None
+
+    def __getattr__(self, name: str) -> Callable:
+        method = getattr(self.sync, name)
+        if not self.sync.blocking:
+            async def call(*args: Any, **kwargs: Any) -> Any:
+                return method(*args, **kwargs)
+        else:
+            async def call(*args: Any, **kwargs: Any) -> Any:
+                if self._limiter is None:
+                    self._limiter = anyio.CapacityLimiter(self.sync.concurrency)
+                return await anyio.to_thread.run_sync(
+                    functools.partial(method, *args, **kwargs), limiter=self._limiter
+                )
+        call.__name__ = name
+        # Cache the coroutine function so later lookups skip __getattr__
+        setattr(self, name, call)
+        return call
\ No newline at end of file
@@ -0,0 +1,319 @@
+import csv
+import io
+import json
+from datetime import date
+from typing import (
+    AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+)
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from services.repository import AlreadyEnrolledError, Page, ParentNotFoundError, Repository, normalize_email
+
+# Upper bound on the number of items accepted by one bulk request
+MAX_BULK_ITEMS = 100_000
+
+# Upper bound on the number of IDs in one batch-get request
+MAX_BATCH_GET_IDS = 1000
+
+# Rows validated and written per store call during an import
+IMPORT_CHUNK_SIZE = 1000
+
+# Only the first errors of an import are itemized; all of them are counted
+MAX_REPORTED_ERRORS = 1000
+
+# Rows read from the store per page while streaming an export
+EXPORT_PAGE_SIZE = 1000
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+
+# A (user_id, course_id) pair, or the reason the item could not be parsed
+BulkEnrollmentItem = Union[Tuple[int, int], str]
+
+# An import row: the raw record, or the reason it could not be parsed
+ImportRow = Union[dict, str]
+
+
+async def iter_numbered_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """Split a byte stream into (line number, line) pairs without buffering the whole body"""
+    buffer = b""
+    number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            yield number, line.rstrip(b"\r")
+    if buffer:
+        yield number + 1, buffer.rstrip(b"\r")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Non-empty lines of a byte stream"""
+    async for _, line in iter_numbered_lines(chunks):
+        if line.strip():
+            yield line
+
+
+async def iter_ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, ImportRow]]:
+    """One JSON object per non-empty line"""
+    async for number, line in iter_numbered_lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, "Malformed JSON"
+            continue
+        yield number, row if isinstance(row, dict) else "Expected a JSON object"
+
+
+async def iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, ImportRow]]:
+    """Records of a CSV stream keyed by its header row; quoted fields may span lines"""
+    header: Optional[List[str]] = None
+    pending: List[str] = []
+    start = 0
+    async for number, line in iter_numbered_lines(chunks):
+        try:
+            text = line.decode("utf-8")
+        except UnicodeDecodeError:
+            yield number, "Invalid UTF-8"
+            continue
+        if not pending:
+            if not text.strip():
+                continue
+            start = number
+        pending.append(text)
+        record = "\n".join(pending)
+        if record.count('"') % 2:
+            # An odd number of quotes means a quoted field continues on the next line
+            continue
+        pending = []
+        fields = next(csv.reader([record]))
+        if header is None:
+            header = [field.strip().lstrip("\ufeff") for field in fields]
+            continue
+        if len(fields) != len(header):
+            yield start, f"Expected {len(header)} columns, got {len(fields)}"
+            continue
+        yield start, dict(zip(header, fields))
+    if pending:
+        yield start, "Unterminated quoted field"
+
+
+def iter_import_rows(
+    content_type: str, chunks: AsyncIterator[bytes]
+) -> AsyncIterator[Tuple[int, ImportRow]]:
+    """Row parser for an upload; raises ValueError for unsupported media types"""
+    if content_type.startswith(NDJSON_MEDIA_TYPE):
+        return iter_ndjson_rows(chunks)
+    if content_type.startswith(CSV_MEDIA_TYPE):
+        return iter_csv_rows(chunks)
+    raise ValueError(f"Expected {NDJSON_MEDIA_TYPE} or {CSV_MEDIA_TYPE}")
+
+
+def validation_error_message(exc: ValidationError) -> str:
+    """Short description of the first problem in a row"""
+    error = exc.errors()[0]
+    field = ".".join(str(part) for part in error["loc"])
+    return f"{field}: {error['msg']}" if field else error["msg"]
+
+
+def bulk_enroll(
+    store: Repository, items: List[BulkEnrollmentItem], enrolled_date: date, atomic: bool = False
+) -> Tuple[bool, List[dict]]:
+    """Validate and create a batch of enrollments with one lookup per table.
+
+    Returns whether the batch was applied and one result per item, in order.
+    Without `atomic` every valid item is created; with it, any failure leaves the
+    store untouched and the valid items are reported as skipped.
+    """
+    pairs = [item for item in items if not isinstance(item, str)]
+    users = store.get_users_many({user_id for user_id, _ in pairs})
+    courses = store.get_courses_many({course_id for _, course_id in pairs})
+    enrolled = store.find_enrolled_pairs(set(pairs))
+
+    results: List[dict] = []
+    pending: Dict[Tuple[int, int], dict] = {}
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            results.append({"index": index, "status": "error", "error": item})
+            continue
+        user_id, course_id = item
+        result = {"index": index, "user_id": user_id, "course_id": course_id}
+        error = _enrollment_error(users.get(user_id), courses.get(course_id))
+        if error is None and item in enrolled:
+            error = "User is already enrolled in this course"
+        if error is None and item in pending:
+            error = "Duplicate item in batch"
+        if error is None:
+            result["status"] = "pending"
+            pending[item] = result
+        else:
+            result["status"] = "error"
+            result["error"] = error
+        results.append(result)
+
+    failed = len(results) - len(pending)
+    if atomic and failed:
+        _skip(pending.values())
+        return False, results
+
+    try:
+        created = store.create_enrollments(list(pending), enrolled_date, atomic)
+    except (AlreadyEnrolledError, ParentNotFoundError) as exc:
+        # Lost a race with a concurrent enrollment or delete; nothing was stored
+        conflict = pending[tuple(exc.args)]
+        conflict["status"] = "error"
+        conflict["error"] = _race_error(exc)
+        _skip(result for result in pending.values() if result is not conflict)
+        return False, results
+
+    for (user_id, course_id), result, enrollment in zip(pending, pending.values(), created):
+        if enrollment is None:
+            result["status"] = "error"
+            result["error"] = _refused_error(store, user_id, course_id)
+        else:
+            result["status"] = "created"
+            result["enrollment"] = enrollment
+    return True, results
+
+
+def _enrollment_error(user: Optional[dict], course: Optional[dict]) -> Optional[str]:
+    # Same rules, in the same order, as a single POST /api/enrollments/
+    if user is None:
+        return "User not found"
+    if not user["is_active"]:
+        return "Only active users can enroll in courses"
+    if course is None:
+        return "Course not found"
+    if not course["is_open"]:
+        return "Course enrollment is closed"
+    return None
+
+
+def _race_error(exc: Exception) -> str:
+    if isinstance(exc, ParentNotFoundError):
+        return "User not found" if exc.missing == "user" else "Course not found"
+    return "User is already enrolled in this course"
+
+
+def _refused_error(store: Repository, user_id: int, course_id: int) -> str:
+    # The store refused a pair that passed validation: a concurrent request
+    # enrolled it first or deleted its user or course
+    if store.get_user(user_id) is None:
+        return "User not found"
+    if store.get_course(course_id) is None:
+        return "Course not found"
+    return "User is already enrolled in this course"
+
+
+def _skip(results) -> None:
+    for result in results:
+        result["status"] = "skipped"
+
+
+class ImportSummary:
+    """Running totals of an import"""
+
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+
+    def fail(self, line: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> dict:
+        return {"created": self.created, "failed": self.failed, "errors": self.errors}
+
+
+async def run_import(
+    rows: AsyncIterator[Tuple[int, ImportRow]],
+    import_chunk: Callable[[List[Tuple[int, ImportRow]]], None],
+) -> None:
+    """Feed parsed rows to `import_chunk` in IMPORT_CHUNK_SIZE batches, off the event loop"""
+    chunk: List[Tuple[int, ImportRow]] = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) == IMPORT_CHUNK_SIZE:
+            await run_in_threadpool(import_chunk, chunk)
+            chunk = []
+    if chunk:
+        await run_in_threadpool(import_chunk, chunk)
+
+
+def import_users(
+    store: Repository,
+    rows: List[Tuple[int, Union[Tuple[str, str], str]]],
+    summary: ImportSummary,
+    seen_emails: Set[str],
+) -> List[dict]:
+    """Create a chunk of validated (name, email) rows and return the created users.
+
+    `seen_emails` carries the normalized emails of earlier chunks, so a repeated
+    address is rejected without asking the store.
+    """
+    batch: List[Tuple[str, str]] = []
+    lines: List[int] = []
+    for line, row in rows:
+        if isinstance(row, str):
+            summary.fail(line, row)
+            continue
+        key = normalize_email(row[1])
+        if key in seen_emails:
+            summary.fail(line, "Duplicate email in import")
+            continue
+        seen_emails.add(key)
+        batch.append(row)
+        lines.append(line)
+    created = []
+    for line, user in zip(lines, store.create_users(batch)):
+        if user is None:
+            summary.fail(line, "Email already registered")
+        else:
+            summary.created += 1
+            created.append(user)
+    return created
+
+
+def import_courses(
+    store: Repository,
+    rows: List[Tuple[int, Union[Tuple[str, str], str]]],
+    summary: ImportSummary,
+) -> List[dict]:
+    """Create a chunk of validated (title, description) rows and return the created courses"""
+    batch: List[Tuple[str, str]] = []
+    for line, row in rows:
+        if isinstance(row, str):
+            summary.fail(line, row)
+        else:
+            batch.append(row)
+    created = store.create_courses(batch)
+    summary.created += len(created)
+    return created
+
+
+def iter_export(
+    list_page: Callable[[int, int], Page], fields: Sequence[str], export_format: str
+) -> Iterator[bytes]:
+    """Stream a whole table page by page as NDJSON or CSV"""
+    if export_format == "csv":
+        yield (",".join(fields) + "\r\n").encode()
+    after_id = 0
+    while True:
+        records, next_after_id = list_page(after_id, EXPORT_PAGE_SIZE)
+        if export_format == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows([[record[field] for field in fields] for record in records])
+            yield buffer.getvalue().encode()
+        else:
+            yield "".join(
+                json.dumps({field: record[field] for field in fields}, ensure_ascii=False) + "\n"
+                for record in records
+            ).encode()
+        if next_after_id is None:
+            return
+        after_id = next_after_id
\ No newline at end of file
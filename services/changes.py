@@ -0,0 +1,173 @@
+"""Sequence-numbered log of the writes made through the API.
+
+Every create, update and delete gets the next sequence number. The newest
+`size` changes are kept in a ring, so a consumer that remembers the last
+number it saw fetches only what came after it. A consumer that fell further
+behind than the ring reaches is told so and has to reload.
+
+Records reach the log after the store has committed them, so two writes to
+the same record can arrive in the opposite order. Each record's latest
+logged version is kept while it is in the ring, and a change older than it
+is dropped: the feed may skip an intermediate state, but never ends on a
+stale one. A delete is final, so nothing after it is logged for that record.
+
+Sequence numbers restart with the process while a durable store keeps its
+data, so the log numbers its changes under an epoch that is new in each
+process, and again whenever the store is swapped. A consumer
+sends back the epoch its position came from and is told to reload when it
+no longer matches.
+
+Like the response cache the log lives in one process and only sees that
+process's writes, so it is disabled when several workers share the store.
+"""
+import asyncio
+import math
+import secrets
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Type
+from pydantic import BaseModel
+from services.config import settings
+from services.metrics import CallbackMetric, registry
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+
+
+class ChangesExpired(Exception):
+    """The requested position is no longer in the log (or was never in it)"""
+
+    def __init__(self, latest: int, epoch: str):
+        super().__init__(latest, epoch)
+        self.latest = latest
+        self.epoch = epoch
+
+
+def snapshot(model: Type[BaseModel], record: dict) -> dict:
+    """Copy of a record's public fields, unaffected by later writes to it"""
+    return {field: record[field] for field in model.model_fields}
+
+
+class Subscriber:
+    """Wakes one waiting stream, on its own event loop, when changes arrive"""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def notify(self) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            # The subscriber's loop has already closed
+            pass
+
+
+class ChangeLog:
+    """Ring of the latest `size` changes; sequence numbers start at 1"""
+
+    def __init__(self, size: int = 10000):
+        self.size = size
+        self._ring: List[Optional[dict]] = [None] * size
+        self._lock = threading.Lock()
+        self._subscribers: Set[Subscriber] = set()
+        # (entity, ID) -> (seq, version) of the record's newest change in the ring
+        self._logged: Dict[Tuple[str, int], Tuple[int, float]] = {}
+        self.epoch = secrets.token_hex(8)
+        self.latest = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def record(self, entity: str, op: str, record_id: int, data: Optional[dict] = None) -> None:
+        self.record_many(entity, op, [(record_id, data)])
+
+    def record_many(self, entity: str, op: str, records: Iterable[Tuple[int, Optional[dict]]]) -> None:
+        if not self.size:
+            return
+        at = datetime.now(timezone.utc)
+        with self._lock:
+            for record_id, data in records:
+                key = (entity, record_id)
+                version = self._version(op, data)
+                logged = self._logged.get(key)
+                if logged is not None and version is not None and version <= logged[1]:
+                    continue
+                self.latest += 1
+                slot = self.latest % self.size
+                evicted = self._ring[slot]
+                if evicted is not None:
+                    evicted_key = (evicted["entity"], evicted["id"])
+                    if self._logged.get(evicted_key, (None,))[0] == evicted["seq"]:
+                        del self._logged[evicted_key]
+                self._ring[slot] = {
+                    "seq": self.latest, "at": at, "entity": entity, "op": op, "id": record_id, "data": data,
+                }
+                if version is not None:
+                    self._logged[key] = (self.latest, version)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.notify()
+
+    @staticmethod
+    def _version(op: str, data: Optional[dict]) -> Optional[float]:
+        """Order of a change among those to its record; None when unknown"""
+        if op == DELETED:
+            return math.inf
+        if data is None:
+            return None
+        return data.get("version")
+
+    def read(self, since: int, limit: int, epoch: Optional[str] = None) -> List[dict]:
+        """Up to `limit` changes numbered above `since`, oldest first
+
+        `since` counts from another epoch's numbering when `epoch` differs
+        from this log's, so nothing can be read after it.
+        """
+        with self._lock:
+            latest = self.latest
+            if epoch is not None and epoch != self.epoch:
+                raise ChangesExpired(latest, self.epoch)
+            if since > latest or since < latest - self.size:
+                raise ChangesExpired(latest, self.epoch)
+            end = min(latest, since + limit)
+            return [self._ring[seq % self.size] for seq in range(since + 1, end + 1)]
+
+    def restart(self) -> None:
+        """Forget every change and start a new epoch; used when the store is swapped"""
+        with self._lock:
+            self._ring = [None] * self.size
+            self._logged.clear()
+            self.epoch = secrets.token_hex(8)
+            self.latest = 0
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.notify()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber()
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+
+change_log = ChangeLog(settings.change_log_size if settings.workers == 1 else 0)
+
+registry.register(CallbackMetric(
+    "edutrack_change_log_sequence", "Sequence number of the latest recorded change", "gauge",
+    lambda: change_log.latest,
+))
+registry.register(CallbackMetric(
+    "edutrack_change_log_subscribers", "Open change streams", "gauge",
+    lambda: change_log.subscribers,
+))
\ No newline at end of file
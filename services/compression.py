@@ -0,0 +1,179 @@
+"""Negotiated compression of response bodies.
+
+Responses of a compressible type are compressed with the encoding the client
+rates highest in Accept-Encoding: zstd or brotli when their optional packages
+(`zstandard`, `brotli`) are installed, otherwise gzip. Bodies below the size
+threshold go out as they are, since compressing them saves little and costs
+a round of CPU on both ends.
+
+Streamed bodies are compressed chunk by chunk and each chunk is flushed, so
+the client can decode a chunk as soon as it arrives. Compression levels lean
+towards speed: JSON shrinks most of the way at low levels, and higher ones
+would make compression the slowest part of a list request.
+
+Event streams are left alone, since an encoder holding back bytes would delay
+their events. A compressed body is a different representation, so its ETag
+gets the coding appended (`"<tag>-gzip"`): a strong tag must not name two
+byte sequences. If-None-Match strips the suffix again, so a client holding
+either form of a tag still gets its 304.
+"""
+import zlib
+from typing import Callable, Dict, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from services.negotiation import choose
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it br is not offered
+    brotli = None
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; without it zstd is not offered
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/csv", "text/plain", "text/html")
+
+# Every coding an ETag suffix can name, offered here or not, since the client
+# may hold a tag from a server that had brotli or zstandard installed
+ETAG_CODINGS = ("zstd", "br", "gzip")
+
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+
+class GzipEncoder:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        """Compressed data, flushed so the client can decode all of it; `final` ends the stream"""
+        output = self._compressor.compress(data)
+        return output + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class BrotliEncoder:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        output = self._compressor.process(data)
+        return output + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class ZstdEncoder:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        output = self._compressor.compress(data)
+        return output + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+
+# Offered encodings, most preferred first
+ENCODERS: Dict[str, Callable] = {}
+if zstandard is not None:
+    ENCODERS["zstd"] = ZstdEncoder
+if brotli is not None:
+    ENCODERS["br"] = BrotliEncoder
+ENCODERS["gzip"] = GzipEncoder
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """etag of the body sent with this content coding"""
+    if not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def decoded_etag(etag: str) -> str:
+    """etag with any content-coding suffix removed"""
+    for encoding in ETAG_CODINGS:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Encoding to use for a client sending this Accept-Encoding, or None for none"""
+    return choose(accept_encoding, tuple(ENCODERS))
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing response bodies of at least `minimum_size` bytes"""
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, CompressingSend(send, encoding, self.minimum_size))
+
+
+class CompressingSend:
+    """The `send` of one response, compressing its body on the way out"""
+
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Optional[dict] = None
+        self.passthrough = False
+        self.pending = []
+        self.pending_size = 0
+        self.encoder = None
+
+    async def __call__(self, message: dict) -> None:
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            if "content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                self.passthrough = True
+                await self.send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.encoder is not None:
+            compressed = self.encoder.encode(body, not more_body)
+            await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            return
+        # Hold the start of the body until it reaches the threshold or ends
+        self.pending.append(body)
+        self.pending_size += len(body)
+        if self.pending_size < self.minimum_size:
+            if more_body:
+                return
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": b"".join(self.pending)})
+            return
+
+        self.encoder = ENCODERS[self.encoding]()
+        compressed = self.encoder.encode(b"".join(self.pending), not more_body)
+        self.pending = []
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        if "etag" in headers:
+            headers["ETag"] = encoded_etag(headers["etag"], self.encoding)
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(compressed))
+        await self.send(self.start)
+        await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
\ No newline at end of file
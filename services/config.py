@@ -0,0 +1,99 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+from services.repository import CASCADE, DELETE_POLICIES
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass
+class Settings:
+    """Runtime configuration, read from EDUTRACK_* environment variables"""
+
+    # "memory" or "sqlite"
+    storage: str = "memory"
+    # Slotted records and column arrays instead of dicts in the memory engine
+    compact_records: bool = False
+    # Memory engine: directory for snapshots and the operation log; unset keeps
+    # everything in memory only
+    data_dir: Optional[str] = None
+    # "always" (writers wait for fsync), "interval" (fsync per batch) or "never"
+    fsync: str = "interval"
+    # Seconds between snapshots; 0 only snapshots on shutdown
+    snapshot_interval: float = 300.0
+    sqlite_path: str = "edutrack.db"
+    sqlite_pool_size: int = 5
+    seed_sample_data: bool = True
+    # Encode list responses straight from stored records instead of re-validating them
+    fast_serialization: bool = True
+    # Compress responses with the best encoding the client accepts
+    compression: bool = True
+    # Smaller bodies are sent uncompressed
+    compression_min_size: int = 1024
+    # Encoded GET-by-id responses kept in the LRU cache; 0 disables caching
+    response_cache_size: int = 10000
+    # What deleting a user or course does to its enrollments: "cascade",
+    # "restrict" or "soft-delete"
+    delete_policy: str = CASCADE
+    # Server processes started by `python main.py`; more than one needs a store
+    # every process can reach, i.e. the SQLite engine
+    workers: int = 1
+    # Record per-route request metrics, served at /metrics
+    metrics: bool = True
+    # Shared secret for the protected admin endpoints (X-Admin-Token); unset
+    # disables them
+    admin_token: Optional[str] = None
+    # Fraction of requests run under cProfile
+    profile_sample_rate: float = 0.0
+    # Keep stack samples of requests slower than this; 0 disables the sampler
+    profile_slow_ms: float = 0.0
+    profile_interval_ms: float = 5.0
+    # Profiles kept for /api/admin/profiles; the oldest are dropped first
+    profile_buffer_size: int = 50
+    # Changes kept for /api/changes; consumers further behind must reload.
+    # 0 disables the change log
+    change_log_size: int = 10000
+    # Versions whose deletes /api/admin/compact keeps for updated_since reads;
+    # a reader further behind must reload
+    deletion_retention: int = 100000
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            storage=os.environ.get("EDUTRACK_STORAGE", cls.storage),
+            compact_records=_env_bool("EDUTRACK_COMPACT_RECORDS", cls.compact_records),
+            data_dir=os.environ.get("EDUTRACK_DATA_DIR") or None,
+            fsync=os.environ.get("EDUTRACK_FSYNC", cls.fsync),
+            snapshot_interval=float(os.environ.get("EDUTRACK_SNAPSHOT_INTERVAL", cls.snapshot_interval)),
+            sqlite_path=os.environ.get("EDUTRACK_SQLITE_PATH", cls.sqlite_path),
+            sqlite_pool_size=int(os.environ.get("EDUTRACK_SQLITE_POOL_SIZE", cls.sqlite_pool_size)),
+            seed_sample_data=_env_bool("EDUTRACK_SEED_SAMPLE_DATA", cls.seed_sample_data),
+            fast_serialization=_env_bool("EDUTRACK_FAST_SERIALIZATION", cls.fast_serialization),
+            compression=_env_bool("EDUTRACK_COMPRESSION", cls.compression),
+            compression_min_size=int(os.environ.get("EDUTRACK_COMPRESSION_MIN_SIZE", cls.compression_min_size)),
+            response_cache_size=int(os.environ.get("EDUTRACK_RESPONSE_CACHE_SIZE", cls.response_cache_size)),
+            delete_policy=os.environ.get("EDUTRACK_DELETE_POLICY", cls.delete_policy),
+            workers=int(os.environ.get("EDUTRACK_WORKERS", cls.workers)),
+            metrics=_env_bool("EDUTRACK_METRICS", cls.metrics),
+            admin_token=os.environ.get("EDUTRACK_ADMIN_TOKEN") or None,
+            profile_sample_rate=float(os.environ.get("EDUTRACK_PROFILE_SAMPLE_RATE", cls.profile_sample_rate)),
+            profile_slow_ms=float(os.environ.get("EDUTRACK_PROFILE_SLOW_MS", cls.profile_slow_ms)),
+            profile_interval_ms=float(os.environ.get("EDUTRACK_PROFILE_INTERVAL_MS", cls.profile_interval_ms)),
+            profile_buffer_size=int(os.environ.get("EDUTRACK_PROFILE_BUFFER_SIZE", cls.profile_buffer_size)),
+            change_log_size=int(os.environ.get("EDUTRACK_CHANGE_LOG_SIZE", cls.change_log_size)),
+            deletion_retention=int(os.environ.get("EDUTRACK_DELETION_RETENTION", cls.deletion_retention)),
+        )
+
+    def __post_init__(self):
+        if self.delete_policy not in DELETE_POLICIES:
+            raise ValueError(f"Unknown delete policy: {self.delete_policy}")
+        if self.workers > 1 and self.storage != "sqlite":
+            raise ValueError("Multiple workers need the shared sqlite storage engine")
+
+
+settings = Settings.from_env()
\ No newline at end of file
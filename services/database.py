@@ -1,60 +1,64 @@
 from datetime import date
-from typing import Dict, List
+from typing import Optional
+from services.async_store import AsyncRepository
+from services.changes import change_log
+from services.config import Settings, settings
+from services.memory_store import InMemoryRepository
+from services.repository import DuplicateEmailError, Repository
+from services.response_cache import response_cache
 
-# In-memory storage
-users_db: Dict[int, dict] = {}
-courses_db: Dict[int, dict] = {}
-enrollments_db: Dict[int, dict] = {}
 
-# Counters for IDs
-user_id_counter = {"current": 0}
-course_id_counter = {"current": 0}
-enrollment_id_counter = {"current": 0}
+def create_store(config: Settings) -> Repository:
+    """Build the storage engine selected by the configuration"""
+    if config.storage == "memory" and config.data_dir:
+        from services.persistence import PersistentMemoryRepository
+        return PersistentMemoryRepository(
+            config.data_dir, config.fsync, config.snapshot_interval, compact=config.compact_records
+        )
+    if config.storage == "memory":
+        return InMemoryRepository(compact=config.compact_records)
+    if config.storage == "sqlite":
+        from services.sqlite_store import SQLiteRepository
+        return SQLiteRepository(config.sqlite_path, config.sqlite_pool_size)
+    raise ValueError(f"Unknown storage engine: {config.storage}")
 
 
-def get_next_user_id() -> int:
-    user_id_counter["current"] += 1
-    return user_id_counter["current"]
+_store: Optional[Repository] = None
+_async_store: Optional[AsyncRepository] = None
 
-def get_next_course_id() -> int:
-    course_id_counter["current"] += 1
-    return course_id_counter["current"]
 
-def get_next_enrollment_id() -> int:
-    enrollment_id_counter["current"] += 1
-    return enrollment_id_counter["current"]
+def get_store() -> Repository:
+    """Active storage engine"""
+    return _store
+
+def get_async_store() -> AsyncRepository:
+    """Active storage engine, awaitable; used by the routes as a FastAPI dependency"""
+    return _async_store
+
+def set_store(store: Repository) -> Repository:
+    """Swap the active storage engine, returning the previous one"""
+    global _store, _async_store
+    previous, _store = _store, store
+    _async_store = AsyncRepository(store)
+    response_cache.clear()
+    change_log.restart()
+    return previous
 
 
 # Initialize with sample data
-def init_sample_data():
+def init_sample_data(store: Repository):
     """Initialize database with sample data"""
-    # Sample user
-    user_id = get_next_user_id()
-    users_db[user_id] = {
-        "id": user_id,
-        "name": "Alice",
-        "email": "alice@example.com",
-        "is_active": True
-    }
-    
-    # Sample course
-    course_id = get_next_course_id()
-    courses_db[course_id] = {
-        "id": course_id,
-        "title": "Python Basics",
-        "description": "Learn Python",
-        "is_open": True
-    }
-    
-    # Sample enrollment
-    enrollment_id = get_next_enrollment_id()
-    enrollments_db[enrollment_id] = {
-        "id": enrollment_id,
-        "user_id": user_id,
-        "course_id": course_id,
-        "enrolled_date": date(2025, 9, 16),
-        "completed": False
-    }
-
-# Initialize sample data on module load
-init_sample_data()
\ No newline at end of file
+    try:
+        user = store.create_user("Alice", "alice@example.com")
+    except DuplicateEmailError:
+        # Another worker sharing the store seeded it first
+        return
+    course = store.create_course("Python Basics", "Learn Python")
+    store.create_enrollment(user["id"], course["id"], date(2025, 9, 16))
+
+
+set_store(create_store(settings))
+
+# Seed an empty store on module load
+if settings.seed_sample_data and not _store.list_users(limit=1)[0]:
+    init_sample_data(_store)
\ No newline at end of file
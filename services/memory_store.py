@@ -0,0 +1,1034 @@
+import copy
+import itertools
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import date
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+from services.locks import LockStripes
+from services.metrics import STORE_LOOKUPS, STORE_ROWS_EXAMINED, TimedLock
+from services.pagination import MAX_SCAN_FACTOR
+from services.records import CourseRecord, EnrollmentColumns, UserRecord
+from services.repository import (
+    CASCADE, RESTRICT, SOFT_DELETE, AlreadyEnrolledError, Delta, DeltaExpiredError, DuplicateEmailError,
+    HasEnrollmentsError, IdRangeError, KeyPage, Page, ParentNotFoundError, Repository, delta_page, normalize_email
+)
+from services.text_search import CourseSearchIndex
+from services.user_search import NAME, PrefixIndex, UserSearch, domain_key, name_keys, page_matches
+from services.versions import VersionClock, VersionIndex
+
+
+# Largest ID the engine stores: compact ID lists and record columns are
+# array("I"), and _pair_key packs two IDs into one int
+MAX_ID = 2 ** 32 - 1
+
+
+def _pair_key(user_id: int, course_id: int) -> Hashable:
+    # One int instead of a tuple of two keeps the pair index small. IDs out of
+    # range would alias another pair; no stored pair has one, so they get a
+    # tuple that matches nothing
+    if 0 <= user_id <= MAX_ID and 0 <= course_id <= MAX_ID:
+        return user_id << 32 | course_id
+    return user_id, course_id
+
+
+def _check_id(entity: str, record_id: int) -> int:
+    if not 1 <= record_id <= MAX_ID:
+        raise IdRangeError(f"{entity} ID {record_id} is outside 1..{MAX_ID}, the memory engine's ID space")
+    return record_id
+
+
+def _check_id_range(entity: str, ids: Sequence[int]) -> None:
+    # IDs ascend, so the ends bound the rest
+    if len(ids):
+        _check_id(entity, ids[0])
+        _check_id(entity, ids[-1])
+
+
+def _insert_id(ids: List[int], record_id: int) -> None:
+    # IDs are allocated in increasing order, so this is almost always an append
+    if not ids or ids[-1] < record_id:
+        ids.append(record_id)
+    else:
+        insort(ids, record_id)
+
+def _delete_id(ids: List[int], record_id: int) -> None:
+    position = bisect_left(ids, record_id)
+    if position < len(ids) and ids[position] == record_id:
+        del ids[position]
+
+def _paginate(
+    rows: Dict[int, dict],
+    ids: Sequence[int],
+    after_id: int,
+    limit: int,
+    predicate: Optional[Callable[[dict], bool]] = None,
+) -> Page:
+    """Return up to `limit` rows with an ID above `after_id`, plus the ID to resume after.
+
+    The resume ID is None once the end of `ids` has been reached. With a predicate
+    the scan is capped at MAX_SCAN_FACTOR * limit rows, so a page may come back
+    short (or empty) while still carrying a resume ID.
+    """
+    start = bisect_right(ids, after_id)
+    end = len(ids)
+    if predicate is not None:
+        end = min(end, start + limit * MAX_SCAN_FACTOR)
+    page = []
+    position = start
+    while position < end and len(page) < limit:
+        # A row deleted since its ID was read is skipped
+        row = rows.get(ids[position])
+        position += 1
+        if row is not None and (predicate is None or predicate(row)):
+            page.append(row)
+    if predicate is None:
+        STORE_LOOKUPS.inc(("index",))
+    else:
+        STORE_LOOKUPS.inc(("scan",))
+        STORE_ROWS_EXAMINED.inc((), position - start)
+    if position >= len(ids):
+        return page, None
+    return page, ids[position - 1]
+
+def _add_to_index(
+    index: Dict[int, List[int]], key: int, record_id: int, new_ids: Callable[[], List[int]]
+) -> None:
+    ids = index.get(key)
+    if ids is None:
+        ids = index[key] = new_ids()
+    _insert_id(ids, record_id)
+
+def _discard_from_index(index: Dict[int, List[int]], key: int, record_id: int) -> None:
+    ids = index.get(key)
+    if ids is None:
+        return
+    _delete_id(ids, record_id)
+    if not ids:
+        del index[key]
+
+
+class InMemoryRepository(Repository):
+    """Dict-backed engine with hash indexes; state lives only as long as the process.
+
+    Safe to share between threadpool workers. IDs come from itertools.count, whose
+    next() is atomic. Writers lock only what they touch:
+
+    - user stripes serialize updates and deletes of the same user
+    - email stripes guard the uniqueness of normalized emails
+    - enrollment stripes, keyed by user ID, guard (user, course) uniqueness and
+      the user's adjacency list; course stripes serialize writes to the course
+      and guard its adjacency list and its completion counter. A new enrollment
+      holds both and checks its user and course exist, so it cannot land after
+      a delete of either has collected the enrollments to remove
+    - the search lock serializes course text changes with the full-text index
+    - a per-table lock covers the short edits of the ordered ID lists
+
+    Locks are always taken in that order. Each write holds a version from the
+    clock while it runs, under the locks of the record it changes. Reads take
+    no locks.
+
+    With `compact`, users and courses are slotted records, enrollments live in
+    EnrollmentColumns, and the ordered ID lists and adjacency lists are
+    machine-int arrays. Records still support the dict-style access used by the
+    routes.
+    """
+
+    def __init__(self, lock_stripes: int = 64, compact: bool = False):
+        self.compact = compact
+        self.users_db: Dict[int, dict] = {}
+        self.courses_db: Dict[int, dict] = {}
+        self.enrollments_db: Dict[int, dict] = EnrollmentColumns() if compact else {}
+        self._user_type = UserRecord if compact else dict
+        self._course_type = CourseRecord if compact else dict
+
+        # IDs of each table in ascending order, used for cursor pagination
+        id_list = (lambda: array("I")) if compact else list
+        self.user_ids: List[int] = id_list()
+        self.course_ids: List[int] = id_list()
+        self.enrollment_ids: List[int] = id_list()
+
+        # Unique index over users_db, keyed by normalized email
+        self.users_by_email: Dict[str, int] = {}
+
+        # Sorted prefix indexes over users_db for search, guarded by the user
+        # table lock
+        self.users_by_name = PrefixIndex()
+        self.users_by_domain = PrefixIndex()
+
+        # Secondary indexes over enrollments_db
+        # Enrollment IDs per user and per course, kept sorted so a page is a
+        # bisect to the cursor rather than a sort of the whole list
+        self._adjacency = id_list
+        self.enrollments_by_user: Dict[int, List[int]] = {}
+        self.enrollments_by_course: Dict[int, List[int]] = {}
+        self.enrollment_by_pair: Dict[int, int] = {}
+
+        # Completed enrollments per course; enrolled counts are the sizes of
+        # enrollments_by_course
+        self.completed_by_course: Dict[int, int] = {}
+
+        # Full-text index over course titles and descriptions, kept current by
+        # course writes and rebuilt in one pass by bulk loads. Never built on a
+        # search: the engine runs on the event loop, so that would stall it
+        self._search_index = CourseSearchIndex()
+
+        # Delta reads: every write takes a version, and each table's records,
+        # deleted ones included, are kept in version order
+        self.clock = VersionClock()
+        self.user_versions = VersionIndex()
+        self.course_versions = VersionIndex()
+        self.enrollment_versions = VersionIndex()
+        # Versions of the deletes of users and courses; deleted enrollments as
+        # (version, user ID, course ID), and their IDs per user and per course
+        # in the order they were deleted
+        self.deleted_users: Dict[int, int] = {}
+        self.deleted_courses: Dict[int, int] = {}
+        self.deleted_enrollments: Dict[int, Tuple[int, int, int]] = {}
+        self.deleted_enrollments_by_user: Dict[int, List[int]] = {}
+        self.deleted_enrollments_by_course: Dict[int, List[int]] = {}
+        # Tombstones at or below this version have been pruned
+        self.deletion_horizon = 0
+
+        # ID sequences
+        self.user_id_sequence = itertools.count(1)
+        self.course_id_sequence = itertools.count(1)
+        self.enrollment_id_sequence = itertools.count(1)
+
+        # Locks
+        self.email_locks = LockStripes(lock_stripes, "email")
+        self.user_locks = LockStripes(lock_stripes, "user")
+        self.enrollment_locks = LockStripes(lock_stripes, "enrollment")
+        self.course_index_locks = LockStripes(lock_stripes, "course")
+        self.search_lock = TimedLock("course_search")
+        self.user_table_lock = TimedLock("user_table")
+        self.course_table_lock = TimedLock("course_table")
+        self.enrollment_table_lock = TimedLock("enrollment_table")
+
+    # Users
+    def create_user(self, name: str, email: str) -> dict:
+        key = normalize_email(email)
+        with self.email_locks.for_key(key):
+            if key in self.users_by_email:
+                raise DuplicateEmailError(email)
+            return self._insert_user(name, email, key)
+
+    def create_users(self, users: List[Tuple[str, str]]) -> List[Optional[dict]]:
+        created = []
+        for name, email in users:
+            key = normalize_email(email)
+            with self.email_locks.for_key(key):
+                if key in self.users_by_email:
+                    created.append(None)
+                else:
+                    created.append(self._insert_user(name, email, key))
+        return created
+
+    def _insert_user(self, name: str, email: str, key: str) -> dict:
+        # Caller holds the email stripe of `key`
+        user_id = _check_id("User", next(self.user_id_sequence))
+        with self.clock.tick() as version:
+            user = self._user_type(
+                id=user_id,
+                name=name,
+                email=email,
+                is_active=True,
+                version=version
+            )
+            self.users_db[user_id] = user
+            self.users_by_email[key] = user_id
+            with self.user_table_lock:
+                _insert_id(self.user_ids, user_id)
+                self._index_user(user_id, name, email)
+            self.user_versions.move(user_id, None, version)
+        return user
+
+    def _index_user(self, user_id: int, name: str, email: str) -> None:
+        self.users_by_name.add(name_keys(name), user_id)
+        self.users_by_domain.add([domain_key(email)], user_id)
+
+    def _unindex_user(self, user_id: int, name: str, email: str) -> None:
+        self.users_by_name.remove(name_keys(name), user_id)
+        self.users_by_domain.remove([domain_key(email)], user_id)
+
+    def _reindex_user(self, user: dict, old_name: str, old_email: str) -> None:
+        if user["name"] == old_name and user["email"] == old_email:
+            return
+        with self.user_table_lock:
+            self._unindex_user(user["id"], old_name, old_email)
+            self._index_user(user["id"], user["name"], user["email"])
+
+    def get_user(self, user_id: int) -> Optional[dict]:
+        return self.users_db.get(user_id)
+
+    def get_users_many(self, user_ids: Iterable[int]) -> Dict[int, dict]:
+        found = {user_id: self.users_db.get(user_id) for user_id in user_ids}
+        return {user_id: user for user_id, user in found.items() if user is not None}
+
+    def find_user_by_email(self, email: str) -> Optional[dict]:
+        user_id = self.users_by_email.get(normalize_email(email))
+        if user_id is None:
+            return None
+        return self.users_db.get(user_id)
+
+    def update_user(self, user_id: int, changes: dict) -> Optional[dict]:
+        with self.user_locks.for_key(user_id):
+            user = self.users_db.get(user_id)
+            if user is None:
+                return None
+            old_name, old_email, old_version = user["name"], user["email"], user["version"]
+            old_key = normalize_email(old_email)
+            new_key = normalize_email(changes.get("email", old_email))
+            with self.clock.tick() as version:
+                # The version goes in last, after the fields it describes
+                changes = {**changes, "version": version}
+                if new_key != old_key:
+                    with self.email_locks.hold((old_key, new_key)):
+                        if new_key in self.users_by_email:
+                            raise DuplicateEmailError(changes["email"])
+                        self.users_by_email[new_key] = user_id
+                        del self.users_by_email[old_key]
+                        user.update(changes)
+                else:
+                    user.update(changes)
+                self._reindex_user(user, old_name, old_email)
+                self.user_versions.move(user_id, old_version, version)
+            return user
+
+    def delete_user(self, user_id: int, policy: str = CASCADE) -> bool:
+        if policy == SOFT_DELETE:
+            return self.update_user(user_id, {"is_active": False}) is not None
+        with self.user_locks.for_key(user_id):
+            user = self.users_db.get(user_id)
+            if user is None:
+                return False
+            key = normalize_email(user["email"])
+            with self.clock.tick() as version:
+                with self.email_locks.for_key(key), self.enrollment_locks.for_key(user_id):
+                    # New enrollments of this user wait on the stripe, so the
+                    # dependents found here are all of them
+                    dependents = list(self.enrollments_by_user.get(user_id, ()))
+                    if dependents and policy == RESTRICT:
+                        raise HasEnrollmentsError(user_id)
+                    del self.users_db[user_id]
+                    del self.users_by_email[key]
+                    self.deleted_users[user_id] = version
+                with self.user_table_lock:
+                    _delete_id(self.user_ids, user_id)
+                    self._unindex_user(user_id, user["name"], user["email"])
+                self.user_versions.move(user_id, user["version"], version)
+        for enrollment_id in dependents:
+            self.delete_enrollment(enrollment_id)
+        return True
+
+    def list_users(
+        self, after_id: int = 0, limit: int = 100, is_active: Optional[bool] = None
+    ) -> Page:
+        predicate = None
+        if is_active is not None:
+            predicate = lambda user: user["is_active"] == is_active
+        return _paginate(self.users_db, self.user_ids, after_id, limit, predicate)
+
+    def search_users(
+        self,
+        name: Optional[str] = None,
+        domain: Optional[str] = None,
+        after: Tuple[str, int] = ("", 0),
+        limit: int = 100,
+    ) -> KeyPage:
+        search = UserSearch.parse(name, domain)
+        if search is None:
+            return [], None
+        index = self.users_by_name if search.kind == NAME else self.users_by_domain
+        entries = (
+            (key, user_id, self.users_db.get(user_id))
+            for key, user_id in index.scan(search.prefix, search.start(after))
+        )
+        STORE_LOOKUPS.inc(("index",))
+        return page_matches(search, entries, limit)
+
+    def list_user_changes(self, since: int = 0, limit: int = 100) -> Delta:
+        return self._changes(self.user_versions, self.users_db, since, limit, lambda user_id: {"id": user_id})
+
+    # Courses
+    def create_course(self, title: str, description: str) -> dict:
+        course_id = _check_id("Course", next(self.course_id_sequence))
+        with self.clock.tick() as version:
+            course = self._course_type(
+                id=course_id,
+                title=title,
+                description=description,
+                is_open=True,
+                version=version
+            )
+            with self.search_lock:
+                self.courses_db[course_id] = course
+                self._search_index.add(course_id, title, description)
+            with self.course_table_lock:
+                _insert_id(self.course_ids, course_id)
+            self.course_versions.move(course_id, None, version)
+        return course
+
+    def create_courses(self, courses: List[Tuple[str, str]]) -> List[dict]:
+        return [self.create_course(title, description) for title, description in courses]
+
+    def get_course(self, course_id: int) -> Optional[dict]:
+        return self.courses_db.get(course_id)
+
+    def get_courses_many(self, course_ids: Iterable[int]) -> Dict[int, dict]:
+        found = {course_id: self.courses_db.get(course_id) for course_id in course_ids}
+        return {course_id: course for course_id, course in found.items() if course is not None}
+
+    def update_course(self, course_id: int, changes: dict) -> Optional[dict]:
+        with self.course_index_locks.for_key(course_id):
+            course = self.courses_db.get(course_id)
+            if course is None:
+                return None
+            old_version = course["version"]
+            with self.clock.tick() as version:
+                text_changed = "title" in changes or "description" in changes
+                changes = {**changes, "version": version}
+                if not text_changed:
+                    course.update(changes)
+                else:
+                    with self.search_lock:
+                        old_title, old_description = course["title"], course["description"]
+                        course.update(changes)
+                        self._search_index.remove(course_id, old_title, old_description)
+                        self._search_index.add(course_id, course["title"], course["description"])
+                self.course_versions.move(course_id, old_version, version)
+        return course
+
+    def delete_course(self, course_id: int, policy: str = CASCADE) -> bool:
+        if policy == SOFT_DELETE:
+            return self.update_course(course_id, {"is_open": False}) is not None
+        with self.course_index_locks.for_key(course_id):
+            if course_id not in self.courses_db:
+                return False
+            dependents = list(self.enrollments_by_course.get(course_id, ()))
+            if dependents and policy == RESTRICT:
+                raise HasEnrollmentsError(course_id)
+            with self.clock.tick() as version:
+                with self.search_lock:
+                    course = self.courses_db.pop(course_id)
+                    self._search_index.remove(course_id, course["title"], course["description"])
+                self.deleted_courses[course_id] = version
+                self.course_versions.move(course_id, course["version"], version)
+        for enrollment_id in dependents:
+            self.delete_enrollment(enrollment_id)
+        with self.course_index_locks.for_key(course_id):
+            self.completed_by_course.pop(course_id, None)
+        with self.course_table_lock:
+            _delete_id(self.course_ids, course_id)
+        return True
+
+    def list_courses(
+        self, after_id: int = 0, limit: int = 100, is_open: Optional[bool] = None
+    ) -> Page:
+        predicate = None
+        if is_open is not None:
+            predicate = lambda course: course["is_open"] == is_open
+        return _paginate(self.courses_db, self.course_ids, after_id, limit, predicate)
+
+    def list_course_changes(self, since: int = 0, limit: int = 100) -> Delta:
+        return self._changes(
+            self.course_versions, self.courses_db, since, limit, lambda course_id: {"id": course_id}
+        )
+
+    def search_courses(self, query: str, limit: int = 20) -> List[dict]:
+        STORE_LOOKUPS.inc(("index",))
+        return [course for _, course in self._search_index.search(query, limit, self.courses_db.get)]
+
+    def get_course_stats(self, course_id: int) -> Optional[dict]:
+        if course_id not in self.courses_db:
+            return None
+        return self._course_stats(course_id)
+
+    def list_course_stats(self, after_id: int = 0, limit: int = 100) -> Page:
+        courses, next_after_id = _paginate(self.courses_db, self.course_ids, after_id, limit)
+        return [self._course_stats(course["id"]) for course in courses], next_after_id
+
+    def _course_stats(self, course_id: int) -> dict:
+        return {
+            "course_id": course_id,
+            "enrolled": len(self.enrollments_by_course.get(course_id, ())),
+            "completed": self.completed_by_course.get(course_id, 0),
+        }
+
+    # Enrollments
+    def create_enrollment(self, user_id: int, course_id: int, enrolled_date: date) -> dict:
+        with self.enrollment_locks.for_key(user_id), self.course_index_locks.for_key(course_id):
+            if _pair_key(user_id, course_id) in self.enrollment_by_pair:
+                raise AlreadyEnrolledError(user_id, course_id)
+            missing = self._missing_parent(user_id, course_id)
+            if missing is not None:
+                raise ParentNotFoundError(user_id, course_id, missing)
+            return self._insert_enrollment(user_id, course_id, enrolled_date)
+
+    def create_enrollments(
+        self, pairs: List[Tuple[int, int]], enrolled_date: date, atomic: bool = False
+    ) -> List[Optional[dict]]:
+        user_stripes = self.enrollment_locks.hold(user_id for user_id, _ in pairs)
+        course_stripes = self.course_index_locks.hold(course_id for _, course_id in pairs)
+        with user_stripes, course_stripes:
+            if atomic:
+                seen = set()
+                for pair in pairs:
+                    if _pair_key(*pair) in self.enrollment_by_pair or pair in seen:
+                        raise AlreadyEnrolledError(*pair)
+                    missing = self._missing_parent(*pair)
+                    if missing is not None:
+                        raise ParentNotFoundError(*pair, missing)
+                    seen.add(pair)
+            created = []
+            for user_id, course_id in pairs:
+                taken = _pair_key(user_id, course_id) in self.enrollment_by_pair
+                if taken or self._missing_parent(user_id, course_id) is not None:
+                    created.append(None)
+                else:
+                    created.append(self._insert_enrollment(user_id, course_id, enrolled_date))
+            return created
+
+    def _missing_parent(self, user_id: int, course_id: int) -> Optional[str]:
+        # Caller holds the enrollment stripe of `user_id` and the course stripe of
+        # `course_id`. Deletes remove the user or course under the same stripe as
+        # they collect its enrollments, so one passing this check is collected.
+        if user_id not in self.users_db:
+            return "user"
+        if course_id not in self.courses_db:
+            return "course"
+        return None
+
+    def find_enrolled_pairs(self, pairs: Iterable[Tuple[int, int]]) -> Set[Tuple[int, int]]:
+        return {pair for pair in pairs if _pair_key(*pair) in self.enrollment_by_pair}
+
+    def _insert_enrollment(self, user_id: int, course_id: int, enrolled_date: date) -> dict:
+        # Caller holds the enrollment stripe of `user_id` and the course stripe of `course_id`
+        with self.clock.tick() as version:
+            enrollment = self._store_enrollment(
+                _check_id("Enrollment", next(self.enrollment_id_sequence)),
+                user_id, course_id, enrolled_date, False, version
+            )
+            self.enrollment_versions.move(enrollment["id"], None, version)
+        return enrollment
+
+    def _store_enrollment(
+        self,
+        enrollment_id: int,
+        user_id: int,
+        course_id: int,
+        enrolled_date: date,
+        completed: bool,
+        version: int,
+    ) -> dict:
+        # Caller holds the course stripe of `course_id`
+        enrollment = {
+            "id": enrollment_id,
+            "user_id": user_id,
+            "course_id": course_id,
+            "enrolled_date": enrolled_date,
+            "completed": completed,
+            "version": version
+        }
+        self.enrollments_db[enrollment_id] = enrollment
+        self.enrollment_by_pair[_pair_key(user_id, course_id)] = enrollment_id
+        _add_to_index(self.enrollments_by_user, user_id, enrollment_id, self._adjacency)
+        _add_to_index(self.enrollments_by_course, course_id, enrollment_id, self._adjacency)
+        if completed:
+            self.completed_by_course[course_id] = self.completed_by_course.get(course_id, 0) + 1
+        with self.enrollment_table_lock:
+            _insert_id(self.enrollment_ids, enrollment_id)
+        # The stored record, which in compact mode is a view over the columns
+        return self.enrollments_db[enrollment_id]
+
+    def get_enrollment(self, enrollment_id: int) -> Optional[dict]:
+        return self.enrollments_db.get(enrollment_id)
+
+    def get_enrollments_many(self, enrollment_ids: Iterable[int]) -> Dict[int, dict]:
+        found = {
+            enrollment_id: self.enrollments_db.get(enrollment_id) for enrollment_id in enrollment_ids
+        }
+        return {
+            enrollment_id: enrollment for enrollment_id, enrollment in found.items() if enrollment is not None
+        }
+
+    def find_enrollment(self, user_id: int, course_id: int) -> Optional[dict]:
+        enrollment_id = self.enrollment_by_pair.get(_pair_key(user_id, course_id))
+        if enrollment_id is None:
+            return None
+        return self.enrollments_db.get(enrollment_id)
+
+    def update_enrollment(self, enrollment_id: int, changes: dict) -> Optional[dict]:
+        enrollment = self.enrollments_db.get(enrollment_id)
+        if enrollment is None:
+            return None
+        course_id = enrollment["course_id"]
+        with self.course_index_locks.for_key(course_id):
+            if enrollment_id not in self.enrollments_db:
+                # Deleted by a concurrent request, which already settled the counter
+                return None
+            was_completed, old_version = enrollment["completed"], enrollment["version"]
+            with self.clock.tick() as version:
+                enrollment.update({**changes, "version": version})
+                delta = int(enrollment["completed"]) - int(was_completed)
+                if delta:
+                    self.completed_by_course[course_id] = self.completed_by_course.get(course_id, 0) + delta
+                self.enrollment_versions.move(enrollment_id, old_version, version)
+        return enrollment
+
+    def delete_enrollment(self, enrollment_id: int) -> bool:
+        enrollment = self.enrollments_db.get(enrollment_id)
+        if enrollment is None:
+            return False
+        user_id = enrollment["user_id"]
+        course_id = enrollment["course_id"]
+        with self.enrollment_locks.for_key(user_id), self.clock.tick() as version:
+            if self.enrollments_db.pop(enrollment_id, None) is None:
+                # Deleted by a concurrent request
+                return False
+            del self.enrollment_by_pair[_pair_key(user_id, course_id)]
+            _discard_from_index(self.enrollments_by_user, user_id, enrollment_id)
+            self.deleted_enrollments[enrollment_id] = (version, user_id, course_id)
+            self.deleted_enrollments_by_user.setdefault(user_id, []).append(enrollment_id)
+            with self.course_index_locks.for_key(course_id):
+                _discard_from_index(self.enrollments_by_course, course_id, enrollment_id)
+                if enrollment["completed"] and course_id in self.completed_by_course:
+                    self.completed_by_course[course_id] -= 1
+                self.deleted_enrollments_by_course.setdefault(course_id, []).append(enrollment_id)
+            with self.enrollment_table_lock:
+                _delete_id(self.enrollment_ids, enrollment_id)
+            self.enrollment_versions.move(enrollment_id, enrollment["version"], version)
+        return True
+
+    def list_enrollments(
+        self,
+        after_id: int = 0,
+        limit: int = 100,
+        user_id: Optional[int] = None,
+        course_id: Optional[int] = None,
+        completed: Optional[bool] = None,
+    ) -> Page:
+        if user_id is not None and course_id is not None:
+            enrollment_id = self.enrollment_by_pair.get(_pair_key(user_id, course_id))
+            ids = [] if enrollment_id is None else [enrollment_id]
+        elif user_id is not None:
+            ids = self.enrollments_by_user.get(user_id, ())
+        elif course_id is not None:
+            ids = self.enrollments_by_course.get(course_id, ())
+        else:
+            ids = self.enrollment_ids
+        predicate = None
+        if completed is not None:
+            predicate = lambda enrollment: enrollment["completed"] == completed
+        return _paginate(self.enrollments_db, ids, after_id, limit, predicate)
+
+    def list_enrollment_changes(
+        self,
+        since: int = 0,
+        limit: int = 100,
+        user_id: Optional[int] = None,
+        course_id: Optional[int] = None,
+    ) -> Delta:
+        if user_id is None and course_id is None:
+            return self._changes(
+                self.enrollment_versions, self.enrollments_db, since, limit, self._enrollment_tombstone
+            )
+        # One user's or course's enrollments are few: filter them and the
+        # tombstones left under the same key instead of the whole table's index
+        until = self.clock.watermark()
+        if user_id is not None:
+            live = self.get_enrollments_for_user(user_id)
+            gone = self.deleted_enrollments_by_user.get(user_id, ())
+        else:
+            live = self.get_enrollments_for_course(course_id)
+            gone = self.deleted_enrollments_by_course.get(course_id, ())
+        entries = [
+            (enrollment["version"], enrollment, None) for enrollment in live
+            if since < enrollment["version"] <= until and course_id in (None, enrollment["course_id"])
+        ]
+        if since:
+            for enrollment_id in list(gone):
+                deleted = self.deleted_enrollments.get(enrollment_id)
+                if deleted is None:
+                    # Pruned meanwhile; the horizon check below refuses this read
+                    continue
+                version, _, deleted_course_id = deleted
+                if since < version <= until and course_id in (None, deleted_course_id):
+                    entries.append((version, None, self._enrollment_tombstone(enrollment_id)))
+        self._check_horizon(since)
+        entries.sort(key=lambda entry: entry[0])
+        return delta_page(entries[:limit + 1], limit, until)
+
+    def _enrollment_tombstone(self, enrollment_id: int) -> Optional[dict]:
+        deleted = self.deleted_enrollments.get(enrollment_id)
+        if deleted is None:
+            # Its delete is still running and will be read with its own version
+            return None
+        _, user_id, course_id = deleted
+        return {"id": enrollment_id, "user_id": user_id, "course_id": course_id}
+
+    def get_enrollments_for_user(self, user_id: int) -> List[dict]:
+        return self._enrollments_from_index(self.enrollments_by_user, user_id)
+
+    def get_enrollments_for_course(self, course_id: int) -> List[dict]:
+        return self._enrollments_from_index(self.enrollments_by_course, course_id)
+
+    def _enrollments_from_index(self, index: Dict[int, List[int]], key: int) -> List[dict]:
+        # list() copies the IDs in a single C call, so a concurrent writer cannot
+        # change them mid-iteration; rows deleted since then are skipped
+        found = [self.enrollments_db.get(enrollment_id) for enrollment_id in list(index.get(key, ()))]
+        STORE_LOOKUPS.inc(("index",))
+        return [enrollment for enrollment in found if enrollment is not None]
+
+    # Delta reads
+    def _changes(
+        self,
+        index: VersionIndex,
+        rows: Dict[int, dict],
+        since: int,
+        limit: int,
+        tombstone: Callable[[int], Optional[dict]],
+    ) -> Delta:
+        """Records of one table written after `since`, and with since > 0 the deleted ones"""
+        until = self.clock.watermark()
+        entries = []
+        for version, record_id in index.after(since, until, limit + 1):
+            record = rows.get(record_id)
+            entries.append((version, record, tombstone(record_id) if record is None and since else None))
+        self._check_horizon(since)
+        STORE_LOOKUPS.inc(("index",))
+        return delta_page(entries, limit, until)
+
+    def _check_horizon(self, since: int) -> None:
+        # Checked after reading: pruning raises the horizon before it drops
+        # tombstones, so a read that lost some of them is refused here
+        horizon = self.deletion_horizon
+        if 0 < since < horizon:
+            raise DeltaExpiredError(horizon)
+
+    # Maintenance
+    def purge_orphans(self) -> List[int]:
+        # Orphans still sit in the adjacency indexes under their missing
+        # parent, so only index keys are checked, never every enrollment
+        orphans: Set[int] = set()
+        for index, parents in (
+            (self.enrollments_by_user, self.users_db),
+            (self.enrollments_by_course, self.courses_db),
+        ):
+            for parent_id in list(index):
+                if parent_id not in parents:
+                    orphans.update(index.get(parent_id, ()))
+        return [
+            enrollment_id for enrollment_id in sorted(orphans)
+            if self.delete_enrollment(enrollment_id)
+        ]
+
+    def prune_deletions(self, keep: int) -> int:
+        horizon = self.clock.watermark() - keep
+        if horizon <= self.deletion_horizon:
+            return 0
+        return self.discard_deletions(horizon)
+
+    def discard_deletions(self, horizon: int) -> int:
+        """Forget the tombstones at or below `horizon` and refuse delta reads from before it"""
+        self.deletion_horizon = max(self.deletion_horizon, horizon)
+        pruned = 0
+        for deleted, index in (
+            (self.deleted_users, self.user_versions),
+            (self.deleted_courses, self.course_versions),
+        ):
+            expired = {record_id: version for record_id, version in list(deleted.items()) if version <= horizon}
+            for record_id in expired:
+                del deleted[record_id]
+            index.discard(set(expired.values()))
+            pruned += len(expired)
+        expired_enrollments = [
+            (enrollment_id, tombstone) for enrollment_id, tombstone in list(self.deleted_enrollments.items())
+            if tombstone[0] <= horizon
+        ]
+        for enrollment_id, _ in expired_enrollments:
+            del self.deleted_enrollments[enrollment_id]
+        self.enrollment_versions.discard({version for _, (version, _, _) in expired_enrollments})
+        # The per-user and per-course lists are appended to under these stripes
+        for user_id in {user_id for _, (_, user_id, _) in expired_enrollments}:
+            with self.enrollment_locks.for_key(user_id):
+                self._drop_pruned_ids(self.deleted_enrollments_by_user, user_id)
+        for course_id in {course_id for _, (_, _, course_id) in expired_enrollments}:
+            with self.course_index_locks.for_key(course_id):
+                self._drop_pruned_ids(self.deleted_enrollments_by_course, course_id)
+        return pruned + len(expired_enrollments)
+
+    def _drop_pruned_ids(self, index: Dict[int, List[int]], key: int) -> None:
+        kept = [enrollment_id for enrollment_id in index.get(key, ()) if enrollment_id in self.deleted_enrollments]
+        if kept:
+            index[key] = kept
+        else:
+            index.pop(key, None)
+
+    # Restore: used by services.persistence to rebuild state from disk before
+    # the store is shared, so none of these take locks
+    def bulk_load(
+        self, users: Sequence, courses: Sequence, enrollments: Sequence, deleted: Sequence = ((), (), ())
+    ) -> None:
+        """Fill an empty store from column tuples.
+
+        users is (ids, names, emails, is_active flags, versions), courses is
+        (ids, titles, descriptions, is_open flags, versions) and enrollments is
+        (ids, user IDs, course IDs, enrolled-date ordinals, completed flags,
+        versions), all in ascending ID order. Without the versions column, rows
+        get new versions in ID order. deleted holds the tombstones: (ID, version)
+        pairs of users and of courses, and (ID, version, user ID, course ID) of
+        enrollments.
+        """
+        # Refuse before loading anything
+        for entity, table in (("User", users), ("Course", courses), ("Enrollment", enrollments)):
+            _check_id_range(entity, table[0])
+        user_type, course_type = self._user_type, self._course_type
+        ids, names, emails, active, versions = self._with_versions(users, 4)
+        self.users_db.update(
+            (user_id, user_type(id=user_id, name=name, email=email, is_active=bool(is_active), version=version))
+            for user_id, name, email, is_active, version in zip(ids, names, emails, active, versions)
+        )
+        self.user_versions.load(zip(versions, ids))
+        self.user_ids.extend(ids)
+        self.users_by_email.update(zip(map(normalize_email, emails), ids))
+        self.users_by_name.load(
+            (key, user_id) for user_id, name in zip(ids, names) for key in name_keys(name)
+        )
+        self.users_by_domain.load(zip(map(domain_key, emails), ids))
+
+        ids, titles, descriptions, is_open, versions = self._with_versions(courses, 4)
+        self.courses_db.update(
+            (course_id, course_type(
+                id=course_id, title=title, description=description, is_open=bool(open_), version=version
+            ))
+            for course_id, title, description, open_, version in zip(ids, titles, descriptions, is_open, versions)
+        )
+        self.course_ids.extend(ids)
+        self.course_versions.load(zip(versions, ids))
+
+        ids, user_ids, course_ids, days, completed, versions = self._with_versions(enrollments, 5)
+        if self.compact:
+            self.enrollments_db.load(ids, user_ids, course_ids, days, completed, versions)
+        else:
+            # Enrollments share one date object per distinct day
+            dates = {day: date.fromordinal(day) for day in set(days)}
+            self.enrollments_db.update(
+                (enrollment_id, {
+                    "id": enrollment_id,
+                    "user_id": user_id,
+                    "course_id": course_id,
+                    "enrolled_date": dates[day],
+                    "completed": done == 1,
+                    "version": version,
+                })
+                for enrollment_id, user_id, course_id, day, done, version
+                in zip(ids, user_ids, course_ids, days, completed, versions)
+            )
+        self.enrollment_ids.extend(ids)
+        self.enrollment_versions.load(zip(versions, ids))
+        self.enrollment_by_pair.update(
+            (_pair_key(user_id, course_id), enrollment_id)
+            for user_id, course_id, enrollment_id in zip(user_ids, course_ids, ids)
+        )
+        # Group by key first; IDs ascend, so each group is already sorted
+        for index, keys in ((self.enrollments_by_user, user_ids), (self.enrollments_by_course, course_ids)):
+            groups = defaultdict(list)
+            for key, enrollment_id in zip(keys, ids):
+                groups[key].append(enrollment_id)
+            if self.compact:
+                index.update((key, array("I", group)) for key, group in groups.items())
+            else:
+                index.update(groups)
+        for course_id, done in zip(course_ids, completed):
+            if done:
+                self.completed_by_course[course_id] = self.completed_by_course.get(course_id, 0) + 1
+
+        deleted_users, deleted_courses, deleted_enrollments = deleted
+        self.deleted_users.update(deleted_users)
+        self.deleted_courses.update(deleted_courses)
+        self.user_versions.load((version, user_id) for user_id, version in deleted_users)
+        self.course_versions.load((version, course_id) for course_id, version in deleted_courses)
+        for enrollment_id, version, user_id, course_id in deleted_enrollments:
+            self._add_enrollment_tombstone(enrollment_id, version, user_id, course_id)
+        self.enrollment_versions.load((version, enrollment_id) for enrollment_id, version, _, _ in deleted_enrollments)
+        for _, version in itertools.chain(deleted_users, deleted_courses):
+            self.clock.advance(version)
+        self._search_index = CourseSearchIndex()
+        self._search_index.build(self.courses_db.values())
+
+    def _with_versions(self, columns: Sequence, width: int) -> Sequence:
+        """Column tuple with its versions column, which older snapshots lack"""
+        if len(columns) > width:
+            self.clock.advance(max(columns[width], default=0))
+            return columns
+        return (*columns, [self.clock.take() for _ in columns[0]])
+
+    def _add_enrollment_tombstone(self, enrollment_id: int, version: int, user_id: int, course_id: int) -> None:
+        self.clock.advance(version)
+        if enrollment_id not in self.deleted_enrollments:
+            self.deleted_enrollments[enrollment_id] = (version, user_id, course_id)
+            self.deleted_enrollments_by_user.setdefault(user_id, []).append(enrollment_id)
+            self.deleted_enrollments_by_course.setdefault(course_id, []).append(enrollment_id)
+
+    def _restored_version(self, version: Optional[int]) -> int:
+        # Log entries written before versions existed carry none
+        if version is None:
+            return self.clock.take()
+        self.clock.advance(version)
+        return version
+
+    def restore_user(
+        self, user_id: int, name: str, email: str, is_active: bool, version: Optional[int] = None
+    ) -> None:
+        """Insert or overwrite a user with the given ID"""
+        _check_id("User", user_id)
+        version = self._restored_version(version)
+        user = self.users_db.get(user_id)
+        old_version = None
+        if user is None:
+            self.users_db[user_id] = self._user_type(
+                id=user_id, name=name, email=email, is_active=is_active, version=version
+            )
+            _insert_id(self.user_ids, user_id)
+        else:
+            old_version = user["version"]
+            old_key = normalize_email(user["email"])
+            if self.users_by_email.get(old_key) == user_id:
+                del self.users_by_email[old_key]
+            self._unindex_user(user_id, user["name"], user["email"])
+            user.update({"name": name, "email": email, "is_active": is_active, "version": version})
+        self.users_by_email[normalize_email(email)] = user_id
+        self._index_user(user_id, name, email)
+        self.user_versions.move(user_id, old_version, version)
+
+    def discard_user(self, user_id: int, version: Optional[int] = None) -> None:
+        """Remove a user without touching its enrollments"""
+        version = self._restored_version(version)
+        user = self.users_db.pop(user_id, None)
+        if user is None:
+            # Already gone in the snapshot, tombstone included
+            return
+        key = normalize_email(user["email"])
+        if self.users_by_email.get(key) == user_id:
+            del self.users_by_email[key]
+        self._unindex_user(user_id, user["name"], user["email"])
+        _delete_id(self.user_ids, user_id)
+        self.deleted_users[user_id] = version
+        self.user_versions.move(user_id, user["version"], version)
+
+    def restore_course(
+        self, course_id: int, title: str, description: str, is_open: bool, version: Optional[int] = None
+    ) -> None:
+        """Insert or overwrite a course with the given ID"""
+        _check_id("Course", course_id)
+        version = self._restored_version(version)
+        course = self.courses_db.get(course_id)
+        old_version = None
+        if course is None:
+            self.courses_db[course_id] = self._course_type(
+                id=course_id, title=title, description=description, is_open=is_open, version=version
+            )
+            _insert_id(self.course_ids, course_id)
+        else:
+            old_version = course["version"]
+            self._search_index.remove(course_id, course["title"], course["description"])
+            course.update({"title": title, "description": description, "is_open": is_open, "version": version})
+        self._search_index.add(course_id, title, description)
+        self.course_versions.move(course_id, old_version, version)
+
+    def discard_course(self, course_id: int, version: Optional[int] = None) -> None:
+        """Remove a course without touching its enrollments"""
+        version = self._restored_version(version)
+        course = self.courses_db.pop(course_id, None)
+        if course is not None:
+            self.completed_by_course.pop(course_id, None)
+            _delete_id(self.course_ids, course_id)
+            self.deleted_courses[course_id] = version
+            self.course_versions.move(course_id, course["version"], version)
+            self._search_index.remove(course_id, course["title"], course["description"])
+
+    def restore_enrollment(
+        self,
+        enrollment_id: int,
+        user_id: int,
+        course_id: int,
+        enrolled_date: date,
+        completed: bool,
+        version: Optional[int] = None,
+    ) -> None:
+        """Insert an enrollment with the given ID, or overwrite its completed flag"""
+        for entity, record_id in (("Enrollment", enrollment_id), ("User", user_id), ("Course", course_id)):
+            _check_id(entity, record_id)
+        version = self._restored_version(version)
+        enrollment = self.enrollments_db.get(enrollment_id)
+        if enrollment is None:
+            with self.course_index_locks.for_key(course_id):
+                self._store_enrollment(enrollment_id, user_id, course_id, enrolled_date, completed, version)
+            self.enrollment_versions.move(enrollment_id, None, version)
+            return
+        if enrollment["completed"] != completed:
+            self.completed_by_course[course_id] = (
+                self.completed_by_course.get(course_id, 0) + (1 if completed else -1)
+            )
+        old_version = enrollment["version"]
+        enrollment.update({"completed": completed, "version": version})
+        self.enrollment_versions.move(enrollment_id, old_version, version)
+
+    def discard_enrollment(self, enrollment_id: int, version: Optional[int] = None) -> None:
+        """Remove an enrollment, leaving the pair index alone if the pair was re-enrolled"""
+        version = self._restored_version(version)
+        enrollment = self.enrollments_db.pop(enrollment_id, None)
+        if enrollment is None:
+            return
+        user_id, course_id = enrollment["user_id"], enrollment["course_id"]
+        pair = _pair_key(user_id, course_id)
+        if self.enrollment_by_pair.get(pair) == enrollment_id:
+            del self.enrollment_by_pair[pair]
+        _discard_from_index(self.enrollments_by_user, user_id, enrollment_id)
+        _discard_from_index(self.enrollments_by_course, course_id, enrollment_id)
+        if enrollment["completed"] and course_id in self.completed_by_course:
+            self.completed_by_course[course_id] -= 1
+        _delete_id(self.enrollment_ids, enrollment_id)
+        self._add_enrollment_tombstone(enrollment_id, version, user_id, course_id)
+        self.enrollment_versions.move(enrollment_id, enrollment["version"], version)
+
+    def next_ids(self) -> Tuple[int, int, int]:
+        """IDs the next user, course and enrollment will get, without consuming them"""
+        return tuple(
+            next(copy.copy(sequence))
+            for sequence in (self.user_id_sequence, self.course_id_sequence, self.enrollment_id_sequence)
+        )
+
+    def advance_ids(self, next_user_id: int, next_course_id: int, next_enrollment_id: int) -> None:
+        """Make the sequences start at least at the given IDs"""
+        user_id, course_id, enrollment_id = self.next_ids()
+        self.user_id_sequence = itertools.count(max(user_id, next_user_id))
+        self.course_id_sequence = itertools.count(max(course_id, next_course_id))
+        self.enrollment_id_sequence = itertools.count(max(enrollment_id, next_enrollment_id))
+
+    def reset(self) -> None:
+        self.users_db.clear()
+        del self.user_ids[:]
+        self.users_by_email.clear()
+        self.users_by_name.clear()
+        self.users_by_domain.clear()
+        self.courses_db.clear()
+        del self.course_ids[:]
+        self.enrollments_db.clear()
+        del self.enrollment_ids[:]
+        self.enrollments_by_user.clear()
+        self.enrollments_by_course.clear()
+        self.enrollment_by_pair.clear()
+        self.completed_by_course.clear()
+        # The clock keeps running, so versions handed out before stay unique
+        self.user_versions.clear()
+        self.course_versions.clear()
+        self.enrollment_versions.clear()
+        self.deleted_users.clear()
+        self.deleted_courses.clear()
+        self.deleted_enrollments.clear()
+        self.deleted_enrollments_by_user.clear()
+        self.deleted_enrollments_by_course.clear()
+        self.deletion_horizon = self.clock.last
+        self._search_index = CourseSearchIndex()
\ No newline at end of file
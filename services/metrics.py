@@ -0,0 +1,281 @@
+"""Process-wide metrics rendered in the Prometheus text exposition format.
+
+Counters and histograms are plain Python objects guarded by one lock each, so
+recording a sample costs a dict lookup and a few additions. Values are per
+process; with several workers each one reports its own.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+LOCK_WAIT_BUCKETS = (0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[Tuple[str, Sequence[str], Sequence[str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labelnames, labelvalues, value in self.samples():
+            lines.append(f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(self.name, self.labelnames, labels, value) for labels, value in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+
+class Histogram(Metric):
+    """Bucketed observations; buckets are stored per bucket and summed on render"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self._series: Dict[Labels, List[float]] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[position] += 1
+            series[-1] += value
+
+    def count(self, labels: Labels = ()) -> int:
+        series = self._series.get(labels)
+        return 0 if series is None else sum(series[:-1])
+
+    def samples(self):
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+        bucket_labelnames = self.labelnames + ("le",)
+        samples = []
+        for labels, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values[:-1]):
+                cumulative += count
+                samples.append(
+                    (self.name + "_bucket", bucket_labelnames, labels + (_format_value(bound),), cumulative)
+                )
+            samples.append((self.name + "_sum", self.labelnames, labels, values[-1]))
+            samples.append((self.name + "_count", self.labelnames, labels, cumulative))
+        return samples
+
+
+class CallbackMetric(Metric):
+    """A single value read from elsewhere (e.g. the response cache) at scrape time"""
+
+    def __init__(self, name: str, documentation: str, kind: str, read: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.kind = kind
+        self._read = read
+
+    def samples(self):
+        return [(self.name, (), (), self._read())]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# HTTP
+REQUESTS = registry.register(Counter(
+    "edutrack_http_requests_total", "Requests handled, by route template and status code",
+    ("method", "route", "status"),
+))
+REQUEST_DURATION = registry.register(Histogram(
+    "edutrack_http_request_duration_seconds", "Time from request start to the last response byte",
+    ("method", "route"),
+))
+REQUEST_SIZE = registry.register(Histogram(
+    "edutrack_http_request_size_bytes", "Request body size", ("method", "route"), SIZE_BUCKETS,
+))
+RESPONSE_SIZE = registry.register(Histogram(
+    "edutrack_http_response_size_bytes", "Response body size", ("method", "route"), SIZE_BUCKETS,
+))
+IN_FLIGHT = registry.register(Gauge(
+    "edutrack_http_requests_in_flight", "Requests currently being handled", ("method",),
+))
+
+# Data layer
+STORE_LOOKUPS = registry.register(Counter(
+    "edutrack_store_lookups_total",
+    "Multi-row reads by access path: index (rows come from an ordered ID list or secondary "
+    "index) or scan (rows are filtered one by one)",
+    ("access",),
+))
+STORE_ROWS_EXAMINED = registry.register(Counter(
+    "edutrack_store_rows_examined_total", "Rows visited by filtered scans", (),
+))
+LOCK_WAIT = registry.register(Histogram(
+    "edutrack_store_lock_wait_seconds", "Time spent waiting for a contended lock; uncontended "
+    "acquisitions are not observed", ("lock",), LOCK_WAIT_BUCKETS,
+))
+
+
+class TimedLock:
+    """threading.Lock that reports contended waits to LOCK_WAIT.
+
+    The common uncontended acquire costs one extra non-blocking attempt; the
+    clock is only read when that attempt fails.
+    """
+
+    __slots__ = ("_lock", "_labels")
+
+    def __init__(self, name: str):
+        self._lock = threading.Lock()
+        self._labels = (name,)
+
+    def acquire(self) -> bool:
+        if not self._lock.acquire(False):
+            started = time.perf_counter()
+            self._lock.acquire()
+            LOCK_WAIT.observe(self._labels, time.perf_counter() - started)
+        return True
+
+    def release(self) -> None:
+        self._lock.release()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def __enter__(self) -> bool:
+        # Inlined acquire(); this is on every write path
+        if not self._lock.acquire(False):
+            started = time.perf_counter()
+            self._lock.acquire()
+            LOCK_WAIT.observe(self._labels, time.perf_counter() - started)
+        return True
+
+    def __exit__(self, *exc_info) -> None:
+        self._lock.release()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, sizes, status and in-flight requests per route.
+
+    Routes are labelled by their path template (`/api/users/{user_id}`), read from
+    the matched route after the app has run, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        request_size = 0
+        response_size = 0
+        # An exception escaping the app becomes a 500 further out
+        status_code = 500
+
+        async def counting_receive():
+            nonlocal request_size
+            message = await receive()
+            request_size += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        in_flight = (method,)
+        IN_FLIGHT.inc(in_flight)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.dec(in_flight)
+            route = scope.get("route")
+            labels = (method, route.path if route is not None else "unmatched")
+            REQUESTS.inc(labels + (str(status_code),))
+            REQUEST_DURATION.observe(labels, elapsed)
+            REQUEST_SIZE.observe(labels, request_size)
+            RESPONSE_SIZE.observe(labels, response_size)
\ No newline at end of file
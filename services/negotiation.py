@@ -0,0 +1,62 @@
+"""Picking a response format or encoding from what the client accepts.
+
+Accept and Accept-Encoding list tokens with optional quality values
+(`gzip;q=0.8, br`). The server offers its own list in order of preference;
+the offer the client rates highest wins. On a tie an offer the client names
+beats one it only covers with a wildcard (`application/*`, `*/*`, `*`).
+Media types left tied go to the one the client lists first, since clients
+order Accept by preference; encodings go to the server's earlier offer,
+since browsers list them in a fixed order that says nothing about taste.
+"""
+from typing import Dict, Optional, Sequence
+
+
+def parse_qualities(header: str) -> Dict[str, float]:
+    """Tokens of an Accept-style header with their quality values; other parameters are dropped"""
+    qualities = {}
+    for part in header.split(","):
+        token, *parameters = [piece.strip() for piece in part.split(";")]
+        if not token:
+            continue
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[token.lower()] = quality
+    return qualities
+
+
+def _match(qualities: Dict[str, float], token: str) -> Optional[str]:
+    """The header entry covering token: itself, else its wildcard, if any"""
+    if token in qualities:
+        return token
+    # Media types also match application/* and */*
+    for wildcard in (token.split("/")[0] + "/*", "*/*") if "/" in token else ("*",):
+        if wildcard in qualities:
+            return wildcard
+    return None
+
+
+def choose(header: Optional[str], offered: Sequence[str], client_order: bool = False) -> Optional[str]:
+    """The offered token the client accepts most, or None if it accepts none of them
+
+    client_order breaks ties left after specificity by the header's order
+    instead of the offer's.
+    """
+    qualities = parse_qualities(header or "")
+    positions = {token: position for position, token in enumerate(qualities)}
+    best, best_rank = None, None
+    for offer_position, token in enumerate(offered):
+        entry = _match(qualities, token)
+        if entry is None or qualities[entry] <= 0:
+            continue
+        specificity = 2 if entry == token else 1 if not entry.startswith("*") else 0
+        client_position = positions[entry] if client_order else 0
+        rank = (qualities[entry], specificity, -client_position, -offer_position)
+        if best_rank is None or rank > best_rank:
+            best, best_rank = token, rank
+    return best
\ No newline at end of file
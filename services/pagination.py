@@ -0,0 +1,71 @@
+import base64
+import binascii
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Records read from the store per chunk of a streamed list
+STREAM_PAGE_SIZE = 1000
+
+# A filtered page stops after examining this many rows per requested row,
+# so the cost of a request stays proportional to its page size
+MAX_SCAN_FACTOR = 10
+
+# Response header carrying the cursor of the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(after_id: int) -> str:
+    """Opaque cursor for the page starting after `after_id`"""
+    token = f"id:{after_id}".encode()
+    return base64.urlsafe_b64encode(token).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    """ID to resume after; raises ValueError for malformed cursors"""
+    if not cursor:
+        return 0
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        token = base64.urlsafe_b64decode(padded.encode()).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    prefix, _, value = token.partition(":")
+    if prefix != "id" or not value.isdigit():
+        raise ValueError("Invalid cursor")
+    return int(value)
+
+
+async def iter_pages(
+    list_page: Callable[[int, int], Awaitable[Tuple[List[Any], Optional[int]]]], after_id: int = 0
+) -> AsyncIterator[List[Any]]:
+    """Every page of a list from `after_id` on, read one at a time so only one is held"""
+    while True:
+        records, next_after_id = await list_page(after_id, STREAM_PAGE_SIZE)
+        yield records
+        if next_after_id is None:
+            return
+        after_id = next_after_id
+
+
+def encode_key_cursor(after: Tuple[str, int]) -> str:
+    """Opaque cursor for a page of an index ordered by (key, ID)"""
+    key, after_id = after
+    token = f"key:{after_id}:{key}".encode()
+    return base64.urlsafe_b64encode(token).decode().rstrip("=")
+
+
+def decode_key_cursor(cursor: Optional[str]) -> Tuple[str, int]:
+    """(key, ID) to resume after; raises ValueError for malformed cursors"""
+    if not cursor:
+        return "", 0
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        token = base64.urlsafe_b64decode(padded.encode()).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    prefix, _, rest = token.partition(":")
+    value, _, key = rest.partition(":")
+    if prefix != "key" or not value.isdigit():
+        raise ValueError("Invalid cursor")
+    return key, int(value)
\ No newline at end of file
@@ -0,0 +1,494 @@
+"""Snapshot and operation-log persistence for the in-memory engine.
+
+Every write appends the resulting state of each record it touched to an
+append-only log; deletes append a tombstone. Entries are read and queued under
+one lock, so the last entry for a record always reflects its latest state and
+replaying entries is idempotent.
+
+A background thread group-commits queued entries: it writes whatever has
+accumulated in one call and, depending on the fsync mode, syncs it:
+
+- "always": writers wait until their entry is on disk; one fsync covers
+  every writer that queued in the meantime
+- "interval": the log is synced after each batch, writers do not wait
+- "never": the operating system decides when to write back
+
+Entries and snapshots carry each record's version, and deletes keep theirs
+as tombstones, so delta reads continue across a restart. Pruning tombstones
+logs the new deletion horizon, and snapshots keep it. Snapshots store
+each table as columns (arrays of ints, lists of strings) in one pickle.
+Taking one rotates the log to a new segment first; the snapshot is read
+afterwards without stopping writers, so it may already contain some changes
+of the new segment, which replay re-applies harmlessly. Older segments are
+deleted once the snapshot is on disk.
+
+Startup loads the snapshot, replays the remaining segments and stops at the
+first torn or corrupt frame of a segment, the tail of a crashed write.
+"""
+import gc
+import os
+import pickle
+import re
+import struct
+import threading
+import time
+import zlib
+from array import array
+from datetime import date
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+from services.memory_store import InMemoryRepository
+from services.repository import CASCADE
+
+FSYNC_MODES = ("always", "interval", "never")
+SNAPSHOT_FILE = "snapshot.bin"
+SNAPSHOT_MAGIC = b"EDUSNAP1"
+SEGMENT_PATTERN = re.compile(r"^oplog-(\d{8})\.log$")
+# Each log frame: payload length and CRC32, then the pickled entry
+FRAME_HEADER = struct.Struct("<II")
+
+# Log entries, tuples tagged by their first item
+PUT_USER, DROP_USER = "U", "u"
+PUT_COURSE, DROP_COURSE = "C", "c"
+PUT_ENROLLMENT, DROP_ENROLLMENT = "E", "e"
+RESET = "R"
+HORIZON = "H"
+
+Entry = Tuple[Any, ...]
+
+
+def _segment_path(directory: str, segment: int) -> str:
+    return os.path.join(directory, f"oplog-{segment:08d}.log")
+
+
+def _list_segments(directory: str) -> List[int]:
+    segments = []
+    for name in os.listdir(directory):
+        match = SEGMENT_PATTERN.match(name)
+        if match:
+            segments.append(int(match.group(1)))
+    return sorted(segments)
+
+
+def _fsync_directory(directory: str) -> None:
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Not supported on this platform
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def encode_frame(entry: Entry) -> bytes:
+    payload = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+    return FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_frames(path: str) -> Iterator[Entry]:
+    """Entries of a log segment, up to the first incomplete or corrupt frame"""
+    with open(path, "rb") as segment:
+        data = segment.read()
+    position = 0
+    while position + FRAME_HEADER.size <= len(data):
+        length, checksum = FRAME_HEADER.unpack_from(data, position)
+        start = position + FRAME_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return
+        yield pickle.loads(payload)
+        position = start + length
+
+
+class OperationLog:
+    """Segmented append-only log with group commit"""
+
+    def __init__(self, directory: str, segment: int, fsync: str = "interval", flush_interval: float = 0.01):
+        if fsync not in FSYNC_MODES:
+            raise ValueError(f"Unknown fsync mode: {fsync}")
+        self.directory = directory
+        self.fsync = fsync
+        self.flush_interval = flush_interval
+        self.segment = segment
+        self._file = open(_segment_path(directory, segment), "ab")
+        self._pending: List[bytes] = []
+        # Entries are numbered as they are queued; `_durable` is the last one written
+        self._queued = 0
+        self._durable = 0
+        self._lock = threading.Lock()
+        self._queued_event = threading.Condition(self._lock)
+        self._written_event = threading.Condition(self._lock)
+        self._io_lock = threading.Lock()
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name="oplog-writer", daemon=True)
+        self._writer.start()
+
+    def append(self, build: Callable[[], List[Entry]]) -> None:
+        """Queue the entries returned by build, which runs under the log lock"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("operation log is closed")
+            entries = build()
+            if not entries:
+                return
+            self._pending.extend(encode_frame(entry) for entry in entries)
+            self._queued += 1
+            ticket = self._queued
+            self._queued_event.notify()
+            if self.fsync == "always":
+                while self._durable < ticket and not self._closed:
+                    self._written_event.wait()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._queued_event.wait()
+                if not self._pending and self._closed:
+                    return
+            if self.fsync != "always" and self.flush_interval:
+                # Let more writers join the batch; "always" writers are waiting already
+                time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self) -> None:
+        """Write and, unless fsync is "never", sync everything queued so far"""
+        with self._io_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                ticket = self._queued
+            if batch:
+                self._file.write(b"".join(batch))
+                self._file.flush()
+                if self.fsync != "never":
+                    os.fsync(self._file.fileno())
+            with self._lock:
+                self._durable = max(self._durable, ticket)
+                self._written_event.notify_all()
+
+    @property
+    def queued(self) -> int:
+        """Number of appends so far"""
+        return self._queued
+
+    def rotate(self) -> int:
+        """Start a new segment and return its number.
+
+        Everything queued before the call ends up in the earlier segments;
+        later entries go to the new one.
+        """
+        with self._io_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                ticket = self._queued
+            self._file.write(b"".join(batch))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self.segment += 1
+            self._file = open(_segment_path(self.directory, self.segment), "ab")
+            with self._lock:
+                self._durable = max(self._durable, ticket)
+                self._written_event.notify_all()
+        _fsync_directory(self.directory)
+        return self.segment
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queued_event.notify()
+        self._writer.join()
+        self.flush()
+        self._file.close()
+
+
+class PersistentMemoryRepository(InMemoryRepository):
+    """In-memory engine that survives restarts through snapshots and an operation log"""
+
+    def __init__(
+        self,
+        directory: str,
+        fsync: str = "interval",
+        snapshot_interval: float = 300.0,
+        lock_stripes: int = 64,
+        compact: bool = False,
+    ):
+        super().__init__(lock_stripes=lock_stripes, compact=compact)
+        # With fsync "always" every write waits for the disk; many waiting
+        # writers share one group commit
+        self.blocking = fsync == "always"
+        self.concurrency = 64
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # Restoring allocates millions of long-lived objects and no garbage;
+        # collection passes over them would only slow the restart down
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            segment = self._restore()
+        finally:
+            if collecting:
+                gc.enable()
+        self.log = OperationLog(directory, segment, fsync)
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_at = self.log.queued
+        self._stop = threading.Event()
+        self._snapshotter = None
+        if snapshot_interval > 0:
+            self._snapshotter = threading.Thread(
+                target=self._snapshot_periodically, args=(snapshot_interval,),
+                name="snapshotter", daemon=True,
+            )
+            self._snapshotter.start()
+
+    # Startup
+    def _restore(self) -> int:
+        """Load the snapshot and replay the log; returns the segment to write next"""
+        first_segment = 1
+        next_ids = (1, 1, 1)
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "rb") as snapshot:
+                if snapshot.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                    raise ValueError(f"{snapshot_path} is not a snapshot")
+                state = pickle.load(snapshot)
+            # Snapshots from before versions existed have no tombstones
+            self.bulk_load(
+                state["users"], state["courses"], state["enrollments"], state.get("deleted", ((), (), ()))
+            )
+            self.deletion_horizon = state.get("deletion_horizon", 0)
+            next_ids = state["next_ids"]
+            first_segment = state["segment"]
+
+        last_ids = [0, 0, 0]
+        segments = [segment for segment in _list_segments(self.directory) if segment >= first_segment]
+        for segment in segments:
+            for entry in read_frames(_segment_path(self.directory, segment)):
+                self._replay(entry, last_ids)
+        self.advance_ids(*(max(next_id, last_id + 1) for next_id, last_id in zip(next_ids, last_ids)))
+        # Never append after a possibly torn tail
+        return (segments[-1] if segments else first_segment - 1) + 1
+
+    def _replay(self, entry: Entry, last_ids: List[int]) -> None:
+        tag = entry[0]
+        if tag == PUT_USER:
+            self.restore_user(*entry[1:])
+        elif tag == DROP_USER:
+            self.discard_user(*entry[1:])
+        elif tag == PUT_COURSE:
+            self.restore_course(*entry[1:])
+        elif tag == DROP_COURSE:
+            self.discard_course(*entry[1:])
+        elif tag == PUT_ENROLLMENT:
+            enrollment_id, user_id, course_id, day, *rest = entry[1:]
+            self.restore_enrollment(enrollment_id, user_id, course_id, date.fromordinal(day), *rest)
+        elif tag == DROP_ENROLLMENT:
+            self.discard_enrollment(*entry[1:])
+        elif tag == RESET:
+            InMemoryRepository.reset(self)
+            return
+        elif tag == HORIZON:
+            self.discard_deletions(entry[1])
+            return
+        table = "UCE".index(tag.upper())
+        last_ids[table] = max(last_ids[table], entry[1])
+
+    # Logging
+    def _user_entry(self, user_id: int) -> Entry:
+        user = self.users_db.get(user_id)
+        if user is None:
+            return (DROP_USER, user_id, self.deleted_users.get(user_id))
+        return (PUT_USER, user_id, user["name"], user["email"], user["is_active"], user["version"])
+
+    def _course_entry(self, course_id: int) -> Entry:
+        course = self.courses_db.get(course_id)
+        if course is None:
+            return (DROP_COURSE, course_id, self.deleted_courses.get(course_id))
+        return (
+            PUT_COURSE, course_id, course["title"], course["description"], course["is_open"], course["version"]
+        )
+
+    def _enrollment_entry(self, enrollment_id: int) -> Entry:
+        enrollment = self.enrollments_db.get(enrollment_id)
+        if enrollment is None:
+            deleted = self.deleted_enrollments.get(enrollment_id)
+            return (DROP_ENROLLMENT, enrollment_id, deleted[0] if deleted else None)
+        return (
+            PUT_ENROLLMENT, enrollment_id, enrollment["user_id"], enrollment["course_id"],
+            enrollment["enrolled_date"].toordinal(), enrollment["completed"], enrollment["version"],
+        )
+
+    def _log(self, entry_for: Callable[[int], Entry], record_ids: List[int]) -> None:
+        self.log.append(lambda: [entry_for(record_id) for record_id in record_ids])
+
+    # Users
+    def create_user(self, name: str, email: str) -> dict:
+        user = super().create_user(name, email)
+        self._log(self._user_entry, [user["id"]])
+        return user
+
+    def create_users(self, users: List[Tuple[str, str]]) -> List[Optional[dict]]:
+        created = super().create_users(users)
+        self._log(self._user_entry, [user["id"] for user in created if user is not None])
+        return created
+
+    def update_user(self, user_id: int, changes: dict) -> Optional[dict]:
+        user = super().update_user(user_id, changes)
+        if user is not None:
+            self._log(self._user_entry, [user_id])
+        return user
+
+    def delete_user(self, user_id: int, policy: str = CASCADE) -> bool:
+        # Cascaded enrollment deletes log themselves through delete_enrollment
+        deleted = super().delete_user(user_id, policy)
+        if deleted:
+            self._log(self._user_entry, [user_id])
+        return deleted
+
+    # Courses
+    def create_course(self, title: str, description: str) -> dict:
+        course = super().create_course(title, description)
+        self._log(self._course_entry, [course["id"]])
+        return course
+
+    def update_course(self, course_id: int, changes: dict) -> Optional[dict]:
+        course = super().update_course(course_id, changes)
+        if course is not None:
+            self._log(self._course_entry, [course_id])
+        return course
+
+    def delete_course(self, course_id: int, policy: str = CASCADE) -> bool:
+        deleted = super().delete_course(course_id, policy)
+        if deleted:
+            self._log(self._course_entry, [course_id])
+        return deleted
+
+    # Enrollments
+    def create_enrollment(self, user_id: int, course_id: int, enrolled_date: date) -> dict:
+        enrollment = super().create_enrollment(user_id, course_id, enrolled_date)
+        self._log(self._enrollment_entry, [enrollment["id"]])
+        return enrollment
+
+    def create_enrollments(
+        self, pairs: List[Tuple[int, int]], enrolled_date: date, atomic: bool = False
+    ) -> List[Optional[dict]]:
+        created = super().create_enrollments(pairs, enrolled_date, atomic)
+        self._log(self._enrollment_entry, [enrollment["id"] for enrollment in created if enrollment is not None])
+        return created
+
+    def update_enrollment(self, enrollment_id: int, changes: dict) -> Optional[dict]:
+        enrollment = super().update_enrollment(enrollment_id, changes)
+        if enrollment is not None:
+            self._log(self._enrollment_entry, [enrollment_id])
+        return enrollment
+
+    def delete_enrollment(self, enrollment_id: int) -> bool:
+        deleted = super().delete_enrollment(enrollment_id)
+        if deleted:
+            self._log(self._enrollment_entry, [enrollment_id])
+        return deleted
+
+    # Maintenance
+    def reset(self) -> None:
+        def clear_and_log() -> List[Entry]:
+            # Cleared under the log lock so no write lands between the two
+            InMemoryRepository.reset(self)
+            return [(RESET,)]
+        self.log.append(clear_and_log)
+
+    def prune_deletions(self, keep: int) -> int:
+        # Deletes logged after this entry may replay tombstones under the
+        # horizon; they are only kept until the next prune
+        horizon = self.deletion_horizon
+        pruned = super().prune_deletions(keep)
+        if self.deletion_horizon != horizon:
+            self.log.append(lambda: [(HORIZON, self.deletion_horizon)])
+        return pruned
+
+    def snapshot(self) -> None:
+        """Write a snapshot and drop the log segments it covers"""
+        with self._snapshot_lock:
+            self._snapshot_at = self.log.queued
+            segment = self.log.rotate()
+            state = {
+                "next_ids": self.next_ids(),
+                "segment": segment,
+                "users": self._user_columns(),
+                "courses": self._course_columns(),
+                "enrollments": self._enrollment_columns(),
+                # Read before the tombstones: a prune raises it before dropping them
+                "deletion_horizon": self.deletion_horizon,
+                "deleted": self._tombstones(),
+            }
+            path = os.path.join(self.directory, SNAPSHOT_FILE)
+            temporary = path + ".tmp"
+            with open(temporary, "wb") as snapshot:
+                snapshot.write(SNAPSHOT_MAGIC)
+                pickle.dump(state, snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+            os.replace(temporary, path)
+            _fsync_directory(self.directory)
+            for old_segment in _list_segments(self.directory):
+                if old_segment < segment:
+                    os.remove(_segment_path(self.directory, old_segment))
+
+    def _user_columns(self) -> Tuple:
+        # list() copies the values in one C call, so concurrent writers cannot
+        # break the iteration; rows are sorted because a dict keeps insertion order
+        # only until a restore re-inserts an older ID
+        users = sorted(list(self.users_db.values()), key=lambda user: user["id"])
+        return (
+            array("I", [user["id"] for user in users]),
+            [user["name"] for user in users],
+            [user["email"] for user in users],
+            bytes(bool(user["is_active"]) for user in users),
+            array("Q", [user["version"] for user in users]),
+        )
+
+    def _course_columns(self) -> Tuple:
+        courses = sorted(list(self.courses_db.values()), key=lambda course: course["id"])
+        return (
+            array("I", [course["id"] for course in courses]),
+            [course["title"] for course in courses],
+            [course["description"] for course in courses],
+            bytes(bool(course["is_open"]) for course in courses),
+            array("Q", [course["version"] for course in courses]),
+        )
+
+    def _enrollment_columns(self) -> Tuple:
+        enrollments = sorted(list(self.enrollments_db.values()), key=lambda enrollment: enrollment["id"])
+        return (
+            array("I", [enrollment["id"] for enrollment in enrollments]),
+            array("I", [enrollment["user_id"] for enrollment in enrollments]),
+            array("I", [enrollment["course_id"] for enrollment in enrollments]),
+            array("I", [enrollment["enrolled_date"].toordinal() for enrollment in enrollments]),
+            bytes(bool(enrollment["completed"]) for enrollment in enrollments),
+            array("Q", [enrollment["version"] for enrollment in enrollments]),
+        )
+
+    def _tombstones(self) -> Tuple:
+        return (
+            list(self.deleted_users.items()),
+            list(self.deleted_courses.items()),
+            [
+                (enrollment_id, version, user_id, course_id)
+                for enrollment_id, (version, user_id, course_id) in list(self.deleted_enrollments.items())
+            ],
+        )
+
+    def _snapshot_periodically(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            if self.log.queued != self._snapshot_at:
+                self.snapshot()
+
+    def close(self) -> None:
+        """Stop background work and leave a snapshot behind for a fast restart"""
+        self._stop.set()
+        if self._snapshotter is not None:
+            self._snapshotter.join()
+        if self.log.queued != self._snapshot_at:
+            self.snapshot()
+        self.log.close()
\ No newline at end of file
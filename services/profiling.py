@@ -0,0 +1,232 @@
+"""Opt-in request profiling with a bounded buffer of captured profiles.
+
+A request is run under cProfile when it asks for it (an `X-Profile: 1` header
+or `?profile=1`, both only honoured together with the admin token) or when it
+is picked by EDUTRACK_PROFILE_SAMPLE_RATE. Independently, with
+EDUTRACK_PROFILE_SLOW_MS set, a background thread samples every thread's stack
+and any request slower than the threshold keeps the samples taken while it ran,
+in collapsed-stack format (one `frame;frame;frame count` line per stack).
+
+Both profilers see the whole process: cProfile records everything that runs on
+the event loop while the request is awaited, and the sampler records every busy
+thread, so concurrent requests show up in each other's profiles.
+"""
+import cProfile
+import hmac
+import io
+import itertools
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs
+from services.config import settings
+
+PROFILE_HEADER = b"x-profile"
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+# Innermost files of a thread that is parked waiting for work
+_IDLE_FILES = tuple(os.sep + name for name in ("threading.py", "selectors.py", "queue.py"))
+
+
+class Profile(NamedTuple):
+    id: int
+    created: float
+    method: str
+    path: str
+    status: int
+    duration_ms: float
+    # "header", "query" or "sample" (cProfile), or "slow" (stack samples)
+    trigger: str
+    # "pstats" (marshalled cProfile stats) or "collapsed" (text)
+    format: str
+    data: bytes
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "created": self.created,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "duration_ms": round(self.duration_ms, 3),
+            "trigger": self.trigger,
+            "format": self.format,
+            "size": len(self.data),
+        }
+
+    def as_text(self, limit: int = 40) -> str:
+        """Human-readable report: top functions by cumulative time, or the stacks"""
+        if self.format == "collapsed":
+            return self.data.decode()
+        output = io.StringIO()
+        stats = pstats.Stats(stream=output)
+        stats.stats = marshal.loads(self.data)
+        stats.get_top_level_stats()
+        stats.sort_stats("cumulative").print_stats(limit)
+        return output.getvalue()
+
+
+class ProfileBuffer:
+    """Ring buffer of the most recent profiles"""
+
+    def __init__(self, max_entries: int):
+        self._profiles: Deque[Profile] = deque(maxlen=max_entries)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(
+        self, method: str, path: str, status: int, duration: float, trigger: str, fmt: str, data: bytes
+    ) -> None:
+        with self._lock:
+            self._profiles.append(
+                Profile(next(self._ids), time.time(), method, path, status, duration * 1000, trigger, fmt, data)
+            )
+
+    def list(self) -> List[Profile]:
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        with self._lock:
+            for profile in self._profiles:
+                if profile.id == profile_id:
+                    return profile
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+class StackSampler:
+    """Background thread recording the stacks of busy threads at a fixed interval"""
+
+    def __init__(self, interval: float = 0.005, window: float = 60.0):
+        self.interval = interval
+        # (perf_counter timestamp, collapsed stack)
+        self._samples: Deque[Tuple[float, str]] = deque(maxlen=int(window / interval) * 4)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                self._samples.append((now, _collapse(frame)))
+
+    def collect(self, started: float, finished: float) -> Dict[str, int]:
+        """Stacks sampled between two perf_counter readings, with their counts"""
+        stacks: Counter = Counter()
+        # Walk back from the newest sample; copying first keeps the sampler unblocked
+        for timestamp, stack in reversed(list(self._samples)):
+            if timestamp < started:
+                break
+            if timestamp <= finished:
+                stacks[stack] += 1
+        return stacks
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+profile_buffer = ProfileBuffer(settings.profile_buffer_size)
+stack_sampler = StackSampler(settings.profile_interval_ms / 1000)
+
+# cProfile hooks the whole thread, so only one request is profiled at a time
+_profiler_lock = threading.Lock()
+
+
+def admin_token_matches(token: Optional[str]) -> bool:
+    expected = settings.admin_token
+    return bool(expected) and token is not None and hmac.compare_digest(token, expected)
+
+
+def _requested_trigger(scope) -> Optional[str]:
+    """"header" or "query" when the request asks to be profiled with a valid admin token"""
+    trigger = None
+    headers = dict(scope["headers"])
+    if headers.get(PROFILE_HEADER) == b"1":
+        trigger = "header"
+    elif b"profile" in scope["query_string"]:
+        if parse_qs(scope["query_string"].decode("latin-1")).get("profile") == ["1"]:
+            trigger = "query"
+    if trigger is None:
+        return None
+    token = headers.get(ADMIN_TOKEN_HEADER.lower().encode())
+    return trigger if admin_token_matches(token and token.decode("latin-1")) else None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware capturing profiles of requested, sampled and slow requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        slow_ms = settings.profile_slow_ms
+        if scope["type"] != "http" or not (settings.admin_token or settings.profile_sample_rate or slow_ms):
+            await self.app(scope, receive, send)
+            return
+        trigger = _requested_trigger(scope)
+        if trigger is None and settings.profile_sample_rate and random.random() < settings.profile_sample_rate:
+            trigger = "sample"
+        profiler = None
+        if trigger is not None and _profiler_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+        if slow_ms:
+            stack_sampler.ensure_started()
+
+        status_code = 500
+
+        async def recording_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            if profiler is None:
+                await self.app(scope, receive, recording_send)
+            else:
+                profiler.enable()
+                try:
+                    await self.app(scope, receive, recording_send)
+                finally:
+                    profiler.disable()
+                    _profiler_lock.release()
+        finally:
+            finished = time.perf_counter()
+            duration = finished - started
+            request = (scope["method"], scope["path"], status_code, duration)
+            if profiler is not None:
+                profiler.create_stats()
+                profile_buffer.add(*request, trigger, "pstats", marshal.dumps(profiler.stats))
+            elif slow_ms and duration * 1000 >= slow_ms:
+                stacks = stack_sampler.collect(started, finished)
+                text = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+                profile_buffer.add(*request, "slow", "collapsed", text.encode())
\ No newline at end of file
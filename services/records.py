@@ -0,0 +1,239 @@
+import threading
+from array import array
+from datetime import date
+from typing import Any, Iterator, Mapping, Optional, Sequence, Tuple
+
+
+class Record:
+    """Mapping-style access on top of attributes.
+
+    Lets slotted records stand in for the dict records the routes and services
+    were written against, while Pydantic reads them through `from_attributes`.
+    """
+
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._fields
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self._fields else default
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._fields
+
+    def update(self, changes: Mapping[str, Any]) -> None:
+        for key, value in changes.items():
+            setattr(self, key, value)
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self._fields}
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (Record, dict)):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class UserRecord(Record):
+    __slots__ = ("id", "name", "email", "is_active", "version")
+    _fields = __slots__
+
+    def __init__(self, id: int, name: str, email: str, is_active: bool = True, version: int = 0):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.is_active = is_active
+        self.version = version
+
+
+class CourseRecord(Record):
+    __slots__ = ("id", "title", "description", "is_open", "version")
+    _fields = __slots__
+
+    def __init__(self, id: int, title: str, description: str, is_open: bool = True, version: int = 0):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.is_open = is_open
+        self.version = version
+
+
+def _get_bit(bits: bytearray, index: int) -> bool:
+    return bool(bits[index >> 3] >> (index & 7) & 1)
+
+def _set_bit(bits: bytearray, index: int, value: bool) -> None:
+    if value:
+        bits[index >> 3] |= 1 << (index & 7)
+    else:
+        bits[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+
+class EnrollmentColumns:
+    """Enrollments stored column-wise, positioned by enrollment ID.
+
+    user_id, course_id and the enrolled date (as a proleptic ordinal) are 4-byte
+    array entries, the version an 8-byte one; "present" and "completed" are
+    single bits. That is about 20 bytes per enrollment against several hundred
+    for a dict. Reads return live
+    EnrollmentRow views. Behaves like the Dict[int, dict] it replaces for the
+    operations the in-memory engine uses.
+    """
+
+    def __init__(self):
+        self.user_ids = array("I")
+        self.course_ids = array("I")
+        self.enrolled_days = array("I")
+        self.versions = array("Q")
+        self.present = bytearray()
+        self.completed = bytearray()
+        self._count = 0
+        # Guards growth and the read-modify-write of shared flag bytes
+        self._lock = threading.Lock()
+
+    def _ensure_capacity(self, enrollment_id: int) -> None:
+        size = len(self.user_ids)
+        if enrollment_id < size:
+            return
+        grow = max(enrollment_id + 1, size * 2) - size
+        for column in (self.user_ids, self.course_ids, self.enrolled_days, self.versions):
+            column.frombytes(bytes(grow * column.itemsize))
+        flag_bytes = (size + grow + 7) // 8 - len(self.present)
+        self.present.extend(bytes(flag_bytes))
+        self.completed.extend(bytes(flag_bytes))
+
+    def __setitem__(self, enrollment_id: int, enrollment: Mapping[str, Any]) -> None:
+        with self._lock:
+            self._ensure_capacity(enrollment_id)
+            self.user_ids[enrollment_id] = enrollment["user_id"]
+            self.course_ids[enrollment_id] = enrollment["course_id"]
+            self.enrolled_days[enrollment_id] = enrollment["enrolled_date"].toordinal()
+            self.versions[enrollment_id] = enrollment["version"]
+            _set_bit(self.completed, enrollment_id, enrollment["completed"])
+            if not _get_bit(self.present, enrollment_id):
+                _set_bit(self.present, enrollment_id, True)
+                self._count += 1
+
+    def __contains__(self, enrollment_id: object) -> bool:
+        return (
+            isinstance(enrollment_id, int)
+            and 0 <= enrollment_id < len(self.user_ids)
+            and _get_bit(self.present, enrollment_id)
+        )
+
+    def get(self, enrollment_id: int, default: Any = None) -> Optional["EnrollmentRow"]:
+        if enrollment_id not in self:
+            return default
+        return EnrollmentRow(self, enrollment_id)
+
+    def __getitem__(self, enrollment_id: int) -> "EnrollmentRow":
+        row = self.get(enrollment_id)
+        if row is None:
+            raise KeyError(enrollment_id)
+        return row
+
+    def pop(self, enrollment_id: int, default: Any = None) -> Optional["EnrollmentRow"]:
+        with self._lock:
+            if enrollment_id not in self:
+                return default
+            _set_bit(self.present, enrollment_id, False)
+            self._count -= 1
+        # The columns keep their values, so the returned view still reads the row
+        return EnrollmentRow(self, enrollment_id)
+
+    def load(
+        self,
+        enrollment_ids: Sequence[int],
+        user_ids: Sequence[int],
+        course_ids: Sequence[int],
+        enrolled_days: Sequence[int],
+        completed: Sequence[int],
+        versions: Sequence[int],
+    ) -> None:
+        """Fill the columns in bulk from parallel sequences, days given as ordinals"""
+        if not enrollment_ids:
+            return
+        with self._lock:
+            self._ensure_capacity(max(enrollment_ids))
+            for enrollment_id, user_id, course_id, day, done, version in zip(
+                enrollment_ids, user_ids, course_ids, enrolled_days, completed, versions
+            ):
+                self.user_ids[enrollment_id] = user_id
+                self.course_ids[enrollment_id] = course_id
+                self.enrolled_days[enrollment_id] = day
+                self.versions[enrollment_id] = version
+                if done:
+                    _set_bit(self.completed, enrollment_id, True)
+                if not _get_bit(self.present, enrollment_id):
+                    _set_bit(self.present, enrollment_id, True)
+                    self._count += 1
+
+    def set_completed(self, enrollment_id: int, completed: bool) -> None:
+        with self._lock:
+            _set_bit(self.completed, enrollment_id, completed)
+
+    def set_version(self, enrollment_id: int, version: int) -> None:
+        self.versions[enrollment_id] = version
+
+    def values(self) -> Iterator["EnrollmentRow"]:
+        for enrollment_id in range(len(self.user_ids)):
+            if _get_bit(self.present, enrollment_id):
+                yield EnrollmentRow(self, enrollment_id)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def clear(self) -> None:
+        with self._lock:
+            for column in (self.user_ids, self.course_ids, self.enrolled_days, self.versions):
+                del column[:]
+            self.present.clear()
+            self.completed.clear()
+            self._count = 0
+
+
+class EnrollmentRow(Record):
+    """Live view of one enrollment in EnrollmentColumns"""
+
+    __slots__ = ("_columns", "id")
+    _fields = ("id", "user_id", "course_id", "enrolled_date", "completed", "version")
+
+    def __init__(self, columns: EnrollmentColumns, enrollment_id: int):
+        self._columns = columns
+        self.id = enrollment_id
+
+    @property
+    def user_id(self) -> int:
+        return self._columns.user_ids[self.id]
+
+    @property
+    def course_id(self) -> int:
+        return self._columns.course_ids[self.id]
+
+    @property
+    def enrolled_date(self) -> date:
+        return date.fromordinal(self._columns.enrolled_days[self.id])
+
+    @property
+    def completed(self) -> bool:
+        return _get_bit(self._columns.completed, self.id)
+
+    @property
+    def version(self) -> int:
+        return self._columns.versions[self.id]
+
+    def update(self, changes: Mapping[str, Any]) -> None:
+        # Only the completed flag and the version are mutable; keys and dates never change
+        if "completed" in changes:
+            self._columns.set_completed(self.id, changes["completed"])
+        if "version" in changes:
+            self._columns.set_version(self.id, changes["version"])
\ No newline at end of file
@@ -0,0 +1,279 @@
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+# A page of records plus the ID to resume after (None when there are no more)
+Page = Tuple[List[dict], Optional[int]]
+# Page of an index ordered by (key, ID), resumed after a (key, ID) pair
+KeyPage = Tuple[List[dict], Optional[Tuple[str, int]]]
+
+
+class Delta(NamedTuple):
+    """Records written and deleted after a version, oldest write first"""
+
+    changed: List[dict]
+    # One {"id": ...} per deleted record; enrollments also carry user_id and course_id
+    deleted: List[dict]
+    # Version to read on from; once caught up (`more` unset) the store's watermark
+    version: int
+    more: bool
+
+
+def delta_page(entries: List[Tuple[int, Optional[dict], Optional[dict]]], limit: int, watermark: int) -> Delta:
+    """Delta from (version, record, tombstone) entries in version order, `limit` + 1 of them at most
+
+    Entries with neither a record nor a tombstone still count, so the page may
+    come back short while `more` is set.
+    """
+    page = entries[:limit]
+    changed = [record for _, record, _ in page if record is not None]
+    deleted = [tombstone for _, _, tombstone in page if tombstone is not None]
+    if len(entries) > limit:
+        return Delta(changed, deleted, page[-1][0], True)
+    return Delta(changed, deleted, watermark, False)
+
+
+class DeltaExpiredError(Exception):
+    """A delta read started below the deletion horizon, whose deletes are no longer kept"""
+
+    def __init__(self, horizon: int):
+        super().__init__(horizon)
+        self.horizon = horizon
+
+
+class DuplicateEmailError(Exception):
+    """The email is already registered to another user"""
+
+
+class AlreadyEnrolledError(Exception):
+    """The user is already enrolled in the course"""
+
+
+class ParentNotFoundError(Exception):
+    """The user or course of a new enrollment does not exist, or was deleted meanwhile"""
+
+    def __init__(self, user_id: int, course_id: int, missing: str):
+        super().__init__(user_id, course_id)
+        # "user" or "course"
+        self.missing = missing
+
+
+class IdRangeError(Exception):
+    """An ID the engine cannot store, e.g. a new one past the end of its ID space"""
+
+
+class HasEnrollmentsError(Exception):
+    """A restricted delete hit a user or course that still has enrollments"""
+
+
+# What deleting a user or course does to its enrollments
+CASCADE = "cascade"          # delete them too
+RESTRICT = "restrict"        # refuse with HasEnrollmentsError while any exist
+SOFT_DELETE = "soft-delete"  # keep everything; deactivate the user or close the course
+DELETE_POLICIES = (CASCADE, RESTRICT, SOFT_DELETE)
+
+
+def normalize_email(email: str) -> str:
+    """Key used by the email index; addresses differing only in case collide"""
+    return email.strip().lower()
+
+
+class Repository(ABC):
+    """Storage interface used by the routes.
+
+    Records are plain dicts shaped like the response schemas. Engines own ID
+    allocation and enforce the uniqueness of emails and of (user, course) pairs.
+
+    Every write stamps the record with a new, higher `version`; deletes leave a
+    tombstone with one. The `list_*_changes` methods read both back in version
+    order. Deletes are left out when reading from version 0, since a reader
+    starting from scratch never saw the deleted records. Tombstones at or below
+    the deletion horizon have been pruned, so reading from a version under it
+    raises DeltaExpiredError.
+    """
+
+    # Whether calls can block on I/O, and how many such calls are worth running
+    # at once; async callers run blocking engines in that many worker threads
+    blocking = False
+    concurrency = 1
+
+    # Users
+    @abstractmethod
+    def create_user(self, name: str, email: str) -> dict:
+        """Store a new active user; raises DuplicateEmailError"""
+
+    @abstractmethod
+    def create_users(self, users: List[Tuple[str, str]]) -> List[Optional[dict]]:
+        """Store many (name, email) users in one batch; taken emails come back as None"""
+
+    @abstractmethod
+    def get_user(self, user_id: int) -> Optional[dict]:
+        """User by ID"""
+
+    @abstractmethod
+    def get_users_many(self, user_ids: Iterable[int]) -> Dict[int, dict]:
+        """Users by ID in one lookup; missing IDs are left out"""
+
+    @abstractmethod
+    def find_user_by_email(self, email: str) -> Optional[dict]:
+        """User by email, ignoring case"""
+
+    @abstractmethod
+    def update_user(self, user_id: int, changes: dict) -> Optional[dict]:
+        """Apply changes to a user; raises DuplicateEmailError"""
+
+    @abstractmethod
+    def delete_user(self, user_id: int, policy: str = CASCADE) -> bool:
+        """Remove a user, handling its enrollments per policy; False if it did not exist"""
+
+    @abstractmethod
+    def list_users(
+        self, after_id: int = 0, limit: int = 100, is_active: Optional[bool] = None
+    ) -> Page:
+        """Page through users in ID order"""
+
+    @abstractmethod
+    def search_users(
+        self,
+        name: Optional[str] = None,
+        domain: Optional[str] = None,
+        after: Tuple[str, int] = ("", 0),
+        limit: int = 100,
+    ) -> KeyPage:
+        """Page through users whose name from some word on starts with `name`, at `domain` or a subdomain"""
+
+    @abstractmethod
+    def list_user_changes(self, since: int = 0, limit: int = 100) -> Delta:
+        """Users written or deleted after version `since`"""
+
+    # Courses
+    @abstractmethod
+    def create_course(self, title: str, description: str) -> dict:
+        """Store a new open course"""
+
+    @abstractmethod
+    def create_courses(self, courses: List[Tuple[str, str]]) -> List[dict]:
+        """Store many (title, description) courses in one batch"""
+
+    @abstractmethod
+    def get_course(self, course_id: int) -> Optional[dict]:
+        """Course by ID"""
+
+    @abstractmethod
+    def get_courses_many(self, course_ids: Iterable[int]) -> Dict[int, dict]:
+        """Courses by ID in one lookup; missing IDs are left out"""
+
+    @abstractmethod
+    def update_course(self, course_id: int, changes: dict) -> Optional[dict]:
+        """Apply changes to a course"""
+
+    @abstractmethod
+    def delete_course(self, course_id: int, policy: str = CASCADE) -> bool:
+        """Remove a course, handling its enrollments per policy; False if it did not exist"""
+
+    @abstractmethod
+    def list_courses(
+        self, after_id: int = 0, limit: int = 100, is_open: Optional[bool] = None
+    ) -> Page:
+        """Page through courses in ID order"""
+
+    @abstractmethod
+    def list_course_changes(self, since: int = 0, limit: int = 100) -> Delta:
+        """Courses written or deleted after version `since`"""
+
+    @abstractmethod
+    def search_courses(self, query: str, limit: int = 20) -> List[dict]:
+        """Courses matching every word of query, the last word as a prefix, best match first"""
+
+    @abstractmethod
+    def get_course_stats(self, course_id: int) -> Optional[dict]:
+        """Enrollment and completion counts of a course, read from maintained counters"""
+
+    @abstractmethod
+    def list_course_stats(self, after_id: int = 0, limit: int = 100) -> Page:
+        """Page through the stats of every course in ID order"""
+
+    # Enrollments
+    @abstractmethod
+    def create_enrollment(self, user_id: int, course_id: int, enrolled_date: date) -> dict:
+        """Store a new enrollment; raises AlreadyEnrolledError and ParentNotFoundError"""
+
+    @abstractmethod
+    def create_enrollments(
+        self, pairs: List[Tuple[int, int]], enrolled_date: date, atomic: bool = False
+    ) -> List[Optional[dict]]:
+        """Store many enrollments in one batch.
+
+        Pairs that are already enrolled, or whose user or course does not exist,
+        come back as None. With `atomic`, such a pair raises AlreadyEnrolledError
+        or ParentNotFoundError instead and nothing is stored.
+        """
+
+    @abstractmethod
+    def find_enrolled_pairs(self, pairs: Iterable[Tuple[int, int]]) -> Set[Tuple[int, int]]:
+        """The subset of (user_id, course_id) pairs that already have an enrollment"""
+
+    @abstractmethod
+    def get_enrollment(self, enrollment_id: int) -> Optional[dict]:
+        """Enrollment by ID"""
+
+    @abstractmethod
+    def get_enrollments_many(self, enrollment_ids: Iterable[int]) -> Dict[int, dict]:
+        """Enrollments by ID in one lookup; missing IDs are left out"""
+
+    @abstractmethod
+    def find_enrollment(self, user_id: int, course_id: int) -> Optional[dict]:
+        """Enrollment of a user in a course"""
+
+    @abstractmethod
+    def update_enrollment(self, enrollment_id: int, changes: dict) -> Optional[dict]:
+        """Apply changes to an enrollment's non-key fields"""
+
+    @abstractmethod
+    def delete_enrollment(self, enrollment_id: int) -> bool:
+        """Remove an enrollment; False if it did not exist"""
+
+    @abstractmethod
+    def list_enrollments(
+        self,
+        after_id: int = 0,
+        limit: int = 100,
+        user_id: Optional[int] = None,
+        course_id: Optional[int] = None,
+        completed: Optional[bool] = None,
+    ) -> Page:
+        """Page through enrollments in ID order"""
+
+    @abstractmethod
+    def list_enrollment_changes(
+        self,
+        since: int = 0,
+        limit: int = 100,
+        user_id: Optional[int] = None,
+        course_id: Optional[int] = None,
+    ) -> Delta:
+        """Enrollments written or deleted after version `since`, optionally of one user or course"""
+
+    @abstractmethod
+    def get_enrollments_for_user(self, user_id: int) -> List[dict]:
+        """Enrollments of a user, in ID order"""
+
+    @abstractmethod
+    def get_enrollments_for_course(self, course_id: int) -> List[dict]:
+        """Enrollments in a course, in ID order"""
+
+    # Maintenance
+    @abstractmethod
+    def purge_orphans(self) -> List[int]:
+        """Delete enrollments whose user or course no longer exists; returns their IDs"""
+
+    @abstractmethod
+    def prune_deletions(self, keep: int) -> int:
+        """Drop tombstones older than the last `keep` versions, raising the horizon; returns how many"""
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Remove all records; their tombstones go too, so the horizon moves up to now"""
+
+    def close(self) -> None:
+        """Release any resources held by the engine"""
\ No newline at end of file
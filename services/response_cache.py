@@ -0,0 +1,219 @@
+"""LRU cache of encoded GET-by-id responses, with ETags.
+
+Entries are keyed by (entity, id, version), one version per record at a
+time, and dropped by the routes that change a record. A lookup that knows
+the record's version only gets a body of that version; one that does not
+gets the newest cached. A fill only lands if no invalidation touched the
+record's stripe since the miss was observed and no newer version is cached,
+so a reader racing a writer never caches the old bytes after the writer has
+invalidated them.
+
+The cache lives in one process and only sees that process's writes, so it is
+disabled when several workers share the store; ETags are still sent.
+
+List responses are not cached; their ETag is a digest of the (ID, version)
+of every record they hold, so a client whose copy is current gets a 304
+without the list being encoded.
+
+The compression middleware appends the content coding to the ETag of a
+compressed body. A 304 repeats the tag the client sent, so it names the
+representation the client actually holds.
+"""
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, NamedTuple, Optional, Tuple, Type
+from fastapi import Request, Response, status
+from pydantic import BaseModel
+from services.compression import decoded_etag
+from services.config import settings
+from services.metrics import CallbackMetric, registry
+from services.serialization import EncodedJSONResponse, encode_record
+
+GENERATION_STRIPES = 64
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def matching_etag(if_none_match: Optional[str], etag: str) -> Optional[str]:
+    """The If-None-Match entry covering etag, as the client sent it, or None
+
+    Entries are compared weakly and with their content-coding suffix removed;
+    `*` stands for etag itself.
+    """
+    if not if_none_match:
+        return None
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return etag
+        if decoded_etag(candidate[2:] if candidate.startswith("W/") else candidate) == etag:
+            return candidate
+    return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers etag (weak comparison)"""
+    return matching_etag(if_none_match, etag) is not None
+
+
+class ResponseCache:
+    """Bounded LRU of CachedResponse entries with hit/miss counters"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int, int], CachedResponse]" = OrderedDict()
+        # Version cached for each (entity, id)
+        self._versions: Dict[Tuple[str, int], int] = {}
+        self._generations = [0] * GENERATION_STRIPES
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def lookup(
+        self, entity: str, record_id: int, version: Optional[int] = None
+    ) -> Tuple[Optional[CachedResponse], int]:
+        """Return the cached entry, or None and a token to pass to `fill`
+
+        With a version, only an entry of that version is returned.
+        """
+        record = (entity, record_id)
+        with self._lock:
+            cached = self._versions.get(record)
+            if cached is not None and (version is None or version == cached):
+                key = (entity, record_id, cached)
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key], 0
+            self.misses += 1
+            return None, self._generations[hash(record) % GENERATION_STRIPES]
+
+    def fill(self, entity: str, record_id: int, version: int, body: bytes, token: int) -> CachedResponse:
+        entry = CachedResponse(body, make_etag(body))
+        record = (entity, record_id)
+        with self._lock:
+            if self.max_entries <= 0 or self._generations[hash(record) % GENERATION_STRIPES] != token:
+                return entry
+            cached = self._versions.get(record)
+            if cached is not None:
+                if cached > version:
+                    # A reader that loaded later already cached a newer body
+                    return entry
+                del self._entries[(entity, record_id, cached)]
+            self._entries[(entity, record_id, version)] = entry
+            self._versions[record] = version
+            while len(self._entries) > self.max_entries:
+                (old_entity, old_id, _), _ = self._entries.popitem(last=False)
+                del self._versions[(old_entity, old_id)]
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, entity: str, record_id: int) -> None:
+        record = (entity, record_id)
+        with self._lock:
+            self._generations[hash(record) % GENERATION_STRIPES] += 1
+            cached = self._versions.pop(record, None)
+            if cached is not None:
+                del self._entries[(entity, record_id, cached)]
+                self.invalidations += 1
+
+    def invalidate_many(self, entity: str, record_ids: Iterable[int]) -> None:
+        for record_id in record_ids:
+            self.invalidate(entity, record_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._generations = [generation + 1 for generation in self._generations]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+response_cache = ResponseCache(settings.response_cache_size if settings.workers == 1 else 0)
+
+for _name, _kind, _documentation in (
+    ("hits", "counter", "GET-by-id lookups answered from the response cache"),
+    ("misses", "counter", "GET-by-id lookups that had to load and encode the record"),
+    ("evictions", "counter", "Entries dropped to stay within the size limit"),
+    ("invalidations", "counter", "Entries dropped because their record changed"),
+    ("entries", "gauge", "Entries currently cached"),
+    ("hit_rate", "gauge", "Hits over all lookups since start"),
+):
+    registry.register(CallbackMetric(
+        f"edutrack_response_cache_{_name}" + ("_total" if _kind == "counter" else ""),
+        _documentation,
+        _kind,
+        lambda _name=_name: response_cache.stats()[_name],
+    ))
+
+
+def collection_etag(*groups: Iterable[Any], extra: Any = None) -> str:
+    """ETag of a list built from groups of versioned records, such as a page and its embeds
+
+    extra stands for the rest of the response, e.g. the next cursor.
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    for records in groups:
+        pairs = sorted((record["id"], record["version"]) for record in records)
+        digest.update(array("Q", [value for pair in pairs for value in pair]).tobytes())
+        digest.update(b"/")
+    digest.update(repr(extra).encode("utf-8"))
+    return '"' + digest.hexdigest() + '"'
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Put etag on the response; returns a 304 to send instead if the client already has it"""
+    response.headers["ETag"] = etag
+    matched = matching_etag(request.headers.get("if-none-match"), etag)
+    if matched is not None:
+        headers = dict(response.headers)
+        headers["etag"] = matched
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
+
+
+async def cached_record_response(
+    request: Request,
+    entity: str,
+    record_id: int,
+    model: Type[BaseModel],
+    load: Callable[[int], Awaitable[Optional[Any]]],
+) -> Optional[Response]:
+    """Serve a record from the cache, loading and encoding it on a miss
+
+    Returns None when the record does not exist. Answers 304 when the
+    request's If-None-Match already names the current ETag.
+    """
+    entry, token = response_cache.lookup(entity, record_id)
+    if entry is None:
+        record = await load(record_id)
+        if record is None:
+            return None
+        entry = response_cache.fill(entity, record_id, record["version"], encode_record(model, record), token)
+    matched = matching_etag(request.headers.get("if-none-match"), entry.etag)
+    if matched is not None:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": matched})
+    headers = {"ETag": entry.etag}
+    return EncodedJSONResponse(entry.body, headers=headers)
\ No newline at end of file
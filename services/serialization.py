@@ -0,0 +1,134 @@
+"""Fast JSON encoding for list responses.
+
+FastAPI validates every item of a `List[Model]` response against the model and
+then re-encodes it, which dominates CPU time on large pages. Stored records
+were validated when they were written, so list endpoints can skip that step:
+`encode_list` picks the model's fields from each record and hands them to the
+C JSON encoder with the same options FastAPI's JSONResponse uses, producing
+byte-identical bodies.
+"""
+import json
+from datetime import date
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Sequence, Tuple, Type
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from services.bulk import NDJSON_MEDIA_TYPE
+from services.config import settings
+from services.repository import Delta
+
+
+def _encode_default(value: Any) -> Any:
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+_encoder = json.JSONEncoder(
+    ensure_ascii=False,
+    allow_nan=False,
+    indent=None,
+    separators=(",", ":"),
+    default=_encode_default,
+)
+
+
+def encode_list(model: Type[BaseModel], records: Iterable[Any]) -> bytes:
+    """Encode trusted records as the JSON array FastAPI would send for List[model]"""
+    fields = tuple(model.model_fields)
+    items = [{name: record[name] for name in fields} for record in records]
+    return _encoder.encode(items).encode("utf-8")
+
+
+def encode_record(model: Type[BaseModel], record: Any) -> bytes:
+    """Encode one trusted record as FastAPI would for response_model=model"""
+    return _encoder.encode({name: record[name] for name in model.model_fields}).encode("utf-8")
+
+
+# (key in the item, model of the related record, field of the item holding the
+# related record's key, related records by that key)
+Embed = Tuple[str, Type[BaseModel], str, Dict[int, Any]]
+
+
+def expand_records(model: Type[BaseModel], records: Iterable[Any], embeds: Sequence[Embed]) -> List[dict]:
+    """Build response items with related records embedded; a missing one becomes None"""
+    fields = tuple(model.model_fields)
+    embeds = [(name, tuple(related.model_fields), key, found) for name, related, key, found in embeds]
+    items = []
+    for record in records:
+        item = {name: record[name] for name in fields}
+        for name, related_fields, key, found in embeds:
+            related = found.get(record[key])
+            item[name] = None if related is None else {field: related[field] for field in related_fields}
+        items.append(item)
+    return items
+
+
+class EncodedJSONResponse(Response):
+    """A JSON response whose body is already encoded"""
+
+    media_type = "application/json"
+
+
+def list_response(model: Type[BaseModel], records: Iterable[Any], response: Response) -> Any:
+    """Return records for a `List[model]` endpoint, encoded directly when fast serialization is on
+
+    Headers already set on the injected response (such as X-Next-Cursor) are
+    carried over, since FastAPI drops them once a Response is returned.
+    """
+    if not settings.fast_serialization:
+        return records
+    return EncodedJSONResponse(encode_list(model, records), headers=dict(response.headers))
+
+
+def batch_response(model: Type[BaseModel], requested: Sequence[int], found: Dict[int, Any]) -> Any:
+    """Body of a batch get: found records in request order, then the IDs that were not found"""
+    ordered = [found[record_id] for record_id in requested if record_id in found]
+    missing = [record_id for record_id in requested if record_id not in found]
+    if not settings.fast_serialization:
+        return {"found": ordered, "missing": missing}
+    return EncodedJSONResponse(
+        b'{"found":' + encode_list(model, ordered) + b',"missing":' + _encoder.encode(missing).encode("utf-8") + b"}"
+    )
+
+
+def delta_response(model: Type[BaseModel], delta: Delta) -> Any:
+    """Body of a delta read: changed records, IDs of deleted ones, the version to resume from and `more`"""
+    deleted = [tombstone["id"] for tombstone in delta.deleted]
+    if not settings.fast_serialization:
+        return {"changed": delta.changed, "deleted": deleted, "version": delta.version, "more": delta.more}
+    tail = _encoder.encode({"deleted": deleted, "version": delta.version, "more": delta.more})
+    return EncodedJSONResponse(b'{"changed":' + encode_list(model, delta.changed) + b"," + tail[1:].encode("utf-8"))
+
+
+async def _iter_json_array(pages: AsyncIterable[List[dict]]) -> AsyncIterator[bytes]:
+    opened = False
+    async for items in pages:
+        if items:
+            # Each page is an array; its brackets give way to commas between pages
+            yield ("," if opened else "[").encode() + _encoder.encode(items)[1:-1].encode("utf-8")
+            opened = True
+    yield b"]" if opened else b"[]"
+
+
+async def _iter_ndjson(pages: AsyncIterable[List[dict]]) -> AsyncIterator[bytes]:
+    async for items in pages:
+        if items:
+            yield "".join([_encoder.encode(item) + "\n" for item in items]).encode("utf-8")
+
+
+def stream_list_response(pages: AsyncIterable[List[dict]], ndjson: bool) -> StreamingResponse:
+    """Stream pages of response items as one JSON array, or as NDJSON, a chunk per page"""
+    if ndjson:
+        return StreamingResponse(_iter_ndjson(pages), media_type=NDJSON_MEDIA_TYPE)
+    return StreamingResponse(_iter_json_array(pages), media_type="application/json")
+
+
+def expanded_list_response(
+    model: Type[BaseModel], records: Iterable[Any], embeds: Sequence[Embed], response: Response
+) -> Any:
+    """Like `list_response`, with related records embedded in each item"""
+    items = expand_records(model, records, embeds)
+    if not settings.fast_serialization:
+        return items
+    return EncodedJSONResponse(_encoder.encode(items).encode("utf-8"), headers=dict(response.headers))
\ No newline at end of file
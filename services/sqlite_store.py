@@ -0,0 +1,881 @@
+import json
+import queue
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from services.repository import (
+    CASCADE, RESTRICT, SOFT_DELETE, AlreadyEnrolledError, Delta, DeltaExpiredError, DuplicateEmailError,
+    HasEnrollmentsError, KeyPage, Page, ParentNotFoundError, Repository, delta_page, normalize_email
+)
+from services.metrics import LOCK_WAIT
+from services.text_search import parse_query
+from services.user_search import KEY_END, UserSearch, page_matches, user_keys
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    email_key TEXT NOT NULL UNIQUE,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS users_active ON users (is_active, id);
+CREATE INDEX IF NOT EXISTS users_version ON users (version);
+
+-- Prefix search keys of each user (see services.user_search), written together
+-- with the user since SQL cannot derive them
+CREATE TABLE IF NOT EXISTS user_search_keys (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (kind, key, user_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS user_search_keys_user ON user_search_keys (user_id);
+CREATE TRIGGER IF NOT EXISTS user_search_keys_drop AFTER DELETE ON users BEGIN
+    DELETE FROM user_search_keys WHERE user_id = OLD.id;
+END;
+
+CREATE TABLE IF NOT EXISTS courses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    is_open INTEGER NOT NULL DEFAULT 1,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS courses_open ON courses (is_open, id);
+CREATE INDEX IF NOT EXISTS courses_version ON courses (version);
+
+CREATE TABLE IF NOT EXISTS enrollments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    course_id INTEGER NOT NULL,
+    enrolled_date TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (user_id, course_id)
+);
+CREATE INDEX IF NOT EXISTS enrollments_user ON enrollments (user_id, id);
+CREATE INDEX IF NOT EXISTS enrollments_course ON enrollments (course_id, id);
+CREATE INDEX IF NOT EXISTS enrollments_completed ON enrollments (completed, id);
+CREATE INDEX IF NOT EXISTS enrollments_version ON enrollments (version);
+
+-- Versions for delta reads: every insert, update and delete takes the next
+-- value of the clock. Inserts and updates stamp it on the row, deletes leave
+-- a tombstone carrying it. Writers are serialized, so a reader that sees the
+-- clock at N sees every write up to N.
+CREATE TABLE IF NOT EXISTS sync_clock (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO sync_clock (id, version) VALUES (1, 0);
+CREATE TABLE IF NOT EXISTS deletions (
+    version INTEGER PRIMARY KEY,
+    entity TEXT NOT NULL,
+    record_id INTEGER NOT NULL,
+    user_id INTEGER,
+    course_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS deletions_entity ON deletions (entity, version);
+CREATE INDEX IF NOT EXISTS deletions_user ON deletions (user_id, version) WHERE entity = 'enrollment';
+CREATE INDEX IF NOT EXISTS deletions_course ON deletions (course_id, version) WHERE entity = 'enrollment';
+-- Tombstones at or below this version have been pruned
+CREATE TABLE IF NOT EXISTS deletion_horizon (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO deletion_horizon (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS users_version_insert AFTER INSERT ON users BEGIN
+    UPDATE sync_clock SET version = version + 1;
+    UPDATE users SET version = (SELECT version FROM sync_clock) WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS users_version_update AFTER UPDATE OF name, email, is_active ON users BEGIN
+    UPDATE sync_clock SET version = version + 1;
+    UPDATE users SET version = (SELECT version FROM sync_clock) WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS users_version_delete AFTER DELETE ON users BEGIN
+    UPDATE sync_clock SET version = version + 1;
+    INSERT INTO deletions (version, entity, record_id) SELECT version, 'user', OLD.id FROM sync_clock;
+END;
+CREATE TRIGGER IF NOT EXISTS courses_version_insert AFTER INSERT ON courses BEGIN
+    UPDATE sync_clock SET version = version + 1;
+    UPDATE courses SET version = (SELECT version FROM sync_clock) WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS courses_version_update AFTER UPDATE OF title, description, is_open ON courses BEGIN
+    UPDATE sync_clock SET version = version + 1;
+    UPDATE courses SET version = (SELECT version FROM sync_clock) WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS courses_version_delete AFTER DELETE ON courses BEGIN
+    UPDATE sync_clock SET version = version + 1;
+    INSERT INTO deletions (version, entity, record_id) SELECT version, 'course', OLD.id FROM sync_clock;
+END;
+CREATE TRIGGER IF NOT EXISTS enrollments_version_insert AFTER INSERT ON enrollments BEGIN
+    UPDATE sync_clock SET version = version + 1;
+    UPDATE enrollments SET version = (SELECT version FROM sync_clock) WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS enrollments_version_update AFTER UPDATE OF completed ON enrollments BEGIN
+    UPDATE sync_clock SET version = version + 1;
+    UPDATE enrollments SET version = (SELECT version FROM sync_clock) WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS enrollments_version_delete AFTER DELETE ON enrollments BEGIN
+    UPDATE sync_clock SET version = version + 1;
+    INSERT INTO deletions (version, entity, record_id, user_id, course_id)
+    SELECT version, 'enrollment', OLD.id, OLD.user_id, OLD.course_id FROM sync_clock;
+END;
+
+-- Per-course counters kept current by triggers, so stats reads never count rows
+CREATE TABLE IF NOT EXISTS course_stats (
+    course_id INTEGER PRIMARY KEY,
+    enrolled INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TRIGGER IF NOT EXISTS course_stats_enroll AFTER INSERT ON enrollments BEGIN
+    INSERT INTO course_stats (course_id, enrolled, completed) VALUES (NEW.course_id, 1, NEW.completed)
+    ON CONFLICT (course_id) DO UPDATE SET
+        enrolled = enrolled + 1, completed = completed + NEW.completed;
+END;
+CREATE TRIGGER IF NOT EXISTS course_stats_unenroll AFTER DELETE ON enrollments BEGIN
+    UPDATE course_stats SET enrolled = enrolled - 1, completed = completed - OLD.completed
+    WHERE course_id = OLD.course_id;
+END;
+CREATE TRIGGER IF NOT EXISTS course_stats_complete AFTER UPDATE OF completed ON enrollments
+WHEN OLD.completed != NEW.completed BEGIN
+    UPDATE course_stats SET completed = completed + NEW.completed - OLD.completed
+    WHERE course_id = NEW.course_id;
+END;
+CREATE TRIGGER IF NOT EXISTS course_stats_drop AFTER DELETE ON courses BEGIN
+    DELETE FROM course_stats WHERE course_id = OLD.id;
+END;
+
+-- Full-text index over course text, reading the text from courses itself
+CREATE VIRTUAL TABLE IF NOT EXISTS courses_fts USING fts5(
+    title, description, content='courses', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS courses_fts_insert AFTER INSERT ON courses BEGIN
+    INSERT INTO courses_fts (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+END;
+CREATE TRIGGER IF NOT EXISTS courses_fts_delete AFTER DELETE ON courses BEGIN
+    INSERT INTO courses_fts (courses_fts, rowid, title, description)
+    VALUES ('delete', OLD.id, OLD.title, OLD.description);
+END;
+CREATE TRIGGER IF NOT EXISTS courses_fts_update AFTER UPDATE OF title, description ON courses BEGIN
+    INSERT INTO courses_fts (courses_fts, rowid, title, description)
+    VALUES ('delete', OLD.id, OLD.title, OLD.description);
+    INSERT INTO courses_fts (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+END;
+"""
+
+# Fills course_stats for databases created before the counters existed
+BACKFILL_COURSE_STATS = """
+INSERT INTO course_stats (course_id, enrolled, completed)
+SELECT course_id, COUNT(*), SUM(completed) FROM enrollments
+WHERE course_id IN (SELECT id FROM courses)
+GROUP BY course_id
+"""
+
+# Fills courses_fts for databases created before the search index existed
+REBUILD_COURSE_SEARCH = "INSERT INTO courses_fts (courses_fts) VALUES ('rebuild')"
+
+# Tables that carry a version column, added to databases created before it existed
+VERSIONED_TABLES = ("users", "courses", "enrollments")
+
+SEARCH_USERS = (
+    "SELECT user_search_keys.key, users.id, users.name, users.email, users.is_active, users.version "
+    "FROM user_search_keys JOIN users ON users.id = user_search_keys.user_id "
+    "WHERE user_search_keys.kind = ? AND (user_search_keys.key, user_search_keys.user_id) > (?, ?) "
+    "AND user_search_keys.key < ? ORDER BY user_search_keys.key, user_search_keys.user_id"
+)
+
+# Title matches weigh twice as much as description matches
+SEARCH_COURSES = (
+    "SELECT courses.id, courses.title, courses.description, courses.is_open, courses.version "
+    "FROM courses_fts JOIN courses ON courses.id = courses_fts.rowid "
+    "WHERE courses_fts MATCH ? ORDER BY bm25(courses_fts, 2.0, 1.0), courses.id LIMIT ?"
+)
+
+COURSE_STATS_SELECT = (
+    "SELECT courses.id, COALESCE(course_stats.enrolled, 0), COALESCE(course_stats.completed, 0) "
+    "FROM courses LEFT JOIN course_stats ON course_stats.course_id = courses.id"
+)
+
+USER_COLUMNS = "id, name, email, is_active, version"
+COURSE_COLUMNS = "id, title, description, is_open, version"
+ENROLLMENT_COLUMNS = "id, user_id, course_id, enrolled_date, completed, version"
+
+CLOCK_SELECT = "SELECT version FROM sync_clock"
+HORIZON_SELECT = "SELECT version FROM deletion_horizon"
+
+# Values of a new enrollment, inserted only while its user and course exist; the
+# check runs inside the insert's transaction, so a concurrent delete cannot
+# leave the enrollment behind. Takes (user_id, course_id, enrolled_date, user_id, course_id).
+INSERT_IF_PARENTS = (
+    "SELECT ?, ?, ?, 0 WHERE EXISTS (SELECT 1 FROM users WHERE id = ?) "
+    "AND EXISTS (SELECT 1 FROM courses WHERE id = ?)"
+)
+
+# Columns a caller may change through update_*; keys are never updatable
+UPDATABLE_USER_COLUMNS = ("name", "email", "is_active")
+UPDATABLE_COURSE_COLUMNS = ("title", "description", "is_open")
+UPDATABLE_ENROLLMENT_COLUMNS = ("completed",)
+
+
+# SQLite integers are signed 64-bit, and binding a larger ID raises
+# OverflowError. No row can hold one, so such an ID is simply not found
+def _storable(*values: int) -> bool:
+    return all(-2 ** 63 <= value < 2 ** 63 for value in values)
+
+
+def _user(row: Optional[tuple]) -> Optional[dict]:
+    if row is None:
+        return None
+    return {
+        "id": row[0],
+        "name": row[1],
+        "email": row[2],
+        "is_active": bool(row[3]),
+        "version": row[4]
+    }
+
+def _insert_user_keys(connection: sqlite3.Connection, user_id: int, name: str, email: str) -> None:
+    connection.executemany(
+        "INSERT OR IGNORE INTO user_search_keys (kind, key, user_id) VALUES (?, ?, ?)",
+        [(kind, key, user_id) for kind, key in user_keys({"name": name, "email": email})],
+    )
+
+def _course(row: Optional[tuple]) -> Optional[dict]:
+    if row is None:
+        return None
+    return {
+        "id": row[0],
+        "title": row[1],
+        "description": row[2],
+        "is_open": bool(row[3]),
+        "version": row[4]
+    }
+
+def _course_stats(row: Optional[tuple]) -> Optional[dict]:
+    if row is None:
+        return None
+    return {"course_id": row[0], "enrolled": row[1], "completed": row[2]}
+
+def _enrollment(row: Optional[tuple]) -> Optional[dict]:
+    if row is None:
+        return None
+    return {
+        "id": row[0],
+        "user_id": row[1],
+        "course_id": row[2],
+        "enrolled_date": date.fromisoformat(row[3]),
+        "completed": bool(row[4]),
+        "version": row[5]
+    }
+
+
+class ConnectionPool:
+    """Fixed set of SQLite connections shared by the threadpool workers"""
+
+    def __init__(self, path: str, size: int):
+        self._connections: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all: List[sqlite3.Connection] = []
+        for _ in range(size):
+            connection = sqlite3.connect(
+                path,
+                timeout=30,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=256,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._all.append(connection)
+            self._connections.put(connection)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            connection = self._connections.get_nowait()
+        except queue.Empty:
+            # Every connection is busy; the wait counts as lock wait
+            started = time.perf_counter()
+            connection = self._connections.get()
+            LOCK_WAIT.observe(("sqlite_pool",), time.perf_counter() - started)
+        try:
+            yield connection
+        finally:
+            self._connections.put(connection)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Connection inside a write transaction that commits on success"""
+        with self.connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    @contextmanager
+    def snapshot(self) -> Iterator[sqlite3.Connection]:
+        """Connection inside a read transaction, so several queries see one state"""
+        with self.connection() as connection:
+            connection.execute("BEGIN")
+            try:
+                yield connection
+            finally:
+                connection.execute("COMMIT")
+
+    def close(self) -> None:
+        for connection in self._all:
+            connection.close()
+
+
+class SQLiteRepository(Repository):
+    """SQLite engine in WAL mode; the database file can be shared by several processes.
+
+    Every statement is a constant, parameterized SQL string so the per-connection
+    statement cache keeps them prepared across requests.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, pool_size: int = 5):
+        self.path = path
+        self.concurrency = pool_size
+        self.pool = ConnectionPool(path, pool_size)
+        with self.pool.connection() as connection:
+            had_search = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'courses_fts'"
+            ).fetchone() is not None
+            had_user_keys = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'user_search_keys'"
+            ).fetchone() is not None
+            unversioned = []
+            for table in VERSIONED_TABLES:
+                columns = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+                if columns and "version" not in columns:
+                    connection.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+                    unversioned.append(table)
+            connection.executescript(SCHEMA)
+        with self.pool.transaction() as connection:
+            if connection.execute("SELECT 1 FROM course_stats LIMIT 1").fetchone() is None:
+                connection.execute(BACKFILL_COURSE_STATS)
+            if not had_search:
+                connection.execute(REBUILD_COURSE_SEARCH)
+            if not had_user_keys:
+                for user_id, name, email in connection.execute("SELECT id, name, email FROM users").fetchall():
+                    _insert_user_keys(connection, user_id, name, email)
+            for table in unversioned:
+                # Existing rows get distinct versions in ID order
+                connection.execute(f"UPDATE {table} SET version = id + ({CLOCK_SELECT})")
+                connection.execute(
+                    f"UPDATE sync_clock SET version = version + (SELECT COALESCE(MAX(id), 0) FROM {table})"
+                )
+
+    def _one(self, sql: str, params: Sequence) -> Optional[tuple]:
+        with self.pool.connection() as connection:
+            return connection.execute(sql, params).fetchone()
+
+    def _all(self, sql: str, params: Sequence) -> List[tuple]:
+        with self.pool.connection() as connection:
+            return connection.execute(sql, params).fetchall()
+
+    def _update(
+        self,
+        table: str,
+        columns: Sequence[str],
+        record_id: int,
+        changes: dict,
+        connection: Optional[sqlite3.Connection] = None,
+    ) -> None:
+        assignments = [(column, changes[column]) for column in columns if column in changes]
+        if table == "users" and "email" in changes:
+            assignments.append(("email_key", normalize_email(changes["email"])))
+        if not assignments:
+            return
+        sql = "UPDATE {} SET {} WHERE id = ?".format(
+            table, ", ".join(f"{column} = ?" for column, _ in assignments)
+        )
+        if connection is not None:
+            connection.execute(sql, [value for _, value in assignments] + [record_id])
+            return
+        with self.pool.connection() as connection:
+            connection.execute(sql, [value for _, value in assignments] + [record_id])
+
+    def _delete_parent(self, table: str, column: str, record_id: int, policy: str) -> bool:
+        """Delete a user or course and, per policy, its enrollments in one transaction"""
+        if not _storable(record_id):
+            return False
+        with self.pool.transaction() as connection:
+            if connection.execute(f"DELETE FROM {table} WHERE id = ?", (record_id,)).rowcount == 0:
+                return False
+            if policy == RESTRICT:
+                dependent = connection.execute(
+                    f"SELECT 1 FROM enrollments WHERE {column} = ? LIMIT 1", (record_id,)
+                ).fetchone()
+                if dependent is not None:
+                    raise HasEnrollmentsError(record_id)
+            else:
+                connection.execute(f"DELETE FROM enrollments WHERE {column} = ?", (record_id,))
+            return True
+
+    def _page(self, rows: List[tuple], limit: int, convert) -> Page:
+        records = [convert(row) for row in rows[:limit]]
+        next_after_id = records[-1]["id"] if len(rows) > limit else None
+        return records, next_after_id
+
+    def _changes(
+        self, live_sql: str, deleted_sql: str, params: Sequence, since: int, limit: int, convert, tombstone
+    ) -> Delta:
+        """Rows written after `since` and, with since > 0, tombstones of rows deleted after it.
+
+        Both queries take (since, *params, limit) and return rows in version
+        order, the version being the last column of a live row and the first
+        of a tombstone.
+        """
+        with self.pool.snapshot() as connection:
+            until = connection.execute(CLOCK_SELECT).fetchone()[0]
+            horizon = connection.execute(HORIZON_SELECT).fetchone()[0]
+            if 0 < since < horizon:
+                raise DeltaExpiredError(horizon)
+            entries = [
+                (row[-1], convert(row), None) for row in connection.execute(live_sql, (since, *params, limit + 1))
+            ]
+            if since:
+                entries.extend(
+                    (row[0], None, tombstone(row))
+                    for row in connection.execute(deleted_sql, (since, *params, limit + 1))
+                )
+        entries.sort(key=lambda entry: entry[0])
+        return delta_page(entries[:limit + 1], limit, until)
+
+    # Users
+    def create_user(self, name: str, email: str) -> dict:
+        try:
+            with self.pool.transaction() as connection:
+                cursor = connection.execute(
+                    "INSERT INTO users (name, email, email_key, is_active) VALUES (?, ?, ?, 1)",
+                    (name, email, normalize_email(email)),
+                )
+                _insert_user_keys(connection, cursor.lastrowid, name, email)
+                version = connection.execute(CLOCK_SELECT).fetchone()[0]
+        except sqlite3.IntegrityError:
+            raise DuplicateEmailError(email)
+        return {"id": cursor.lastrowid, "name": name, "email": email, "is_active": True, "version": version}
+
+    def create_users(self, users: List[Tuple[str, str]]) -> List[Optional[dict]]:
+        created = []
+        with self.pool.transaction() as connection:
+            # Each inserted row advances the clock by one
+            version = connection.execute(CLOCK_SELECT).fetchone()[0]
+            for name, email in users:
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO users (name, email, email_key, is_active) VALUES (?, ?, ?, 1)",
+                    (name, email, normalize_email(email)),
+                )
+                if cursor.rowcount == 0:
+                    created.append(None)
+                else:
+                    _insert_user_keys(connection, cursor.lastrowid, name, email)
+                    version += 1
+                    created.append({
+                        "id": cursor.lastrowid, "name": name, "email": email, "is_active": True, "version": version
+                    })
+        return created
+
+    def get_user(self, user_id: int) -> Optional[dict]:
+        if not _storable(user_id):
+            return None
+        return _user(self._one(f"SELECT {USER_COLUMNS} FROM users WHERE id = ?", (user_id,)))
+
+    def get_users_many(self, user_ids: Iterable[int]) -> Dict[int, dict]:
+        rows = self._all(
+            f"SELECT {USER_COLUMNS} FROM users WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps([user_id for user_id in user_ids if _storable(user_id)]),),
+        )
+        return {row[0]: _user(row) for row in rows}
+
+    def find_user_by_email(self, email: str) -> Optional[dict]:
+        return _user(self._one(
+            f"SELECT {USER_COLUMNS} FROM users WHERE email_key = ?", (normalize_email(email),)
+        ))
+
+    def update_user(self, user_id: int, changes: dict) -> Optional[dict]:
+        if not _storable(user_id):
+            return None
+        try:
+            if "name" not in changes and "email" not in changes:
+                self._update("users", UPDATABLE_USER_COLUMNS, user_id, changes)
+            else:
+                with self.pool.transaction() as connection:
+                    self._update("users", UPDATABLE_USER_COLUMNS, user_id, changes, connection)
+                    row = connection.execute("SELECT name, email FROM users WHERE id = ?", (user_id,)).fetchone()
+                    if row is not None:
+                        connection.execute("DELETE FROM user_search_keys WHERE user_id = ?", (user_id,))
+                        _insert_user_keys(connection, user_id, *row)
+        except sqlite3.IntegrityError:
+            raise DuplicateEmailError(changes.get("email"))
+        return self.get_user(user_id)
+
+    def delete_user(self, user_id: int, policy: str = CASCADE) -> bool:
+        if policy == SOFT_DELETE:
+            return self.update_user(user_id, {"is_active": False}) is not None
+        return self._delete_parent("users", "user_id", user_id, policy)
+
+    def list_users(
+        self, after_id: int = 0, limit: int = 100, is_active: Optional[bool] = None
+    ) -> Page:
+        if not _storable(after_id):
+            return [], None
+        if is_active is None:
+            rows = self._all(
+                f"SELECT {USER_COLUMNS} FROM users WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, limit + 1),
+            )
+        else:
+            rows = self._all(
+                f"SELECT {USER_COLUMNS} FROM users WHERE is_active = ? AND id > ? ORDER BY id LIMIT ?",
+                (int(is_active), after_id, limit + 1),
+            )
+        return self._page(rows, limit, _user)
+
+    def search_users(
+        self,
+        name: Optional[str] = None,
+        domain: Optional[str] = None,
+        after: Tuple[str, int] = ("", 0),
+        limit: int = 100,
+    ) -> KeyPage:
+        search = UserSearch.parse(name, domain)
+        if search is None:
+            return [], None
+        start_key, start_id = search.start(after)
+        if not _storable(start_id):
+            return [], None
+        with self.pool.connection() as connection:
+            # Rows are stepped through lazily, only as far as the page needs
+            rows = connection.execute(
+                SEARCH_USERS, (search.kind, start_key, start_id, search.prefix + KEY_END)
+            )
+            return page_matches(search, ((row[0], row[1], _user(row[1:])) for row in rows), limit)
+
+    def list_user_changes(self, since: int = 0, limit: int = 100) -> Delta:
+        return self._changes(
+            f"SELECT {USER_COLUMNS} FROM users WHERE version > ? ORDER BY version LIMIT ?",
+            "SELECT version, record_id FROM deletions WHERE entity = 'user' AND version > ? "
+            "ORDER BY version LIMIT ?",
+            (), since, limit, _user, lambda row: {"id": row[1]},
+        )
+
+    # Courses
+    def create_course(self, title: str, description: str) -> dict:
+        return self.create_courses([(title, description)])[0]
+
+    def create_courses(self, courses: List[Tuple[str, str]]) -> List[dict]:
+        created = []
+        with self.pool.transaction() as connection:
+            version = connection.execute(CLOCK_SELECT).fetchone()[0]
+            for title, description in courses:
+                cursor = connection.execute(
+                    "INSERT INTO courses (title, description, is_open) VALUES (?, ?, 1)",
+                    (title, description),
+                )
+                version += 1
+                created.append({
+                    "id": cursor.lastrowid,
+                    "title": title,
+                    "description": description,
+                    "is_open": True,
+                    "version": version
+                })
+        return created
+
+    def get_course(self, course_id: int) -> Optional[dict]:
+        if not _storable(course_id):
+            return None
+        return _course(self._one(f"SELECT {COURSE_COLUMNS} FROM courses WHERE id = ?", (course_id,)))
+
+    def get_courses_many(self, course_ids: Iterable[int]) -> Dict[int, dict]:
+        rows = self._all(
+            f"SELECT {COURSE_COLUMNS} FROM courses WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps([course_id for course_id in course_ids if _storable(course_id)]),),
+        )
+        return {row[0]: _course(row) for row in rows}
+
+    def update_course(self, course_id: int, changes: dict) -> Optional[dict]:
+        if not _storable(course_id):
+            return None
+        self._update("courses", UPDATABLE_COURSE_COLUMNS, course_id, changes)
+        return self.get_course(course_id)
+
+    def delete_course(self, course_id: int, policy: str = CASCADE) -> bool:
+        if policy == SOFT_DELETE:
+            return self.update_course(course_id, {"is_open": False}) is not None
+        return self._delete_parent("courses", "course_id", course_id, policy)
+
+    def list_courses(
+        self, after_id: int = 0, limit: int = 100, is_open: Optional[bool] = None
+    ) -> Page:
+        if not _storable(after_id):
+            return [], None
+        if is_open is None:
+            rows = self._all(
+                f"SELECT {COURSE_COLUMNS} FROM courses WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, limit + 1),
+            )
+        else:
+            rows = self._all(
+                f"SELECT {COURSE_COLUMNS} FROM courses WHERE is_open = ? AND id > ? ORDER BY id LIMIT ?",
+                (int(is_open), after_id, limit + 1),
+            )
+        return self._page(rows, limit, _course)
+
+    def search_courses(self, query: str, limit: int = 20) -> List[dict]:
+        exact, prefix = parse_query(query)
+        if prefix is None:
+            return []
+        # Quoting each token keeps FTS5 query syntax in the input from applying
+        match = " ".join([f'"{token}"' for token in exact] + [f'"{prefix}"*'])
+        return [_course(row) for row in self._all(SEARCH_COURSES, (match, limit))]
+
+    def list_course_changes(self, since: int = 0, limit: int = 100) -> Delta:
+        return self._changes(
+            f"SELECT {COURSE_COLUMNS} FROM courses WHERE version > ? ORDER BY version LIMIT ?",
+            "SELECT version, record_id FROM deletions WHERE entity = 'course' AND version > ? "
+            "ORDER BY version LIMIT ?",
+            (), since, limit, _course, lambda row: {"id": row[1]},
+        )
+
+    def get_course_stats(self, course_id: int) -> Optional[dict]:
+        if not _storable(course_id):
+            return None
+        return _course_stats(self._one(f"{COURSE_STATS_SELECT} WHERE courses.id = ?", (course_id,)))
+
+    def list_course_stats(self, after_id: int = 0, limit: int = 100) -> Page:
+        if not _storable(after_id):
+            return [], None
+        rows = self._all(
+            f"{COURSE_STATS_SELECT} WHERE courses.id > ? ORDER BY courses.id LIMIT ?",
+            (after_id, limit + 1),
+        )
+        stats = [_course_stats(row) for row in rows[:limit]]
+        next_after_id = stats[-1]["course_id"] if len(rows) > limit else None
+        return stats, next_after_id
+
+    # Enrollments
+    def create_enrollment(self, user_id: int, course_id: int, enrolled_date: date) -> dict:
+        try:
+            with self.pool.transaction() as connection:
+                if not _storable(user_id, course_id):
+                    raise ParentNotFoundError(user_id, course_id, self._missing_parent(connection, user_id, course_id))
+                cursor = connection.execute(
+                    f"INSERT INTO enrollments (user_id, course_id, enrolled_date, completed) {INSERT_IF_PARENTS}",
+                    (user_id, course_id, enrolled_date.isoformat(), user_id, course_id),
+                )
+                if cursor.rowcount == 0:
+                    raise ParentNotFoundError(user_id, course_id, self._missing_parent(connection, user_id, course_id))
+                version = connection.execute(CLOCK_SELECT).fetchone()[0]
+        except sqlite3.IntegrityError:
+            raise AlreadyEnrolledError(user_id, course_id)
+        return {
+            "id": cursor.lastrowid,
+            "user_id": user_id,
+            "course_id": course_id,
+            "enrolled_date": enrolled_date,
+            "completed": False,
+            "version": version
+        }
+
+    def create_enrollments(
+        self, pairs: List[Tuple[int, int]], enrolled_date: date, atomic: bool = False
+    ) -> List[Optional[dict]]:
+        day = enrolled_date.isoformat()
+        created = []
+        with self.pool.transaction() as connection:
+            version = connection.execute(CLOCK_SELECT).fetchone()[0]
+            for user_id, course_id in pairs:
+                cursor = None
+                if _storable(user_id, course_id):
+                    cursor = connection.execute(
+                        f"INSERT OR IGNORE INTO enrollments (user_id, course_id, enrolled_date, completed) "
+                        f"{INSERT_IF_PARENTS}",
+                        (user_id, course_id, day, user_id, course_id),
+                    )
+                if cursor is None or cursor.rowcount == 0:
+                    if atomic:
+                        missing = self._missing_parent(connection, user_id, course_id)
+                        if missing is not None:
+                            raise ParentNotFoundError(user_id, course_id, missing)
+                        raise AlreadyEnrolledError(user_id, course_id)
+                    created.append(None)
+                    continue
+                version += 1
+                created.append({
+                    "id": cursor.lastrowid,
+                    "user_id": user_id,
+                    "course_id": course_id,
+                    "enrolled_date": enrolled_date,
+                    "completed": False,
+                    "version": version
+                })
+        return created
+
+    @staticmethod
+    def _missing_parent(connection: sqlite3.Connection, user_id: int, course_id: int) -> Optional[str]:
+        if not _storable(user_id) or connection.execute(
+            "SELECT 1 FROM users WHERE id = ?", (user_id,)
+        ).fetchone() is None:
+            return "user"
+        if not _storable(course_id) or connection.execute(
+            "SELECT 1 FROM courses WHERE id = ?", (course_id,)
+        ).fetchone() is None:
+            return "course"
+        return None
+
+    def find_enrolled_pairs(self, pairs: Iterable[Tuple[int, int]]) -> Set[Tuple[int, int]]:
+        rows = self._all(
+            "SELECT user_id, course_id FROM enrollments WHERE (user_id, course_id) IN "
+            "(SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?))",
+            (json.dumps([list(pair) for pair in pairs if _storable(*pair)]),),
+        )
+        return {(row[0], row[1]) for row in rows}
+
+    def get_enrollment(self, enrollment_id: int) -> Optional[dict]:
+        if not _storable(enrollment_id):
+            return None
+        return _enrollment(self._one(
+            f"SELECT {ENROLLMENT_COLUMNS} FROM enrollments WHERE id = ?", (enrollment_id,)
+        ))
+
+    def get_enrollments_many(self, enrollment_ids: Iterable[int]) -> Dict[int, dict]:
+        rows = self._all(
+            f"SELECT {ENROLLMENT_COLUMNS} FROM enrollments WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps([enrollment_id for enrollment_id in enrollment_ids if _storable(enrollment_id)]),),
+        )
+        return {row[0]: _enrollment(row) for row in rows}
+
+    def find_enrollment(self, user_id: int, course_id: int) -> Optional[dict]:
+        if not _storable(user_id, course_id):
+            return None
+        return _enrollment(self._one(
+            f"SELECT {ENROLLMENT_COLUMNS} FROM enrollments WHERE user_id = ? AND course_id = ?",
+            (user_id, course_id),
+        ))
+
+    def update_enrollment(self, enrollment_id: int, changes: dict) -> Optional[dict]:
+        if not _storable(enrollment_id):
+            return None
+        self._update("enrollments", UPDATABLE_ENROLLMENT_COLUMNS, enrollment_id, changes)
+        return self.get_enrollment(enrollment_id)
+
+    def delete_enrollment(self, enrollment_id: int) -> bool:
+        if not _storable(enrollment_id):
+            return False
+        with self.pool.connection() as connection:
+            cursor = connection.execute("DELETE FROM enrollments WHERE id = ?", (enrollment_id,))
+            return cursor.rowcount > 0
+
+    def list_enrollments(
+        self,
+        after_id: int = 0,
+        limit: int = 100,
+        user_id: Optional[int] = None,
+        course_id: Optional[int] = None,
+        completed: Optional[bool] = None,
+    ) -> Page:
+        if not _storable(after_id, *(value for value in (user_id, course_id) if value is not None)):
+            return [], None
+        conditions = ["id > ?"]
+        params: list = [after_id]
+        for column, value in (("user_id", user_id), ("course_id", course_id), ("completed", completed)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(int(value))
+        params.append(limit + 1)
+        rows = self._all(
+            f"SELECT {ENROLLMENT_COLUMNS} FROM enrollments WHERE {' AND '.join(conditions)} "
+            "ORDER BY id LIMIT ?",
+            params,
+        )
+        return self._page(rows, limit, _enrollment)
+
+    def list_enrollment_changes(
+        self,
+        since: int = 0,
+        limit: int = 100,
+        user_id: Optional[int] = None,
+        course_id: Optional[int] = None,
+    ) -> Delta:
+        conditions = ["version > ?"]
+        params = []
+        for column, value in (("user_id", user_id), ("course_id", course_id)):
+            if value is None:
+                continue
+            if _storable(value):
+                conditions.append(f"{column} = ?")
+                params.append(value)
+            else:
+                # No row can hold the value
+                conditions.append("0")
+        where = " AND ".join(conditions)
+        return self._changes(
+            f"SELECT {ENROLLMENT_COLUMNS} FROM enrollments WHERE {where} ORDER BY version LIMIT ?",
+            "SELECT version, record_id, user_id, course_id FROM deletions "
+            f"WHERE entity = 'enrollment' AND {where} ORDER BY version LIMIT ?",
+            params, since, limit, _enrollment,
+            lambda row: {"id": row[1], "user_id": row[2], "course_id": row[3]},
+        )
+
+    def get_enrollments_for_user(self, user_id: int) -> List[dict]:
+        if not _storable(user_id):
+            return []
+        rows = self._all(
+            f"SELECT {ENROLLMENT_COLUMNS} FROM enrollments WHERE user_id = ? ORDER BY id", (user_id,)
+        )
+        return [_enrollment(row) for row in rows]
+
+    def get_enrollments_for_course(self, course_id: int) -> List[dict]:
+        if not _storable(course_id):
+            return []
+        rows = self._all(
+            f"SELECT {ENROLLMENT_COLUMNS} FROM enrollments WHERE course_id = ? ORDER BY id", (course_id,)
+        )
+        return [_enrollment(row) for row in rows]
+
+    # Maintenance
+    def purge_orphans(self) -> List[int]:
+        with self.pool.transaction() as connection:
+            rows = connection.execute(
+                "DELETE FROM enrollments "
+                "WHERE NOT EXISTS (SELECT 1 FROM users WHERE users.id = enrollments.user_id) "
+                "OR NOT EXISTS (SELECT 1 FROM courses WHERE courses.id = enrollments.course_id) "
+                "RETURNING id"
+            ).fetchall()
+        return sorted(row[0] for row in rows)
+
+    def prune_deletions(self, keep: int) -> int:
+        with self.pool.transaction() as connection:
+            horizon = connection.execute(CLOCK_SELECT).fetchone()[0] - keep
+            if horizon <= connection.execute(HORIZON_SELECT).fetchone()[0]:
+                return 0
+            connection.execute("UPDATE deletion_horizon SET version = ?", (horizon,))
+            return connection.execute("DELETE FROM deletions WHERE version <= ?", (horizon,)).rowcount
+
+    def reset(self) -> None:
+        with self.pool.transaction() as connection:
+            connection.execute("DELETE FROM enrollments")
+            connection.execute("DELETE FROM courses")
+            connection.execute("DELETE FROM users")
+            connection.execute("DELETE FROM course_stats")
+            # The clock keeps running, so versions handed out before stay unique
+            connection.execute("DELETE FROM deletions")
+            connection.execute(f"UPDATE deletion_horizon SET version = ({CLOCK_SELECT})")
+
+    def close(self) -> None:
+        self.pool.close()
\ No newline at end of file
@@ -0,0 +1,306 @@
+"""Inverted index for ranked keyword search over course titles and descriptions.
+
+Text is split into lowercase word tokens with diacritics removed. A query
+matches courses containing every query token; the last token also matches as
+a prefix, so `pyth` finds `python` while the user is still typing.
+
+Ranking is BM25 with title tokens counted twice. Each posting stores the
+token's BM25 term weight for its course, quantized to a byte, and posting
+lists are kept sorted by that weight, highest first. A search walks the
+rarest token's list in that order, looks up the other tokens' weights for
+each candidate, and stops once no unseen course could beat the current top
+`limit`, so popular terms cost about as much as rare ones.
+"""
+import heapq
+import math
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+TITLE_WEIGHT = 2
+# BM25 parameters; document lengths are normalized against a fixed reference
+# length so stored weights never need recomputing as the catalog grows
+K1 = 1.2
+B = 0.75
+REFERENCE_LENGTH = 32
+MAX_IMPACT = 255
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+# A prefix expands to at most this many of its most frequent tokens
+MAX_PREFIX_TERMS = 64
+# Candidates examined per query before settling for the best found so far
+MAX_CANDIDATES = 20000
+# Tokens in at least one course in this many also keep a byte per course ID
+# holding their weight, at most twice the size of their postings
+IMPACT_MAP_DENSITY = 16
+IMPACT_MAP_MIN_POSTINGS = 1000
+# Copying a posting into a lookup dict costs well under a hundredth of
+# re-reading a candidate's text; copy lists up to this many times the
+# driver's length, since a search rarely reads the whole driver list
+LOOKUP_COST_RATIO = 64
+
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+
+# Course ID -> impact; 0 means the course lacks the token
+ImpactLookup = Union[bytearray, Dict[int, int]]
+
+
+def tokenize(text: str) -> List[str]:
+    text = text.casefold()
+    if not text.isascii():
+        text = "".join(
+            char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char)
+        )
+    return TOKEN_PATTERN.findall(text)
+
+
+def parse_query(query: str) -> Tuple[List[str], Optional[str]]:
+    """Split a query into exact tokens and a trailing prefix token"""
+    tokens = list(dict.fromkeys(tokenize(query)))
+    if not tokens:
+        return [], None
+    return tokens[:-1], tokens[-1]
+
+
+def term_impacts(title: str, description: str) -> Dict[str, int]:
+    """Quantized BM25 term weight of every token of a course, 1..MAX_IMPACT"""
+    title_tokens = tokenize(title)
+    description_tokens = tokenize(description)
+    frequencies = Counter(description_tokens)
+    for token in title_tokens:
+        frequencies[token] += TITLE_WEIGHT
+    length = TITLE_WEIGHT * len(title_tokens) + len(description_tokens)
+    norm = K1 * (1 - B + B * length / REFERENCE_LENGTH)
+    return {
+        token: max(1, round(frequency / (frequency + norm) * MAX_IMPACT))
+        for token, frequency in frequencies.items()
+    }
+
+
+def _posting(course_id: int, impact: int) -> int:
+    # Ascending order of these keys is descending impact, then ascending ID
+    return (MAX_IMPACT - impact) << ID_BITS | course_id
+
+
+def _impact(key: int) -> int:
+    return MAX_IMPACT - (key >> ID_BITS)
+
+
+def _wants_impact_map(postings: int, max_id: int) -> bool:
+    return postings >= IMPACT_MAP_MIN_POSTINGS and postings * IMPACT_MAP_DENSITY >= max_id
+
+
+def _set_impact(impact_map: bytearray, course_id: int, impact: int) -> None:
+    if course_id >= len(impact_map):
+        impact_map.extend(bytes(course_id - len(impact_map) + 4096))
+    impact_map[course_id] = impact
+
+
+def _impact_map(postings: Iterable[int]) -> bytearray:
+    impact_map = bytearray()
+    for key in postings:
+        _set_impact(impact_map, key & ID_MASK, _impact(key))
+    return impact_map
+
+
+class CourseSearchIndex:
+    """Token -> impact-ordered posting array, plus the sorted vocabulary for prefixes.
+
+    Common tokens also keep an impact map, a bytearray indexed by course ID,
+    so a candidate's weight for them is one lookup. Other tokens' weights are
+    copied into a dict per query when their lists are short enough.
+
+    Not thread-safe for writers; the owning store serializes add/remove.
+    Searches may run alongside a writer and at worst see a course twice or
+    miss one that is changing.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, array] = {}
+        self._impact_maps: Dict[str, bytearray] = {}
+        self._vocabulary: List[str] = []
+        self._max_id = 0
+        self.documents = 0
+
+    def add(self, course_id: int, title: str, description: str) -> None:
+        self._max_id = max(self._max_id, course_id)
+        for token, impact in term_impacts(title, description).items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = array("Q")
+                insort(self._vocabulary, token)
+            insort(postings, _posting(course_id, impact))
+            impact_map = self._impact_maps.get(token)
+            if impact_map is not None:
+                _set_impact(impact_map, course_id, impact)
+            elif _wants_impact_map(len(postings), self._max_id):
+                self._impact_maps[token] = _impact_map(postings)
+        self.documents += 1
+
+    def remove(self, course_id: int, title: str, description: str) -> None:
+        for token, impact in term_impacts(title, description).items():
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            key = _posting(course_id, impact)
+            position = bisect_left(postings, key)
+            if position < len(postings) and postings[position] == key:
+                del postings[position]
+            impact_map = self._impact_maps.get(token)
+            if impact_map is not None and course_id < len(impact_map):
+                impact_map[course_id] = 0
+            if not postings:
+                del self._postings[token]
+                self._impact_maps.pop(token, None)
+                del self._vocabulary[bisect_left(self._vocabulary, token)]
+        self.documents -= 1
+
+    def build(self, courses: Iterable[dict]) -> None:
+        """Index many courses at once, sorting each posting list a single time"""
+        collected: Dict[str, List[int]] = {}
+        for course in courses:
+            self._max_id = max(self._max_id, course["id"])
+            for token, impact in term_impacts(course["title"], course["description"]).items():
+                collected.setdefault(token, []).append(_posting(course["id"], impact))
+            self.documents += 1
+        for token, postings in collected.items():
+            existing = self._postings.get(token)
+            if existing is not None:
+                postings.extend(existing)
+            postings.sort()
+            self._postings[token] = array("Q", postings)
+            if _wants_impact_map(len(postings), self._max_id):
+                self._impact_maps[token] = _impact_map(postings)
+        self._vocabulary = sorted(self._postings)
+
+    def _idf(self, token: str) -> float:
+        frequency = len(self._postings.get(token, ()))
+        return math.log(1 + (self.documents - frequency + 0.5) / (frequency + 0.5))
+
+    def _expand(self, prefix: str) -> List[str]:
+        start = bisect_left(self._vocabulary, prefix)
+        end = bisect_left(self._vocabulary, prefix + "\U0010ffff", start)
+        tokens = self._vocabulary[start:end]
+        if len(tokens) > MAX_PREFIX_TERMS:
+            tokens = heapq.nlargest(MAX_PREFIX_TERMS, tokens, key=lambda token: len(self._postings[token]))
+        return tokens
+
+    def _candidates(self, tokens: List[str], idf: Dict[str, float]) -> Iterator[Tuple[float, int]]:
+        """(score, course ID) from several posting lists, highest score first.
+
+        A course listed under several of the tokens comes first with its best
+        score, which is its score for the group.
+        """
+        weights = [idf[token] / MAX_IMPACT for token in tokens]
+        if len(tokens) == 1:
+            weight = weights[0]
+            for key in self._postings[tokens[0]]:
+                yield weight * _impact(key), key & ID_MASK
+            return
+        iterators = [iter(self._postings[token]) for token in tokens]
+        heap = []
+        for position, postings in enumerate(iterators):
+            key = next(postings)
+            heap.append((-weights[position] * _impact(key), key, position))
+        heapq.heapify(heap)
+        while heap:
+            score, key, position = heap[0]
+            yield -score, key & ID_MASK
+            key = next(iterators[position], None)
+            if key is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, (-weights[position] * _impact(key), key, position))
+
+    def _lookups(
+        self, tokens: List[str], idf: Dict[str, float], budget: int
+    ) -> Optional[List[Tuple[float, ImpactLookup]]]:
+        """(weight, impact lookup) per token, or None if copying postings costs over budget"""
+        short = [token for token in tokens if token not in self._impact_maps]
+        if sum(len(self._postings[token]) for token in short) > budget:
+            return None
+        lookups = []
+        for token in tokens:
+            impact_map = self._impact_maps.get(token)
+            if impact_map is None:
+                # Inlined rather than calling _impact, which triples the cost
+                impact_map = {key & ID_MASK: MAX_IMPACT - (key >> ID_BITS) for key in self._postings[token]}
+            lookups.append((idf[token] / MAX_IMPACT, impact_map))
+        return lookups
+
+    def search(
+        self, query: str, limit: int, load: Callable[[int], Optional[dict]]
+    ) -> List[Tuple[float, dict]]:
+        """Best `limit` (score, course) pairs for a query, highest score first"""
+        exact, prefix = parse_query(query)
+        if prefix is None:
+            return []
+        # Each group is a set of alternative tokens; a course must match every group
+        groups = [[token] for token in exact] + [self._expand(prefix)]
+        if any(not tokens or any(token not in self._postings for token in tokens) for tokens in groups):
+            return []
+        idf = {token: self._idf(token) for tokens in groups for token in tokens}
+        groups.sort(key=lambda tokens: sum(len(self._postings[token]) for token in tokens))
+        driver, others = groups[0], groups[1:]
+        # The first posting of each list holds its highest impact
+        others_bound = sum(
+            max(idf[token] * _impact(self._postings[token][0]) for token in tokens) for tokens in others
+        ) / MAX_IMPACT
+        budget = LOOKUP_COST_RATIO * sum(len(self._postings[token]) for token in driver)
+        lookups, unindexed = [], []
+        for tokens in others:
+            group_lookups = self._lookups(tokens, idf, budget)
+            if group_lookups is None:
+                unindexed.append(tokens)
+            else:
+                lookups.append(group_lookups)
+
+        best: List[Tuple[float, int, dict]] = []
+        seen = set()
+        for examined, (score, course_id) in enumerate(self._candidates(driver, idf)):
+            if len(best) == limit and best[0][0] >= score + others_bound:
+                break
+            if examined >= MAX_CANDIDATES:
+                break
+            if course_id in seen:
+                continue
+            seen.add(course_id)
+            for group_lookups in lookups:
+                group_score = 0.0
+                for weight, impacts in group_lookups:
+                    impact = impacts.get(course_id, 0) if isinstance(impacts, dict) else (
+                        impacts[course_id] if course_id < len(impacts) else 0
+                    )
+                    group_score = max(group_score, weight * impact)
+                if not group_score:
+                    break
+                score += group_score
+            else:
+                course = load(course_id)
+                if course is None:
+                    continue
+                if unindexed:
+                    # Lists too long to copy: read the weights from the course's own text
+                    impacts = term_impacts(course["title"], course["description"])
+                    group_scores = [
+                        max((idf[token] * impacts.get(token, 0) for token in tokens), default=0.0)
+                        for tokens in unindexed
+                    ]
+                    if not all(group_scores):
+                        continue
+                    score += sum(group_scores) / MAX_IMPACT
+                # Ties go to the lower ID, so -course_id ranks it higher in the heap
+                entry = (score, -course_id, course)
+                if len(best) < limit:
+                    heapq.heappush(best, entry)
+                elif entry[:2] > best[0][:2]:
+                    heapq.heapreplace(best, entry)
+        return [(score, course) for score, _, course in sorted(best, key=lambda entry: entry[:2], reverse=True)]
\ No newline at end of file
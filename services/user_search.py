@@ -0,0 +1,144 @@
+"""Prefix search over user names and email domains.
+
+Each user has sorted-index keys of two kinds:
+
+- name keys: the normalized name starting at each of its words, so `jo`
+  finds "Alice Johnson" through the key "johnson" and `alice j` through
+  "alice johnson"
+- a domain key: the email's domain labels reversed, then the local part, so
+  "ann@cs.school.edu" is "edu.school.cs.@ann" and the domain `school.edu`
+  becomes the prefix "edu.school.", which matches subdomains too but not
+  "myschool.edu"
+
+A search scans one index from its prefix in (key, user ID) order, which also
+serves as the pagination cursor. The engines feed the scanned entries to
+`page_matches`, which drops entries that are stale or duplicated and applies
+the other filter.
+"""
+from bisect import bisect_left, bisect_right, insort
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from services.pagination import MAX_SCAN_FACTOR
+from services.repository import KeyPage, normalize_email
+from services.text_search import tokenize
+
+NAME = "name"
+DOMAIN = "domain"
+
+# Greater than any character a key can contain, for range upper bounds
+KEY_END = "\U0010ffff"
+
+
+def name_keys(name: str) -> List[str]:
+    words = tokenize(name)
+    return sorted({" ".join(words[start:]) for start in range(len(words))})
+
+
+def domain_key(email: str) -> str:
+    local, _, domain = normalize_email(email).rpartition("@")
+    return ".".join(reversed(domain.split("."))) + ".@" + local
+
+
+def user_keys(user: dict) -> List[Tuple[str, str]]:
+    """(kind, key) pairs to index for a user"""
+    return [(NAME, key) for key in name_keys(user["name"])] + [(DOMAIN, domain_key(user["email"]))]
+
+
+class UserSearch(NamedTuple):
+    """A parsed search: the index to scan, its prefix, and the filter on the other"""
+
+    kind: str
+    prefix: str
+    domain_prefix: Optional[str]
+
+    @classmethod
+    def parse(cls, name: Optional[str], domain: Optional[str]) -> Optional["UserSearch"]:
+        """None when the terms normalize to nothing, which matches no user"""
+        domain_prefix = None
+        if domain is not None:
+            labels = [label for label in domain.strip().lstrip("@").lower().split(".") if label]
+            if not labels:
+                return None
+            domain_prefix = ".".join(reversed(labels)) + "."
+        if name is not None:
+            name_prefix = " ".join(tokenize(name))
+            if not name_prefix:
+                return None
+            return cls(NAME, name_prefix, domain_prefix)
+        if domain_prefix is None:
+            return None
+        return cls(DOMAIN, domain_prefix, None)
+
+    def start(self, after: Tuple[str, int]) -> Tuple[str, int]:
+        """First (key, user ID) to scan from, given the previous page's cursor"""
+        return max(after, (self.prefix, 0))
+
+    def matches(self, key: str, user: dict) -> bool:
+        if self.kind == DOMAIN:
+            # The key must still be the user's; the email may have changed
+            return key == domain_key(user["email"])
+        # A name with several matching keys is returned at the first of them
+        matching = [candidate for candidate in name_keys(user["name"]) if candidate.startswith(self.prefix)]
+        if not matching or key != matching[0]:
+            return False
+        return self.domain_prefix is None or domain_key(user["email"]).startswith(self.domain_prefix)
+
+
+def page_matches(
+    search: UserSearch, entries: Iterable[Tuple[str, int, Optional[dict]]], limit: int
+) -> KeyPage:
+    """Up to `limit` users from (key, user ID, user) entries in index order, plus the cursor to resume after.
+
+    Entries for a user deleted meanwhile carry None. At most MAX_SCAN_FACTOR *
+    limit entries are examined, so a page may come back short while still
+    carrying a cursor.
+    """
+    entries = iter(entries)
+    page = []
+    last = None
+    for examined, (key, user_id, user) in enumerate(entries, 1):
+        last = (key, user_id)
+        if user is not None and search.matches(key, user):
+            page.append(user)
+        if len(page) == limit or examined == limit * MAX_SCAN_FACTOR:
+            break
+    else:
+        return page, None
+    # Only advertise another page if the scan stopped before the end
+    if next(entries, None) is None:
+        return page, None
+    return page, last
+
+
+class PrefixIndex:
+    """Sorted list of (key, user ID) pairs"""
+
+    def __init__(self):
+        self._entries: List[Tuple[str, int]] = []
+
+    def add(self, keys: Iterable[str], user_id: int) -> None:
+        for key in keys:
+            insort(self._entries, (key, user_id))
+
+    def remove(self, keys: Iterable[str], user_id: int) -> None:
+        for key in keys:
+            position = bisect_left(self._entries, (key, user_id))
+            if position < len(self._entries) and self._entries[position] == (key, user_id):
+                del self._entries[position]
+
+    def load(self, entries: Iterable[Tuple[str, int]]) -> None:
+        self._entries.extend(entries)
+        self._entries.sort()
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def scan(self, prefix: str, after: Tuple[str, int]) -> Iterator[Tuple[str, int]]:
+        """Entries whose key starts with prefix, from the first one above `after`"""
+        entries = self._entries
+        position = bisect_right(entries, after)
+        while position < len(entries):
+            key, user_id = entries[position]
+            if not key.startswith(prefix):
+                return
+            yield key, user_id
+            position += 1
\ No newline at end of file
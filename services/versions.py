@@ -0,0 +1,119 @@
+"""Version numbers for delta reads of the in-memory engine.
+
+Every write takes the next number from a VersionClock and stamps it on the
+record it changes, deletes included. A VersionIndex per table keeps one
+(version, ID) pair per record in version order, so "what changed after
+version N" is a bisect and a short scan instead of a pass over the table.
+
+Writers can finish out of order, so a reader may only trust versions up to
+the watermark: the highest version below which every write is complete.
+Reading up to the watermark and handing it back as the next starting point
+never skips a write that was still in flight.
+"""
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+
+class VersionClock:
+    """Hands out increasing versions and tracks the writes still using theirs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Set[int] = set()
+        self.last = 0
+
+    @contextmanager
+    def tick(self) -> Iterator[int]:
+        """Reserve the next version for a write that lasts as long as the block"""
+        with self._lock:
+            self.last += 1
+            version = self.last
+            self._pending.add(version)
+        try:
+            yield version
+        finally:
+            with self._lock:
+                self._pending.discard(version)
+
+    def advance(self, version: int) -> None:
+        """Make later versions higher than `version`; used when restoring"""
+        with self._lock:
+            self.last = max(self.last, version)
+
+    def take(self) -> int:
+        """Next version for a restored record that has none (saved before versions existed)"""
+        with self._lock:
+            self.last += 1
+            return self.last
+
+    def watermark(self) -> int:
+        """Highest version such that it and every lower one are fully written"""
+        with self._lock:
+            if self._pending:
+                return min(self._pending) - 1
+            return self.last
+
+
+class VersionIndex:
+    """(version, ID) pairs of one table in version order, one pair per record.
+
+    A deleted record keeps its pair, carrying the version of the delete.
+    Versions come from one clock, so a version identifies its pair.
+    """
+
+    def __init__(self):
+        self._versions = array("Q")
+        self._ids = array("I")
+        self._lock = threading.Lock()
+
+    def move(self, record_id: int, old_version: Optional[int], version: int) -> None:
+        """Replace a record's pair at old_version (None for a new record) with one at version"""
+        with self._lock:
+            versions, ids = self._versions, self._ids
+            if old_version is not None:
+                position = bisect_left(versions, old_version)
+                if position < len(versions) and versions[position] == old_version and ids[position] == record_id:
+                    del versions[position]
+                    del ids[position]
+            # Versions are taken in increasing order, so this is almost always an append
+            if not versions or versions[-1] < version:
+                versions.append(version)
+                ids.append(record_id)
+            else:
+                position = bisect_left(versions, version)
+                # Replaying a log over a snapshot may restore a pair it already holds
+                if versions[position] != version:
+                    versions.insert(position, version)
+                    ids.insert(position, record_id)
+
+    def load(self, pairs: Iterable[Tuple[int, int]]) -> None:
+        """Add (version, ID) pairs in bulk, in any order"""
+        with self._lock:
+            merged = sorted(list(zip(self._versions, self._ids)) + list(pairs))
+            self._versions = array("Q", [version for version, _ in merged])
+            self._ids = array("I", [record_id for _, record_id in merged])
+
+    def discard(self, versions: Set[int]) -> None:
+        """Drop the pairs at the given versions in one pass"""
+        with self._lock:
+            kept = [
+                (version, record_id) for version, record_id in zip(self._versions, self._ids)
+                if version not in versions
+            ]
+            self._versions = array("Q", [version for version, _ in kept])
+            self._ids = array("I", [record_id for _, record_id in kept])
+
+    def after(self, since: int, until: int, limit: int) -> List[Tuple[int, int]]:
+        """Up to `limit` pairs with since < version <= until, oldest first"""
+        with self._lock:
+            start = bisect_right(self._versions, since)
+            end = min(bisect_right(self._versions, until), start + limit)
+            return list(zip(self._versions[start:end], self._ids[start:end]))
+
+    def clear(self) -> None:
+        with self._lock:
+            del self._versions[:]
+            del self._ids[:]
\ No newline at end of file
@@ -0,0 +1,39 @@
+from datetime import date
+import pytest
+from services.config import Settings
+from services.database import create_store, set_store
+
+
+@pytest.fixture(autouse=True, params=["memory", "memory-compact", "memory-durable", "sqlite"])
+def store(request, tmp_path):
+    """Run every test against a fresh store of each engine"""
+    config = Settings(
+        storage=request.param.split("-")[0],
+        compact_records=request.param.endswith("-compact"),
+        data_dir=str(tmp_path / "data") if request.param.endswith("-durable") else None,
+        snapshot_interval=0,
+        sqlite_path=str(tmp_path / "edutrack.db"),
+    )
+    store = create_store(config)
+    previous = set_store(store)
+    yield store
+    set_store(previous)
+    store.close()
+
+
+@pytest.fixture
+def orphan_enrollment(store):
+    """Insert an enrollment without checking its user and course, like data saved before deletes cascaded"""
+
+    def insert(user_id, course_id, enrolled_date=date(2025, 9, 1)):
+        if store.__class__.__name__ == "SQLiteRepository":
+            with store.pool.transaction() as connection:
+                return connection.execute(
+                    "INSERT INTO enrollments (user_id, course_id, enrolled_date, completed) VALUES (?, ?, ?, 0)",
+                    (user_id, course_id, enrolled_date.isoformat()),
+                ).lastrowid
+        enrollment_id = next(store.enrollment_id_sequence)
+        store.restore_enrollment(enrollment_id, user_id, course_id, enrolled_date, False)
+        return enrollment_id
+
+    return insert
\ No newline at end of file
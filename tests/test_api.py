@@ -1,17 +1,9 @@
 from fastapi.testclient import TestClient
 from main import app
-from services.database import users_db, courses_db, enrollments_db
 
 client = TestClient(app)
 
 
-def setup_function():
-    """Clear databases before each test"""
-    users_db.clear()
-    courses_db.clear()
-    enrollments_db.clear()
-
-
 # User Tests
 def test_create_user():
     response = client.post(
@@ -310,4 +302,96 @@ def test_get_course_enrollments():
     
     response = client.get(f"/api/courses/{course_id}/enrollments")
     assert response.status_code == 200
-    assert len(response.json()) == 2
\ No newline at end of file
+    assert len(response.json()) == 2
+
+def test_reenroll_after_enrollment_deleted():
+    user_response = client.post(
+        "/api/users/",
+        json={"name": "John", "email": "john@example.com"}
+    )
+    user_id = user_response.json()["id"]
+
+    course_response = client.post(
+        "/api/courses/",
+        json={"title": "Python 101", "description": "Intro to Python"}
+    )
+    course_id = course_response.json()["id"]
+
+    enrollment_response = client.post(
+        "/api/enrollments/",
+        json={"user_id": user_id, "course_id": course_id}
+    )
+    enrollment_id = enrollment_response.json()["id"]
+
+    response = client.delete(f"/api/enrollments/{enrollment_id}")
+    assert response.status_code == 204
+
+    response = client.get(f"/api/enrollments/user/{user_id}")
+    assert response.json() == []
+    response = client.get(f"/api/courses/{course_id}/enrollments")
+    assert response.json() == []
+
+    response = client.post(
+        "/api/enrollments/",
+        json={"user_id": user_id, "course_id": course_id}
+    )
+    assert response.status_code == 201
+
+def test_create_duplicate_email_different_case():
+    client.post("/api/users/", json={"name": "John", "email": "john@example.com"})
+    response = client.post(
+        "/api/users/",
+        json={"name": "Jane", "email": "JOHN@example.com"}
+    )
+    assert response.status_code == 400
+
+
+def test_update_user_email_frees_old_address():
+    create_response = client.post(
+        "/api/users/",
+        json={"name": "John", "email": "john@example.com"}
+    )
+    user_id = create_response.json()["id"]
+    client.post("/api/users/", json={"name": "Jane", "email": "jane@example.com"})
+
+    response = client.put(f"/api/users/{user_id}", json={"email": "jane@example.com"})
+    assert response.status_code == 400
+
+    response = client.put(f"/api/users/{user_id}", json={"email": "johnny@example.com"})
+    assert response.status_code == 200
+
+    response = client.post(
+        "/api/users/",
+        json={"name": "Another John", "email": "john@example.com"}
+    )
+    assert response.status_code == 201
+
+
+def test_delete_user_frees_email():
+    create_response = client.post(
+        "/api/users/",
+        json={"name": "John", "email": "john@example.com"}
+    )
+    user_id = create_response.json()["id"]
+    client.delete(f"/api/users/{user_id}")
+
+    response = client.post(
+        "/api/users/",
+        json={"name": "John", "email": "john@example.com"}
+    )
+    assert response.status_code == 201
+
+def test_ids_too_big_for_any_engine_are_not_found():
+    user_id = client.post("/api/users/", json={"name": "John", "email": "john@example.com"}).json()["id"]
+    course_id = client.post("/api/courses/", json={"title": "Python 101", "description": "Intro"}).json()["id"]
+    huge = 99999999999999999999
+
+    assert client.get(f"/api/users/{huge}").status_code == 404
+    assert client.get(f"/api/courses/{huge}").status_code == 404
+    assert client.get(f"/api/enrollments/{huge}").status_code == 404
+    assert client.delete(f"/api/users/{huge}").status_code == 404
+    assert client.get("/api/enrollments/", params={"user_id": huge}).json() == []
+    for body in ({"user_id": huge, "course_id": course_id}, {"user_id": user_id, "course_id": huge}):
+        assert client.post("/api/enrollments/", json=body).status_code == 404
+    response = client.post("/api/users/batch-get", json={"ids": [user_id, huge]})
+    assert response.json()["missing"] == [huge]
\ No newline at end of file
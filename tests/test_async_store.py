@@ -0,0 +1,24 @@
+import asyncio
+import threading
+from services.async_store import AsyncRepository
+
+
+def test_async_store_matches_sync_store(store):
+    async_store = AsyncRepository(store)
+
+    async def scenario():
+        user = await async_store.create_user("John", "john@example.com")
+        assert await async_store.get_user(user["id"]) == store.get_user(user["id"])
+        users, next_after_id = await async_store.list_users(limit=10)
+        assert [found["id"] for found in users] == [user["id"]]
+        assert next_after_id is None
+
+    asyncio.run(scenario())
+
+
+def test_only_blocking_engines_leave_the_event_loop(store, monkeypatch):
+    threads = []
+    monkeypatch.setattr(store, "get_user", lambda user_id: threads.append(threading.get_ident()))
+
+    asyncio.run(AsyncRepository(store).get_user(1))
+    assert (threads[0] != threading.get_ident()) == store.blocking
\ No newline at end of file
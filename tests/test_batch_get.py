@@ -0,0 +1,65 @@
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from services.bulk import MAX_BATCH_GET_IDS
+from services.config import settings
+
+client = TestClient(app)
+
+
+def seed():
+    user_ids = [
+        client.post("/api/users/", json={"name": f"User {i}", "email": f"user{i}@example.com"}).json()["id"]
+        for i in range(3)
+    ]
+    course_id = client.post("/api/courses/", json={"title": "Python 101", "description": "Intro"}).json()["id"]
+    enrollment_ids = [
+        client.post("/api/enrollments/", json={"user_id": user_id, "course_id": course_id}).json()["id"]
+        for user_id in user_ids
+    ]
+    return user_ids, course_id, enrollment_ids
+
+
+def test_batch_get_users_keeps_request_order_and_reports_missing():
+    user_ids, _, _ = seed()
+    requested = [user_ids[2], 99999, user_ids[0], user_ids[2]]
+
+    response = client.post("/api/users/batch-get", json={"ids": requested})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [user["id"] for user in body["found"]] == [user_ids[2], user_ids[0]]
+    assert body["found"][0] == client.get(f"/api/users/{user_ids[2]}").json()
+    assert body["missing"] == [99999]
+
+
+def test_batch_get_courses_and_enrollments():
+    _, course_id, enrollment_ids = seed()
+
+    courses = client.post("/api/courses/batch-get", json={"ids": [course_id, course_id + 1]}).json()
+    enrollments = client.post("/api/enrollments/batch-get", json={"ids": enrollment_ids[::-1]}).json()
+
+    assert [course["title"] for course in courses["found"]] == ["Python 101"]
+    assert courses["missing"] == [course_id + 1]
+    assert [enrollment["id"] for enrollment in enrollments["found"]] == enrollment_ids[::-1]
+    assert enrollments["missing"] == []
+
+
+@pytest.mark.parametrize("entity", ["users", "courses", "enrollments"])
+def test_batch_get_matches_model_output(entity, monkeypatch):
+    seed()
+    body = {"ids": [3, 1, 42, 2]}
+
+    monkeypatch.setattr(settings, "fast_serialization", False)
+    expected = client.post(f"/api/{entity}/batch-get", json=body)
+    monkeypatch.setattr(settings, "fast_serialization", True)
+    actual = client.post(f"/api/{entity}/batch-get", json=body)
+
+    assert actual.status_code == expected.status_code == 200
+    assert actual.content == expected.content
+
+
+def test_batch_get_is_capped():
+    response = client.post("/api/users/batch-get", json={"ids": list(range(MAX_BATCH_GET_IDS + 1))})
+    assert response.status_code == 413
+    assert client.post("/api/users/batch-get", json={"ids": ["x"]}).status_code == 422
\ No newline at end of file
@@ -0,0 +1,100 @@
+import json
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+
+
+def create_user(name, email):
+    return client.post("/api/users/", json={"name": name, "email": email}).json()["id"]
+
+
+def create_course(title):
+    return client.post(
+        "/api/courses/",
+        json={"title": title, "description": "A course"}
+    ).json()["id"]
+
+
+def test_bulk_enroll_reports_each_item():
+    active = create_user("John", "john@example.com")
+    inactive = create_user("Jane", "jane@example.com")
+    client.patch(f"/api/users/{inactive}/deactivate")
+    open_course = create_course("Python 101")
+    closed_course = create_course("JavaScript 101")
+    client.patch(f"/api/courses/{closed_course}/close")
+
+    response = client.post("/api/enrollments/bulk", json={"items": [
+        {"user_id": active, "course_id": open_course},
+        {"user_id": active, "course_id": open_course},
+        {"user_id": inactive, "course_id": open_course},
+        {"user_id": active, "course_id": closed_course},
+        {"user_id": 999, "course_id": open_course},
+        {"user_id": "nope"},
+    ]})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["applied"] is True
+    assert data["created"] == 1
+    assert data["failed"] == 5
+    assert [result["status"] for result in data["results"]] == [
+        "created", "error", "error", "error", "error", "error"
+    ]
+    assert data["results"][1]["error"] == "Duplicate item in batch"
+    assert data["results"][2]["error"] == "Only active users can enroll in courses"
+    assert data["results"][3]["error"] == "Course enrollment is closed"
+    assert data["results"][4]["error"] == "User not found"
+
+    enrollment = data["results"][0]["enrollment"]
+    response = client.get(f"/api/enrollments/{enrollment['id']}")
+    assert response.json() == enrollment
+
+
+def test_bulk_enroll_skips_existing_enrollments():
+    user_id = create_user("John", "john@example.com")
+    course_id = create_course("Python 101")
+    client.post("/api/enrollments/", json={"user_id": user_id, "course_id": course_id})
+
+    response = client.post("/api/enrollments/bulk", json={"items": [
+        {"user_id": user_id, "course_id": course_id},
+    ]})
+    result = response.json()["results"][0]
+    assert result["status"] == "error"
+    assert result["error"] == "User is already enrolled in this course"
+
+
+def test_atomic_bulk_enroll_applies_nothing_on_failure():
+    user_id = create_user("John", "john@example.com")
+    course_id = create_course("Python 101")
+
+    response = client.post("/api/enrollments/bulk", json={"atomic": True, "items": [
+        {"user_id": user_id, "course_id": course_id},
+        {"user_id": user_id, "course_id": 999},
+    ]})
+    assert response.status_code == 409
+    data = response.json()
+    assert data["applied"] is False
+    assert [result["status"] for result in data["results"]] == ["skipped", "error"]
+
+    response = client.get(f"/api/enrollments/user/{user_id}")
+    assert response.json() == []
+
+
+def test_bulk_enroll_from_ndjson_stream():
+    user_ids = [create_user(f"User {i}", f"user{i}@example.com") for i in range(3)]
+    course_id = create_course("Python 101")
+    lines = [json.dumps({"user_id": user_id, "course_id": course_id}) for user_id in user_ids]
+    lines.append("{not json")
+
+    response = client.post(
+        "/api/enrollments/bulk",
+        content="\n".join(lines) + "\n",
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 3
+    assert data["results"][3]["status"] == "error"
+
+    response = client.get(f"/api/courses/{course_id}/enrollments")
+    assert [user["id"] for user in response.json()] == user_ids
\ No newline at end of file
@@ -0,0 +1,235 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from services.changes import CREATED, DELETED, UPDATED, ChangeLog, ChangesExpired, change_log
+from routes.changes import stream_changes
+
+client = TestClient(app)
+
+
+def changes_since(since, limit=100):
+    response = client.get(f"/api/changes/?since={since}&limit={limit}")
+    assert response.status_code == 200
+    return response.json()
+
+
+def create_user(email="john@example.com"):
+    return client.post("/api/users/", json={"name": "John", "email": email}).json()["id"]
+
+
+def create_course():
+    return client.post("/api/courses/", json={"title": "Python 101", "description": "Learn Python"}).json()["id"]
+
+
+def test_writes_are_recorded_in_order_with_data():
+    start = change_log.latest
+    user_id = create_user()
+    course_id = create_course()
+    enrollment_id = client.post("/api/enrollments/", json={"user_id": user_id, "course_id": course_id}).json()["id"]
+    client.patch(f"/api/enrollments/{enrollment_id}/complete")
+    client.put(f"/api/users/{user_id}", json={"name": "Johnny"})
+    client.delete(f"/api/enrollments/{enrollment_id}")
+
+    page = changes_since(start)
+
+    summary = [(change["entity"], change["op"], change["id"]) for change in page["changes"]]
+    assert summary == [
+        ("user", CREATED, user_id),
+        ("course", CREATED, course_id),
+        ("enrollment", CREATED, enrollment_id),
+        ("enrollment", UPDATED, enrollment_id),
+        ("user", UPDATED, user_id),
+        ("enrollment", DELETED, enrollment_id),
+    ]
+    assert [change["seq"] for change in page["changes"]] == list(range(start + 1, start + 7))
+    assert page["changes"][4]["data"] == {
+        "id": user_id, "name": "Johnny", "email": "john@example.com", "is_active": True,
+        "version": page["changes"][4]["data"]["version"],
+    }
+    assert page["changes"][3]["data"]["completed"] is True
+    assert page["changes"][5]["data"] is None
+    assert page["next_since"] == page["latest"] == start + 6
+    assert page["epoch"] == change_log.epoch
+
+
+def test_failed_writes_are_not_recorded():
+    create_user()
+    start = change_log.latest
+
+    assert client.post("/api/users/", json={"name": "Jane", "email": "john@example.com"}).status_code == 400
+    assert client.put("/api/courses/999999", json={"title": "Gone"}).status_code == 404
+    assert client.delete("/api/enrollments/999999").status_code == 404
+
+    assert changes_since(start)["changes"] == []
+
+
+def test_paging_with_since_and_limit():
+    start = change_log.latest
+    ids = [create_user(f"user{index}@example.com") for index in range(5)]
+
+    first = changes_since(start, limit=2)
+    second = changes_since(first["next_since"], limit=2)
+    third = changes_since(second["next_since"], limit=2)
+    done = changes_since(third["next_since"], limit=2)
+
+    seen = [change["id"] for page in (first, second, third) for change in page["changes"]]
+    assert seen == ids
+    assert done["changes"] == [] and done["next_since"] == third["next_since"] == start + 5
+
+
+def test_cascade_delete_records_dependent_enrollments():
+    user_id = create_user()
+    course_id = create_course()
+    enrollment_id = client.post("/api/enrollments/", json={"user_id": user_id, "course_id": course_id}).json()["id"]
+    start = change_log.latest
+
+    assert client.delete(f"/api/users/{user_id}").status_code == 204
+
+    summary = [(change["entity"], change["op"], change["id"]) for change in changes_since(start)["changes"]]
+    assert summary == [("enrollment", DELETED, enrollment_id), ("user", DELETED, user_id)]
+
+
+def test_import_records_each_created_row():
+    start = change_log.latest
+    body = '{"title": "A", "description": "a"}\n{"title": ""}\n{"title": "B", "description": "b"}\n'
+
+    client.post("/api/courses/import", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    changes = changes_since(start)["changes"]
+    assert [(change["op"], change["data"]["title"]) for change in changes] == [(CREATED, "A"), (CREATED, "B")]
+
+
+def test_since_ahead_of_the_log_is_gone():
+    response = client.get(f"/api/changes/?since={change_log.latest + 1}")
+
+    assert response.status_code == 410
+
+
+def test_position_from_another_epoch_is_gone():
+    start = change_log.latest
+    create_user()
+
+    assert client.get(f"/api/changes/?since={start}&epoch={change_log.epoch}").status_code == 200
+    response = client.get(f"/api/changes/?since={start}&epoch=before-restart")
+    assert response.status_code == 410
+    assert change_log.epoch in response.json()["detail"]
+
+
+def test_each_log_has_its_own_epoch():
+    assert ChangeLog(size=2).epoch != ChangeLog(size=2).epoch
+
+
+def test_fallen_behind_consumer_is_gone(monkeypatch):
+    small = ChangeLog(size=2)
+    monkeypatch.setattr("routes.changes.change_log", small)
+    for record_id in range(3):
+        small.record("user", CREATED, record_id)
+
+    assert client.get("/api/changes/?since=0").status_code == 410
+    assert [change["id"] for change in client.get("/api/changes/?since=1").json()["changes"]] == [1, 2]
+
+
+def test_disabled_log_answers_503(monkeypatch):
+    monkeypatch.setattr("routes.changes.change_log", ChangeLog(size=0))
+
+    assert client.get("/api/changes/").status_code == 503
+    assert client.get("/api/changes/stream").status_code == 503
+
+
+def test_log_read_bounds():
+    log = ChangeLog(size=3)
+    for record_id in range(5):
+        log.record("course", CREATED, record_id)
+
+    assert [change["seq"] for change in log.read(2, 10)] == [3, 4, 5]
+    assert log.read(5, 10) == []
+    with pytest.raises(ChangesExpired) as excinfo:
+        log.read(1, 10)
+    assert excinfo.value.latest == 5
+    with pytest.raises(ChangesExpired):
+        log.read(6, 10)
+
+
+def test_change_older_than_the_logged_one_is_dropped():
+    log = ChangeLog(size=10)
+    log.record("user", UPDATED, 1, {"id": 1, "version": 6})
+    log.record("user", UPDATED, 1, {"id": 1, "version": 5})
+    log.record("user", UPDATED, 2, {"id": 2, "version": 4})
+
+    assert [(change["id"], change["data"]["version"]) for change in log.read(0, 10)] == [(1, 6), (2, 4)]
+
+
+def test_nothing_is_logged_for_a_record_after_its_delete():
+    log = ChangeLog(size=10)
+    log.record("course", DELETED, 1)
+    log.record("course", UPDATED, 1, {"id": 1, "version": 9})
+
+    assert [change["op"] for change in log.read(0, 10)] == [DELETED]
+
+
+def test_ordering_is_forgotten_once_a_record_leaves_the_ring():
+    log = ChangeLog(size=2)
+    log.record("user", UPDATED, 1, {"id": 1, "version": 6})
+    log.record("user", CREATED, 2, {"id": 2, "version": 7})
+    log.record("user", CREATED, 3, {"id": 3, "version": 8})
+
+    assert ("user", 1) not in log._logged
+
+
+def test_stream_sends_backlog_then_waits_for_new_changes():
+    log = ChangeLog(size=10)
+    log.record("user", CREATED, 1, {"id": 1})
+
+    async def run():
+        events = []
+        done = False
+
+        async def is_disconnected():
+            return done
+
+        stream = stream_changes(log, 0, is_disconnected)
+        events.append(await stream.__anext__())
+        assert log.subscribers == 1
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        log.record("user", DELETED, 1)
+        events.append(await asyncio.wait_for(pending, 5))
+        done = True
+        with pytest.raises(StopAsyncIteration):
+            await stream.__anext__()
+        return events
+
+    events = asyncio.run(run())
+
+    assert events[0].startswith(f'id: {log.epoch}:1\nevent: change\ndata: {{"seq":1,')
+    assert events[1].startswith(f"id: {log.epoch}:2\nevent: change\n") and '"op":"deleted"' in events[1]
+    assert log.subscribers == 0
+
+
+def test_stream_tells_an_expired_consumer_and_ends():
+    response = client.get(f"/api/changes/stream?since={change_log.latest + 1}")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text == (
+        f'event: expired\ndata: {{"latest": {change_log.latest}, "epoch": "{change_log.epoch}"}}\n\n'
+    )
+
+
+def test_stream_prefers_last_event_id_header():
+    response = client.get(
+        "/api/changes/stream?since=0", headers={"Last-Event-ID": str(change_log.latest + 1)}
+    )
+
+    assert "event: expired" in response.text
+
+
+def test_stream_resumes_only_within_the_same_epoch(monkeypatch):
+    log = ChangeLog(size=10)
+    monkeypatch.setattr("routes.changes.change_log", log)
+
+    response = client.get("/api/changes/stream", headers={"Last-Event-ID": f"before-restart:{log.latest}"})
+
+    assert response.text.startswith("event: expired\n")
+    assert client.get("/api/changes/stream", headers={"Last-Event-ID": "junk"}).status_code == 400
\ No newline at end of file
@@ -0,0 +1,132 @@
+import asyncio
+import gzip
+import zlib
+from fastapi.testclient import TestClient
+from main import app
+from services.compression import CompressionMiddleware, GzipEncoder, negotiate_encoding
+from services.negotiation import choose
+
+client = TestClient(app)
+
+
+def create_courses(count):
+    for index in range(count):
+        client.post("/api/courses/", json={"title": f"Course {index}", "description": "A long description " * 5})
+
+
+def test_choose_prefers_the_highest_quality_then_the_first_offer():
+    assert choose("gzip;q=0.5, br", ("zstd", "br", "gzip")) == "br"
+    assert choose("gzip, br", ("zstd", "br", "gzip")) == "br"
+    assert choose("*", ("zstd", "gzip")) == "zstd"
+    assert choose("gzip;q=0, identity", ("gzip",)) is None
+    assert choose(None, ("gzip",)) is None
+    assert choose("application/*;q=0.5, */*;q=0.1", ("text/csv", "application/json")) == "application/json"
+
+
+def test_choose_breaks_ties_by_specificity_then_order():
+    assert choose("*, gzip", ("zstd", "gzip")) == "gzip"
+    assert choose("*/*, application/x-ndjson", ("application/json", "application/x-ndjson")) == "application/x-ndjson"
+    offered = ("application/json", "application/x-ndjson")
+    assert choose("application/x-ndjson, application/json", offered) == "application/json"
+    assert choose("application/x-ndjson, application/json", offered, client_order=True) == "application/x-ndjson"
+    assert choose("*/*", offered, client_order=True) == "application/json"
+
+
+def test_gzip_is_always_offered():
+    assert negotiate_encoding("gzip") == "gzip"
+    assert negotiate_encoding("identity") is None
+
+
+def test_large_list_is_compressed():
+    create_courses(20)
+    response = client.get("/api/courses/", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert len(response.json()) == 20
+
+
+def test_small_and_unaccepted_responses_are_not_compressed():
+    create_courses(20)
+    small = client.get("/api/courses/?limit=1", headers={"Accept-Encoding": "gzip"})
+    identity = client.get("/api/courses/", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in identity.headers
+    assert len(identity.json()) == 20
+
+
+def test_streamed_list_is_compressed_in_chunks():
+    create_courses(20)
+    response = client.get(
+        "/api/courses/", headers={"Accept": "application/x-ndjson", "Accept-Encoding": "gzip"}
+    )
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert len(response.text.splitlines()) == 20
+
+
+def test_etag_and_304_still_work_compressed():
+    create_courses(20)
+    first = client.get("/api/courses/", headers={"Accept-Encoding": "gzip"})
+    again = client.get("/api/courses/", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["ETag"]})
+
+    assert first.headers["ETag"].endswith('-gzip"')
+    assert again.status_code == 304
+    assert again.headers["ETag"] == first.headers["ETag"]
+
+
+def test_compressed_etag_names_its_coding():
+    create_courses(20)
+    plain = client.get("/api/courses/", headers={"Accept-Encoding": "identity"})
+    compressed = client.get("/api/courses/", headers={"Accept-Encoding": "gzip"})
+
+    assert compressed.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    # Either form of the tag revalidates either representation
+    again = client.get(
+        "/api/courses/", headers={"Accept-Encoding": "identity", "If-None-Match": compressed.headers["ETag"]}
+    )
+    assert again.status_code == 304
+    assert again.headers["ETag"] == compressed.headers["ETag"]
+
+
+def test_gzip_encoder_flushes_every_chunk():
+    encoder = GzipEncoder()
+    head = encoder.encode(b'{"a":1}\n', final=False)
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    assert decoder.decompress(head) == b'{"a":1}\n'
+    assert gzip.decompress(head + encoder.encode(b'{"b":2}\n', final=True)) == b'{"a":1}\n{"b":2}\n'
+
+
+def run(middleware, body_chunks, content_type=b"application/json"):
+    sent = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+        for index, chunk in enumerate(body_chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": index < len(body_chunks) - 1})
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(middleware(app)(scope, None, send))
+    return sent
+
+
+def test_small_streamed_body_is_sent_as_it_came():
+    sent = run(lambda app: CompressionMiddleware(app, minimum_size=100), [b"[", b"]"])
+
+    assert dict(sent[0]["headers"]).get(b"content-encoding") is None
+    assert b"".join(message.get("body", b"") for message in sent[1:]) == b"[]"
+
+
+def test_event_streams_are_not_compressed():
+    sent = run(
+        lambda app: CompressionMiddleware(app, minimum_size=0), [b"data: x\n\n", b""], b"text/event-stream"
+    )
+
+    assert dict(sent[0]["headers"]).get(b"content-encoding") is None
+    assert sent[1]["body"] == b"data: x\n\n"
\ No newline at end of file
@@ -0,0 +1,114 @@
+import threading
+from datetime import date
+from services.repository import AlreadyEnrolledError, DuplicateEmailError, ParentNotFoundError
+
+THREADS = 16
+
+
+def run_concurrently(target, count=THREADS):
+    """Start `count` threads on `target(index)` at the same moment and collect results"""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(index):
+        barrier.wait()
+        try:
+            results[index] = target(index)
+        except Exception as exc:
+            results[index] = exc
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_signups_with_same_email(store):
+    results = run_concurrently(lambda i: store.create_user(f"User {i}", "same@example.com"))
+
+    created = [result for result in results if not isinstance(result, Exception)]
+    assert len(created) == 1
+    assert all(isinstance(result, DuplicateEmailError) for result in results if result not in created)
+
+
+def test_concurrent_enrollments_in_same_course(store):
+    user = store.create_user("John", "john@example.com")
+    course = store.create_course("Python 101", "Intro to Python")
+
+    results = run_concurrently(
+        lambda i: store.create_enrollment(user["id"], course["id"], date(2025, 9, 1))
+    )
+
+    assert len([result for result in results if not isinstance(result, Exception)]) == 1
+    assert len([result for result in results if isinstance(result, AlreadyEnrolledError)]) == THREADS - 1
+    assert len(store.get_enrollments_for_course(course["id"])) == 1
+
+
+def test_concurrent_inserts_get_unique_ids(store):
+    per_thread = 50
+
+    def create_many(index):
+        return [
+            store.create_user(f"User {index}-{n}", f"user{index}-{n}@example.com")["id"]
+            for n in range(per_thread)
+        ]
+
+    results = run_concurrently(create_many)
+    ids = [user_id for result in results for user_id in result]
+    assert len(set(ids)) == THREADS * per_thread
+
+    listed, next_after_id = store.list_users(limit=THREADS * per_thread)
+    assert next_after_id is None
+    assert [user["id"] for user in listed] == sorted(ids)
+
+
+def test_concurrent_enroll_and_delete_keep_indexes_consistent(store):
+    course = store.create_course("Python 101", "Intro to Python")
+    users = [store.create_user(f"User {i}", f"user{i}@example.com") for i in range(THREADS)]
+
+    def churn(index):
+        user_id = users[index]["id"]
+        for _ in range(20):
+            enrollment = store.create_enrollment(user_id, course["id"], date(2025, 9, 1))
+            assert store.delete_enrollment(enrollment["id"])
+        return store.create_enrollment(user_id, course["id"], date(2025, 9, 1))
+
+    results = run_concurrently(churn)
+    assert not any(isinstance(result, Exception) for result in results)
+
+    in_course = store.get_enrollments_for_course(course["id"])
+    assert sorted(e["id"] for e in in_course) == sorted(result["id"] for result in results)
+    listed, _ = store.list_enrollments(limit=1000)
+    assert sorted(e["id"] for e in listed) == sorted(result["id"] for result in results)
+    for user in users:
+        assert len(store.get_enrollments_for_user(user["id"])) == 1
+
+
+def test_enrollments_racing_deletes_of_their_course_or_user_leave_no_orphans(store):
+    users = [store.create_user(f"User {i}", f"user{i}@example.com") for i in range(THREADS)]
+    courses = [store.create_course(f"Course {i}", "Intro") for i in range(THREADS)]
+
+    for round_index in range(5):
+        course = store.create_course(f"Doomed {round_index}", "Deleted mid-enrollment")
+        user = store.create_user(f"Leaver {round_index}", f"leaver{round_index}@example.com")
+
+        def race(index):
+            if index == 0:
+                return store.delete_course(course["id"])
+            if index == 1:
+                return store.delete_user(user["id"])
+            if index % 2:
+                return store.create_enrollment(users[index]["id"], course["id"], date(2025, 9, 1))
+            # Bulk and import write in batches from the threadpool
+            return store.create_enrollments([(user["id"], courses[index]["id"])], date(2025, 9, 1))
+
+        results = run_concurrently(race)
+
+        assert results[:2] == [True, True]
+        errors = [result for result in results if isinstance(result, Exception)]
+        assert all(isinstance(error, ParentNotFoundError) for error in errors)
+        assert store.get_enrollments_for_course(course["id"]) == []
+        assert store.get_enrollments_for_user(user["id"]) == []
+        assert store.purge_orphans() == []
\ No newline at end of file
@@ -0,0 +1,94 @@
+from fastapi.testclient import TestClient
+from main import app
+from services.database import get_store
+
+client = TestClient(app)
+
+
+def create_user(name, email):
+    return client.post("/api/users/", json={"name": name, "email": email}).json()["id"]
+
+
+def create_course(title):
+    return client.post(
+        "/api/courses/",
+        json={"title": title, "description": "A course"}
+    ).json()["id"]
+
+
+def enroll(user_id, course_id):
+    return client.post(
+        "/api/enrollments/",
+        json={"user_id": user_id, "course_id": course_id}
+    ).json()["id"]
+
+
+def test_course_stats_start_at_zero():
+    course_id = create_course("Python 101")
+    response = client.get(f"/api/courses/{course_id}/stats")
+    assert response.status_code == 200
+    assert response.json() == {
+        "course_id": course_id, "enrolled": 0, "completed": 0, "completion_rate": 0.0
+    }
+
+
+def test_course_stats_follow_enrollments_and_completions():
+    course_id = create_course("Python 101")
+    enrollment_ids = [
+        enroll(create_user(f"User {index}", f"user{index}@example.com"), course_id)
+        for index in range(4)
+    ]
+    client.patch(f"/api/enrollments/{enrollment_ids[0]}/complete")
+    client.patch(f"/api/enrollments/{enrollment_ids[0]}/complete")
+    client.patch(f"/api/enrollments/{enrollment_ids[1]}/complete")
+    client.delete(f"/api/enrollments/{enrollment_ids[1]}")
+    client.delete(f"/api/enrollments/{enrollment_ids[2]}")
+
+    stats = client.get(f"/api/courses/{course_id}/stats").json()
+    assert stats["enrolled"] == 2
+    assert stats["completed"] == 1
+    assert stats["completion_rate"] == 0.5
+
+
+def test_course_stats_count_bulk_enrollments():
+    course_id = create_course("Python 101")
+    user_ids = [create_user(f"User {index}", f"user{index}@example.com") for index in range(3)]
+    client.post("/api/enrollments/bulk", json={"items": [
+        {"user_id": user_id, "course_id": course_id} for user_id in user_ids
+    ]})
+
+    assert client.get(f"/api/courses/{course_id}/stats").json()["enrolled"] == 3
+
+
+def test_course_stats_missing_course():
+    response = client.get("/api/courses/999/stats")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Course not found"
+
+
+def test_deleted_course_has_no_stats():
+    user_id = create_user("John", "john@example.com")
+    course_id = create_course("Python 101")
+    enrollment_id = enroll(user_id, course_id)
+    client.patch(f"/api/enrollments/{enrollment_id}/complete")
+    client.delete(f"/api/courses/{course_id}")
+
+    assert client.get(f"/api/courses/{course_id}/stats").status_code == 404
+    assert get_store().get_course_stats(course_id) is None
+
+
+def test_list_course_stats_is_paginated():
+    user_id = create_user("John", "john@example.com")
+    course_ids = [create_course(f"Course {index}") for index in range(3)]
+    enroll(user_id, course_ids[1])
+
+    first = client.get("/api/courses/stats", params={"limit": 2})
+    assert [stats["course_id"] for stats in first.json()] == course_ids[:2]
+    assert first.json()[1]["enrolled"] == 1
+
+    second = client.get(
+        "/api/courses/stats",
+        params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]}
+    )
+    assert [stats["course_id"] for stats in second.json()] == course_ids[2:]
+    assert "X-Next-Cursor" not in second.headers
\ No newline at end of file
@@ -0,0 +1,111 @@
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from services.config import settings
+from services.database import get_store
+from services.repository import RESTRICT, SOFT_DELETE
+
+client = TestClient(app)
+
+
+def create_user(name, email):
+    return client.post("/api/users/", json={"name": name, "email": email}).json()["id"]
+
+
+def create_course(title):
+    return client.post(
+        "/api/courses/",
+        json={"title": title, "description": "A course"}
+    ).json()["id"]
+
+
+def enroll(user_id, course_id):
+    return client.post(
+        "/api/enrollments/",
+        json={"user_id": user_id, "course_id": course_id}
+    ).json()["id"]
+
+
+@pytest.fixture
+def enrolled():
+    john = create_user("John", "john@example.com")
+    jane = create_user("Jane", "jane@example.com")
+    python = create_course("Python 101")
+    rust = create_course("Rust 101")
+    enrollments = {
+        (john, python): enroll(john, python),
+        (john, rust): enroll(john, rust),
+        (jane, python): enroll(jane, python),
+    }
+    client.patch(f"/api/enrollments/{enrollments[john, python]}/complete")
+    return john, jane, python, rust, enrollments
+
+
+def test_delete_user_cascades_to_enrollments(enrolled):
+    john, jane, python, rust, enrollments = enrolled
+    assert client.get(f"/api/enrollments/{enrollments[john, rust]}").status_code == 200
+
+    assert client.delete(f"/api/users/{john}").status_code == 204
+
+    remaining = client.get("/api/enrollments/").json()
+    assert [enrollment["id"] for enrollment in remaining] == [enrollments[jane, python]]
+    assert client.get(f"/api/enrollments/{enrollments[john, rust]}").status_code == 404
+    stats = client.get(f"/api/courses/{python}/stats").json()
+    assert (stats["enrolled"], stats["completed"]) == (1, 0)
+
+
+def test_delete_course_cascades_to_enrollments(enrolled):
+    john, jane, python, rust, enrollments = enrolled
+
+    assert client.delete(f"/api/courses/{python}").status_code == 204
+
+    assert client.get(f"/api/enrollments/user/{jane}").json() == []
+    assert [enrollment["course_id"] for enrollment in client.get(f"/api/enrollments/user/{john}").json()] == [rust]
+
+
+def test_restrict_refuses_delete_while_enrolled(enrolled, monkeypatch):
+    john, jane, python, rust, enrollments = enrolled
+    monkeypatch.setattr(settings, "delete_policy", RESTRICT)
+
+    response = client.delete(f"/api/users/{john}")
+    assert response.status_code == 409
+    assert response.json()["detail"] == "User has enrollments"
+    assert client.delete(f"/api/courses/{python}").status_code == 409
+    assert client.get(f"/api/users/{john}").status_code == 200
+    assert len(client.get("/api/enrollments/").json()) == 3
+
+    client.delete(f"/api/enrollments/{enrollments[jane, python]}")
+    assert client.delete(f"/api/users/{jane}").status_code == 204
+    assert client.delete("/api/users/999").status_code == 404
+
+
+def test_soft_delete_deactivates_and_keeps_enrollments(enrolled, monkeypatch):
+    john, jane, python, rust, enrollments = enrolled
+    monkeypatch.setattr(settings, "delete_policy", SOFT_DELETE)
+
+    assert client.delete(f"/api/users/{john}").status_code == 204
+    assert client.delete(f"/api/courses/{rust}").status_code == 204
+
+    assert client.get(f"/api/users/{john}").json()["is_active"] is False
+    assert client.get(f"/api/courses/{rust}").json()["is_open"] is False
+    assert len(client.get("/api/enrollments/").json()) == 3
+    assert client.delete("/api/courses/999").status_code == 404
+
+
+def test_compaction_purges_orphans(enrolled, orphan_enrollment, monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "secret-token")
+    headers = {"X-Admin-Token": "secret-token"}
+    john, jane, python, rust, enrollments = enrolled
+    store = get_store()
+    orphans = [orphan_enrollment(jane, 999), orphan_enrollment(999, python)]
+
+    assert client.post("/api/admin/compact").status_code == 403
+    response = client.post("/api/admin/compact", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"removed_enrollments": 2, "pruned_deletions": 0}
+    assert all(store.get_enrollment(enrollment_id) is None for enrollment_id in orphans)
+    assert len(client.get("/api/enrollments/").json()) == 3
+    assert client.get(f"/api/courses/{python}/stats").json()["enrolled"] == 2
+
+    again = client.post("/api/admin/compact", headers=headers)
+    assert again.json() == {"removed_enrollments": 0, "pruned_deletions": 0}
\ No newline at end of file
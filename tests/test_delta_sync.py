@@ -0,0 +1,218 @@
+from fastapi.testclient import TestClient
+from main import app
+from services.config import settings
+from services.pagination import encode_cursor
+
+client = TestClient(app)
+
+
+def create_user(name="John", email="john@example.com"):
+    return client.post("/api/users/", json={"name": name, "email": email}).json()
+
+
+def create_course(title="Python 101"):
+    return client.post("/api/courses/", json={"title": title, "description": "Learn it"}).json()
+
+
+def enroll(user_id, course_id):
+    return client.post("/api/enrollments/", json={"user_id": user_id, "course_id": course_id}).json()
+
+
+def delta(path, since, **params):
+    response = client.get(path, params={"updated_since": since, **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_every_write_raises_the_version():
+    user = create_user()
+    renamed = client.put(f"/api/users/{user['id']}", json={"name": "Johnny"}).json()
+    deactivated = client.patch(f"/api/users/{user['id']}/deactivate").json()
+
+    assert 0 < user["version"] < renamed["version"] < deactivated["version"]
+    assert client.get(f"/api/users/{user['id']}").json()["version"] == deactivated["version"]
+
+
+def test_user_delta_returns_changes_and_deletes_since_a_version():
+    john = create_user()
+    jane = create_user("Jane", "jane@example.com")
+    first = delta("/api/users/", 0)
+    assert [user["id"] for user in first["changed"]] == [john["id"], jane["id"]]
+    assert first["deleted"] == [] and first["more"] is False
+
+    client.put(f"/api/users/{john['id']}", json={"name": "Johnny"})
+    client.delete(f"/api/users/{jane['id']}")
+    ann = create_user("Ann", "ann@example.com")
+    second = delta("/api/users/", first["version"])
+
+    assert [(user["id"], user["name"]) for user in second["changed"]] == [(john["id"], "Johnny"), (ann["id"], "Ann")]
+    assert second["deleted"] == [jane["id"]]
+    assert second["version"] > first["version"]
+    assert delta("/api/users/", second["version"]) == {
+        "changed": [], "deleted": [], "version": second["version"], "more": False
+    }
+
+
+def test_delta_from_zero_leaves_out_deletes():
+    course = create_course()
+    client.delete(f"/api/courses/{course['id']}")
+    kept = create_course("Rust 101")
+
+    result = delta("/api/courses/", 0)
+
+    assert [course["id"] for course in result["changed"]] == [kept["id"]]
+    assert result["deleted"] == []
+
+
+def test_delta_pages_by_version():
+    ids = [create_course(f"Course {index}")["id"] for index in range(5)]
+    seen, since = [], 0
+    while True:
+        page = delta("/api/courses/", since, limit=2)
+        assert len(page["changed"]) <= 2
+        seen += [course["id"] for course in page["changed"]]
+        since = page["version"]
+        if not page["more"]:
+            break
+    assert seen == ids
+
+
+def test_user_enrollment_delta():
+    user = create_user()
+    python, rust = create_course(), create_course("Rust 101")
+    kept, dropped = enroll(user["id"], python["id"]), enroll(user["id"], rust["id"])
+    first = delta(f"/api/enrollments/user/{user['id']}", 0)
+    assert [enrollment["id"] for enrollment in first["changed"]] == [kept["id"], dropped["id"]]
+
+    client.patch(f"/api/enrollments/{kept['id']}/complete")
+    client.delete(f"/api/enrollments/{dropped['id']}")
+    second = delta(f"/api/enrollments/user/{user['id']}", first["version"])
+
+    assert [(enrollment["id"], enrollment["completed"]) for enrollment in second["changed"]] == [(kept["id"], True)]
+    assert second["deleted"] == [dropped["id"]]
+
+
+def test_enrollment_delta_of_one_course():
+    john, jane = create_user(), create_user("Jane", "jane@example.com")
+    python, rust = create_course(), create_course("Rust 101")
+    enroll(john["id"], python["id"])
+    other = enroll(jane["id"], rust["id"])
+    since = delta("/api/enrollments/", 0)["version"]
+
+    dropped = enroll(jane["id"], python["id"])
+    client.delete(f"/api/enrollments/{dropped['id']}")
+    client.delete(f"/api/enrollments/{other['id']}")
+    result = delta("/api/enrollments/", since, course_id=python["id"])
+
+    assert result["changed"] == []
+    assert result["deleted"] == [dropped["id"]]
+    assert delta("/api/enrollments/", since)["deleted"] == [dropped["id"], other["id"]]
+
+
+def test_course_enrollee_delta():
+    python = create_course()
+    john, jane = create_user(), create_user("Jane", "jane@example.com")
+    enroll(john["id"], python["id"])
+    leaving = enroll(jane["id"], python["id"])
+    first = delta(f"/api/courses/{python['id']}/enrollments", 0)
+    assert [user["id"] for user in first["changed"]] == [john["id"], jane["id"]]
+
+    client.put(f"/api/users/{john['id']}", json={"name": "Johnny"})
+    client.delete(f"/api/enrollments/{leaving['id']}")
+    ann = create_user("Ann", "ann@example.com")
+    enroll(ann["id"], python["id"])
+    second = delta(f"/api/courses/{python['id']}/enrollments", first["version"])
+
+    assert [(user["id"], user["name"]) for user in second["changed"]] == [(john["id"], "Johnny"), (ann["id"], "Ann")]
+    assert second["deleted"] == [jane["id"]]
+
+
+def test_updated_since_rejects_other_paging_and_filters():
+    user = create_user()
+    course = create_course()
+    for path in [
+        "/api/users/?updated_since=0&is_active=true",
+        "/api/courses/?updated_since=0&is_open=false",
+        f"/api/courses/?updated_since=0&cursor={encode_cursor(course['id'])}",
+        "/api/enrollments/?updated_since=0&completed=true",
+        "/api/enrollments/?updated_since=0&expand=user",
+        f"/api/enrollments/user/{user['id']}?updated_since=0&expand=course",
+        f"/api/courses/{course['id']}/enrollments?updated_since=0&expand=enrollment",
+    ]:
+        response = client.get(path)
+        assert response.status_code == 400, path
+        assert "updated_since" in response.json()["detail"]
+    assert client.get("/api/users/?updated_since=-1").status_code == 422
+    huge = 99999999999999999999
+    for path in [
+        "/api/users/",
+        "/api/courses/",
+        "/api/enrollments/",
+        f"/api/enrollments/user/{user['id']}",
+        f"/api/courses/{course['id']}/enrollments",
+    ]:
+        assert client.get(path, params={"updated_since": huge}).status_code == 422, path
+
+
+def test_unchanged_list_answers_304():
+    course = create_course()
+    first = client.get("/api/courses/")
+    etag = first.headers["ETag"]
+
+    again = client.get("/api/courses/", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag
+
+    client.patch(f"/api/courses/{course['id']}/close")
+    changed = client.get("/api/courses/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()[0]["is_open"] is False
+
+
+def test_list_etag_covers_embeds_and_removals():
+    user = create_user()
+    python, rust = create_course(), create_course("Rust 101")
+    enroll(user["id"], python["id"])
+    dropped = enroll(user["id"], rust["id"])
+    paths = [
+        "/api/enrollments/?expand=user",
+        f"/api/enrollments/user/{user['id']}",
+        f"/api/courses/{python['id']}/enrollments",
+    ]
+    etags = [client.get(path).headers["ETag"] for path in paths]
+
+    client.put(f"/api/users/{user['id']}", json={"name": "Johnny"})
+    client.delete(f"/api/enrollments/{dropped['id']}")
+
+    for path, etag in zip(paths, etags):
+        assert client.get(path, headers={"If-None-Match": etag}).status_code == 200, path
+
+
+def test_list_etag_differs_between_pages():
+    for index in range(3):
+        create_course(f"Course {index}")
+    first = client.get("/api/courses/?limit=2")
+    second = client.get("/api/courses/?limit=2", params={"cursor": first.headers["X-Next-Cursor"]})
+
+    assert first.headers["ETag"] != second.headers["ETag"]
+
+
+def test_compaction_prunes_deletes_and_expires_older_versions(monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "secret-token")
+    monkeypatch.setattr(settings, "deletion_retention", 0)
+    john = create_user()
+    course = create_course()
+    enroll(john["id"], course["id"])
+    start = delta("/api/users/", 0)["version"]
+    client.delete(f"/api/courses/{course['id']}")
+    caught_up = delta("/api/courses/", start)["version"]
+
+    compacted = client.post("/api/admin/compact", headers={"X-Admin-Token": "secret-token"}).json()
+
+    assert compacted == {"removed_enrollments": 0, "pruned_deletions": 2}
+    for path in ("/api/users/", "/api/courses/", "/api/enrollments/", f"/api/enrollments/user/{john['id']}"):
+        assert client.get(path, params={"updated_since": start}).status_code == 410
+    assert delta("/api/courses/", caught_up)["deleted"] == []
+    assert [user["id"] for user in delta("/api/users/", 0)["changed"]] == [john["id"]]
\ No newline at end of file
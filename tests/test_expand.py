@@ -0,0 +1,81 @@
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+
+
+def seed():
+    user_ids = [
+        client.post("/api/users/", json={"name": name, "email": f"{name.lower()}@example.com"}).json()["id"]
+        for name in ("Ada", "Grace")
+    ]
+    course_ids = [
+        client.post("/api/courses/", json={"title": title, "description": "A course"}).json()["id"]
+        for title in ("Python 101", "SQL 101")
+    ]
+    enrollment_ids = [
+        client.post("/api/enrollments/", json={"user_id": user_id, "course_id": course_id}).json()["id"]
+        for user_id in user_ids
+        for course_id in course_ids
+    ]
+    return user_ids, course_ids, enrollment_ids
+
+
+def test_enrollment_list_embeds_user_and_course():
+    user_ids, course_ids, _ = seed()
+
+    enrollments = client.get("/api/enrollments/", params={"expand": "user,course"}).json()
+
+    assert len(enrollments) == 4
+    for enrollment in enrollments:
+        assert enrollment["user"]["id"] == enrollment["user_id"]
+        assert enrollment["course"]["id"] == enrollment["course_id"]
+    assert {enrollment["course"]["title"] for enrollment in enrollments} == {"Python 101", "SQL 101"}
+    assert enrollments[0]["user"] == client.get(f"/api/users/{user_ids[0]}").json()
+
+
+def test_without_expand_nothing_is_embedded():
+    seed()
+    for enrollment in client.get("/api/enrollments/").json():
+        assert "user" not in enrollment
+        assert "course" not in enrollment
+
+
+def test_user_enrollments_embed_course_only():
+    user_ids, course_ids, _ = seed()
+
+    enrollments = client.get(f"/api/enrollments/user/{user_ids[1]}", params={"expand": "course"}).json()
+
+    assert [enrollment["course"]["title"] for enrollment in enrollments] == ["Python 101", "SQL 101"]
+    assert all("user" not in enrollment for enrollment in enrollments)
+
+
+def test_course_roster_embeds_each_users_enrollment():
+    user_ids, course_ids, enrollment_ids = seed()
+    client.patch(f"/api/enrollments/{enrollment_ids[2]}/complete")
+
+    roster = client.get(f"/api/courses/{course_ids[0]}/enrollments", params={"expand": "enrollment"}).json()
+
+    assert [user["name"] for user in roster] == ["Ada", "Grace"]
+    assert [user["enrollment"]["id"] for user in roster] == [enrollment_ids[0], enrollment_ids[2]]
+    assert [user["enrollment"]["completed"] for user in roster] == [False, True]
+    assert all(user["enrollment"]["course_id"] == course_ids[0] for user in roster)
+
+
+def test_missing_related_record_is_null(orphan_enrollment):
+    _, course_ids, _ = seed()
+    # An enrollment whose user is gone, as left behind before a purge
+    orphan_id = orphan_enrollment(99999, course_ids[0])
+
+    enrollments = client.get("/api/enrollments/", params={"expand": "user,course"}).json()
+
+    [expanded] = [enrollment for enrollment in enrollments if enrollment["id"] == orphan_id]
+    assert expanded["user"] is None
+    assert expanded["course"]["id"] == course_ids[0]
+
+
+def test_unknown_expand_is_rejected():
+    response = client.get("/api/enrollments/", params={"expand": "user,teacher"})
+    assert response.status_code == 400
+    assert "teacher" in response.json()["detail"]
+    assert client.get("/api/courses/1/enrollments", params={"expand": "course"}).status_code == 400
\ No newline at end of file
@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+
+
+def test_import_users_from_ndjson():
+    client.post("/api/users/", json={"name": "John", "email": "john@example.com"})
+    lines = [
+        json.dumps({"name": "Jane", "email": "jane@example.com"}),
+        json.dumps({"name": "Jane Again", "email": "JANE@example.com"}),
+        json.dumps({"name": "John Again", "email": "john@example.com"}),
+        json.dumps({"name": "Bad", "email": "not-an-email"}),
+        "{broken",
+        "",
+        json.dumps({"name": "Bob", "email": "bob@example.com"}),
+    ]
+
+    response = client.post(
+        "/api/users/import",
+        content="\n".join(lines),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 2
+    assert data["failed"] == 4
+    errors = {error["line"]: error["error"] for error in data["errors"]}
+    assert errors[2] == "Duplicate email in import"
+    assert errors[3] == "Email already registered"
+    assert errors[4].startswith("email:")
+    assert errors[5] == "Malformed JSON"
+
+    emails = [user["email"] for user in client.get("/api/users/").json()]
+    assert emails == ["john@example.com", "jane@example.com", "bob@example.com"]
+
+
+def test_import_courses_from_csv():
+    content = (
+        "title,description\r\n"
+        "Python 101,Intro to Python\r\n"
+        '"Data, Science","Covers\nmultiple lines"\r\n'
+        ",Missing title\r\n"
+    )
+    response = client.post(
+        "/api/courses/import",
+        content=content,
+        headers={"Content-Type": "text/csv"},
+    )
+    data = response.json()
+    assert data["created"] == 2
+    assert data["errors"] == [{"line": 5, "error": "title: String should have at least 1 character"}]
+
+    courses = client.get("/api/courses/").json()
+    assert courses[1]["title"] == "Data, Science"
+    assert courses[1]["description"] == "Covers\nmultiple lines"
+
+
+def test_import_rejects_unknown_media_type():
+    response = client.post("/api/users/import", json=[{"name": "John"}])
+    assert response.status_code == 415
+
+
+def test_export_users_as_ndjson_and_csv():
+    for i in range(3):
+        client.post("/api/users/", json={"name": f"User {i}", "email": f"user{i}@example.com"})
+    users = client.get("/api/users/").json()
+
+    response = client.get("/api/users/export")
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == users
+
+    response = client.get("/api/users/export", params={"format": "csv"})
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["email"] for row in rows] == [user["email"] for user in users]
+
+
+def test_export_courses_round_trips_through_import():
+    client.post("/api/courses/", json={"title": "Python 101", "description": "Intro to Python"})
+    exported = client.get("/api/courses/export", params={"format": "csv"}).text
+
+    response = client.post(
+        "/api/courses/import",
+        content=exported,
+        headers={"Content-Type": "text/csv"},
+    )
+    assert response.json()["created"] == 1
+    titles = [course["title"] for course in client.get("/api/courses/").json()]
+    assert titles == ["Python 101", "Python 101"]
\ No newline at end of file
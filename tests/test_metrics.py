@@ -0,0 +1,98 @@
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from services.memory_store import InMemoryRepository
+from services.metrics import (
+    LOCK_WAIT, REQUEST_DURATION, REQUESTS, RESPONSE_SIZE, STORE_LOOKUPS, STORE_ROWS_EXAMINED,
+    Counter, Histogram, Registry, TimedLock
+)
+
+client = TestClient(app)
+
+
+def test_requests_are_labelled_by_route_template():
+    user_id = client.post("/api/users/", json={"name": "John", "email": "john@example.com"}).json()["id"]
+    found = ("GET", "/api/users/{user_id}", "200")
+    missing = ("GET", "/api/users/{user_id}", "404")
+    before_found, before_missing = REQUESTS.value(found), REQUESTS.value(missing)
+    before_timed = REQUEST_DURATION.count(found[:2])
+
+    client.get(f"/api/users/{user_id}")
+    client.get("/api/users/999999")
+
+    assert REQUESTS.value(found) == before_found + 1
+    assert REQUESTS.value(missing) == before_missing + 1
+    assert REQUEST_DURATION.count(found[:2]) == before_timed + 2
+    assert RESPONSE_SIZE.count(found[:2]) == before_timed + 2
+
+
+def test_metrics_endpoint_serves_prometheus_text():
+    client.get("/api/courses/")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert "# TYPE edutrack_http_request_duration_seconds histogram" in text
+    assert 'edutrack_http_requests_total{method="GET",route="/api/courses/",status="200"}' in text
+    assert 'edutrack_http_request_duration_seconds_bucket{method="GET",route="/api/courses/",le="+Inf"}' in text
+    assert "edutrack_http_requests_in_flight" in text
+    assert "edutrack_response_cache_hit_rate" in text
+
+
+def test_filtered_lists_count_as_scans(store):
+    if not isinstance(store, InMemoryRepository):
+        pytest.skip("access paths are reported by the memory engine")
+    for index in range(5):
+        store.create_user(f"User {index}", f"user{index}@example.com")
+    scans, indexed = STORE_LOOKUPS.value(("scan",)), STORE_LOOKUPS.value(("index",))
+    examined = STORE_ROWS_EXAMINED.value()
+
+    store.list_users(limit=10)
+    store.list_users(limit=10, is_active=False)
+
+    assert STORE_LOOKUPS.value(("index",)) == indexed + 1
+    assert STORE_LOOKUPS.value(("scan",)) == scans + 1
+    assert STORE_ROWS_EXAMINED.value() == examined + 5
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.register(Histogram("latency_seconds", "Latency", ("route",), (0.1, 1.0)))
+    counter = registry.register(Counter("hits_total", "Hits", ("route",)))
+    histogram.observe(("/a",), 0.05)
+    histogram.observe(("/a",), 0.5)
+    histogram.observe(("/a",), 5)
+    counter.inc(('say "hi"',))
+
+    assert registry.render().splitlines() == [
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 3',
+        'latency_seconds_sum{route="/a"} 5.55',
+        'latency_seconds_count{route="/a"} 3',
+        "# HELP hits_total Hits",
+        "# TYPE hits_total counter",
+        'hits_total{route="say \\"hi\\""} 1',
+    ]
+
+
+def test_timed_lock_only_observes_contended_waits():
+    lock = TimedLock("test")
+    before = LOCK_WAIT.count(("test",))
+    with lock:
+        pass
+    assert LOCK_WAIT.count(("test",)) == before
+
+    lock.acquire()
+    waiter = threading.Thread(target=lambda: lock.acquire() and lock.release())
+    waiter.start()
+    time.sleep(0.05)
+    lock.release()
+    waiter.join()
+
+    assert LOCK_WAIT.count(("test",)) == before + 1
\ No newline at end of file
@@ -0,0 +1,110 @@
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+
+
+def create_users(count):
+    return [
+        client.post(
+            "/api/users/",
+            json={"name": f"User {i}", "email": f"user{i}@example.com"}
+        ).json()["id"]
+        for i in range(count)
+    ]
+
+
+def test_list_users_pages_follow_cursor():
+    user_ids = create_users(5)
+
+    response = client.get("/api/users/", params={"limit": 2})
+    assert response.status_code == 200
+    assert [user["id"] for user in response.json()] == user_ids[:2]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get("/api/users/", params={"limit": 2, "cursor": cursor})
+    assert [user["id"] for user in response.json()] == user_ids[2:4]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get("/api/users/", params={"limit": 2, "cursor": cursor})
+    assert [user["id"] for user in response.json()] == user_ids[4:]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_cursor_is_stable_across_deletes():
+    user_ids = create_users(4)
+    response = client.get("/api/users/", params={"limit": 2})
+    cursor = response.headers["X-Next-Cursor"]
+
+    client.delete(f"/api/users/{user_ids[1]}")
+    client.delete(f"/api/users/{user_ids[2]}")
+
+    response = client.get("/api/users/", params={"limit": 2, "cursor": cursor})
+    assert [user["id"] for user in response.json()] == user_ids[3:]
+
+
+def test_invalid_cursor():
+    response = client.get("/api/users/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_limit_is_capped():
+    response = client.get("/api/users/", params={"limit": 100000})
+    assert response.status_code == 422
+
+
+def test_filter_users_by_active_flag():
+    user_ids = create_users(3)
+    client.patch(f"/api/users/{user_ids[1]}/deactivate")
+
+    response = client.get("/api/users/", params={"is_active": False})
+    assert [user["id"] for user in response.json()] == [user_ids[1]]
+
+
+def test_filter_courses_by_open_flag():
+    open_course = client.post(
+        "/api/courses/",
+        json={"title": "Python 101", "description": "Intro to Python"}
+    ).json()["id"]
+    closed_course = client.post(
+        "/api/courses/",
+        json={"title": "JavaScript 101", "description": "Intro to JS"}
+    ).json()["id"]
+    client.patch(f"/api/courses/{closed_course}/close")
+
+    response = client.get("/api/courses/", params={"is_open": True})
+    assert [course["id"] for course in response.json()] == [open_course]
+
+
+def test_filter_enrollments():
+    user_ids = create_users(2)
+    course_ids = [
+        client.post(
+            "/api/courses/",
+            json={"title": f"Course {i}", "description": "A course"}
+        ).json()["id"]
+        for i in range(2)
+    ]
+    enrollment_ids = {}
+    for user_id in user_ids:
+        for course_id in course_ids:
+            enrollment_ids[(user_id, course_id)] = client.post(
+                "/api/enrollments/",
+                json={"user_id": user_id, "course_id": course_id}
+            ).json()["id"]
+    client.patch(f"/api/enrollments/{enrollment_ids[(user_ids[0], course_ids[1])]}/complete")
+
+    response = client.get("/api/enrollments/", params={"course_id": course_ids[1]})
+    assert [e["id"] for e in response.json()] == [
+        enrollment_ids[(user_ids[0], course_ids[1])],
+        enrollment_ids[(user_ids[1], course_ids[1])],
+    ]
+
+    response = client.get(
+        "/api/enrollments/",
+        params={"user_id": user_ids[1], "course_id": course_ids[0]}
+    )
+    assert [e["id"] for e in response.json()] == [enrollment_ids[(user_ids[1], course_ids[0])]]
+
+    response = client.get("/api/enrollments/", params={"completed": True})
+    assert [e["id"] for e in response.json()] == [enrollment_ids[(user_ids[0], course_ids[1])]]
\ No newline at end of file
@@ -0,0 +1,179 @@
+import os
+from datetime import date
+import pytest
+from services.persistence import PersistentMemoryRepository, _list_segments, _segment_path
+from services.repository import DeltaExpiredError
+
+
+@pytest.fixture
+def data_dir(store, tmp_path):
+    if not isinstance(store, PersistentMemoryRepository):
+        pytest.skip("only the durable memory engine persists itself")
+    return str(tmp_path / "restore")
+
+
+def reopen(store, data_dir, **options):
+    store.close()
+    return PersistentMemoryRepository(data_dir, snapshot_interval=0, **options)
+
+
+def seed(store):
+    john = store.create_user("John", "john@example.com")
+    jane = store.create_user("Jane", "jane@example.com")
+    python = store.create_course("Python 101", "Intro to Python")
+    rust = store.create_course("Rust 101", "Intro to Rust")
+    enrollments = [
+        store.create_enrollment(john["id"], python["id"], date(2025, 9, 1)),
+        store.create_enrollment(jane["id"], python["id"], date(2025, 9, 2)),
+        store.create_enrollment(jane["id"], rust["id"], date(2025, 9, 3)),
+    ]
+    store.update_enrollment(enrollments[1]["id"], {"completed": True})
+    store.update_user(john["id"], {"email": "johnny@example.com"})
+    store.update_course(rust["id"], {"is_open": False})
+    store.delete_enrollment(enrollments[0]["id"])
+    return john, jane, python, rust
+
+
+def state(store):
+    return (
+        [dict(user) for user in store.list_users(limit=1000)[0]],
+        [dict(course) for course in store.list_courses(limit=1000)[0]],
+        [dict(enrollment) for enrollment in store.list_enrollments(limit=1000)[0]],
+        [store.get_course_stats(course["id"]) for course in store.list_courses(limit=1000)[0]],
+        [user["id"] for user in store.search_users(domain="example.com", limit=1000)[0]],
+        [user["id"] for user in store.search_users(name="j", limit=1000)[0]],
+        [course["id"] for course in store.search_courses("101")],
+    )
+
+
+@pytest.mark.parametrize("fsync", ["always", "interval", "never"])
+def test_log_replay_restores_state(data_dir, fsync):
+    store = PersistentMemoryRepository(data_dir, fsync=fsync, snapshot_interval=0)
+    seed(store)
+    before = state(store)
+    store.log.close()  # Crash: no snapshot on the way down
+
+    restored = PersistentMemoryRepository(data_dir, snapshot_interval=0)
+    try:
+        assert state(restored) == before
+        assert restored.find_user_by_email("johnny@example.com")["name"] == "John"
+        assert restored.find_user_by_email("john@example.com") is None
+    finally:
+        restored.close()
+
+
+def test_snapshot_and_log_tail_restore_state(data_dir):
+    store = PersistentMemoryRepository(data_dir, snapshot_interval=0)
+    john, jane, python, rust = seed(store)
+    store.snapshot()
+    assert _list_segments(data_dir) == [store.log.segment]
+    store.delete_user(jane["id"])
+    newcomer = store.create_user("Ann", "ann@example.com")
+    store.create_enrollment(newcomer["id"], python["id"], date(2025, 9, 4))
+    before = state(store)
+
+    restored = reopen(store, data_dir)
+    try:
+        assert state(restored) == before
+        assert restored.get_enrollments_for_user(jane["id"]) == []
+    finally:
+        restored.close()
+
+
+def test_compact_layout_restores_from_snapshot(data_dir):
+    store = PersistentMemoryRepository(data_dir, snapshot_interval=0, compact=True)
+    seed(store)
+    before = state(store)
+
+    restored = reopen(store, data_dir, compact=True)
+    try:
+        assert state(restored) == before
+    finally:
+        restored.close()
+
+
+def test_ids_are_not_reused_after_restart(data_dir):
+    store = PersistentMemoryRepository(data_dir, snapshot_interval=0)
+    user = store.create_user("John", "john@example.com")
+    store.delete_user(user["id"])
+
+    restored = reopen(store, data_dir)
+    try:
+        assert restored.create_user("Jane", "jane@example.com")["id"] == user["id"] + 1
+    finally:
+        restored.close()
+
+
+@pytest.mark.parametrize("take_snapshot", [False, True])
+def test_versions_and_tombstones_survive_restart(data_dir, take_snapshot):
+    store = PersistentMemoryRepository(data_dir, snapshot_interval=0)
+    john, jane, python, rust = seed(store)
+    store.delete_user(jane["id"])
+    if take_snapshot:
+        store.snapshot()
+    before = [store.list_user_changes(1), store.list_enrollment_changes(1, user_id=jane["id"])]
+
+    restored = reopen(store, data_dir)
+    try:
+        assert [restored.list_user_changes(1), restored.list_enrollment_changes(1, user_id=jane["id"])] == before
+        # New writes continue after the restored versions
+        assert restored.create_course("Go 101", "Intro to Go")["version"] > before[0].version
+    finally:
+        restored.close()
+
+
+@pytest.mark.parametrize("take_snapshot", [False, True])
+def test_deletion_horizon_survives_restart(data_dir, take_snapshot):
+    store = PersistentMemoryRepository(data_dir, snapshot_interval=0)
+    john, jane, python, rust = seed(store)
+    store.delete_user(jane["id"])
+    assert store.prune_deletions(0) > 0
+    horizon = store.deletion_horizon
+    if take_snapshot:
+        store.snapshot()
+
+    restored = reopen(store, data_dir)
+    try:
+        assert restored.deletion_horizon == horizon
+        assert restored.deleted_users == {} and restored.deleted_enrollments == {}
+        with pytest.raises(DeltaExpiredError):
+            restored.list_user_changes(1)
+    finally:
+        restored.close()
+
+
+def test_torn_log_tail_is_ignored(data_dir):
+    store = PersistentMemoryRepository(data_dir, snapshot_interval=0)
+    store.create_user("John", "john@example.com")
+    store.create_user("Jane", "jane@example.com")
+    store.log.close()
+    path = _segment_path(data_dir, store.log.segment)
+    with open(path, "r+b") as segment:
+        segment.truncate(os.path.getsize(path) - 3)
+
+    restored = PersistentMemoryRepository(data_dir, snapshot_interval=0)
+    try:
+        assert [user["name"] for user in restored.list_users()[0]] == ["John"]
+        # Writes after the restart go to a fresh segment, not after the torn frame
+        restored.create_user("Ann", "ann@example.com")
+    finally:
+        restored.close()
+    restored = PersistentMemoryRepository(data_dir, snapshot_interval=0)
+    try:
+        assert [user["name"] for user in restored.list_users()[0]] == ["John", "Ann"]
+    finally:
+        restored.close()
+
+
+def test_reset_is_persisted(data_dir):
+    store = PersistentMemoryRepository(data_dir, snapshot_interval=0)
+    seed(store)
+    store.reset()
+    store.create_course("Go 101", "Intro to Go")
+
+    restored = reopen(store, data_dir)
+    try:
+        assert restored.list_users()[0] == []
+        assert [course["title"] for course in restored.list_courses()[0]] == ["Go 101"]
+    finally:
+        restored.close()
\ No newline at end of file
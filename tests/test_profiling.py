@@ -0,0 +1,102 @@
+import marshal
+import time
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from services.config import settings
+from services.profiling import profile_buffer, stack_sampler
+
+client = TestClient(app)
+TOKEN = "secret-token"
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", TOKEN)
+    profile_buffer.clear()
+    yield
+    profile_buffer.clear()
+
+
+def list_profiles():
+    response = client.get("/api/admin/profiles", headers={"X-Admin-Token": TOKEN})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_profile_endpoints_need_the_admin_token(monkeypatch):
+    assert client.get("/api/admin/profiles").status_code == 403
+    assert client.get("/api/admin/profiles", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    monkeypatch.setattr(settings, "admin_token", None)
+    assert client.get("/api/admin/profiles", headers={"X-Admin-Token": TOKEN}).status_code == 403
+
+
+def test_profile_header_captures_a_cprofile_report():
+    response = client.get("/api/courses/", headers={"X-Profile": "1", "X-Admin-Token": TOKEN})
+    assert response.status_code == 200
+
+    [profile] = list_profiles()
+    assert profile["method"] == "GET"
+    assert profile["path"] == "/api/courses/"
+    assert profile["status"] == 200
+    assert profile["trigger"] == "header"
+    assert profile["format"] == "pstats"
+
+    download = client.get(f"/api/admin/profiles/{profile['id']}", headers={"X-Admin-Token": TOKEN})
+    assert download.headers["content-type"] == "application/octet-stream"
+    functions = {name for _, _, name in marshal.loads(download.content)}
+    assert "get_all_courses" in functions
+
+    report = client.get(
+        f"/api/admin/profiles/{profile['id']}", params={"text": True}, headers={"X-Admin-Token": TOKEN}
+    )
+    assert "Ordered by: cumulative time" in report.text
+
+
+def test_profile_query_flag_needs_the_admin_token():
+    client.get("/api/courses/", params={"profile": "1"})
+    client.get("/api/courses/", headers={"X-Profile": "1"})
+    assert list_profiles() == []
+
+    client.get("/api/courses/", params={"profile": "1"}, headers={"X-Admin-Token": TOKEN})
+    assert [profile["trigger"] for profile in list_profiles()] == ["query"]
+
+
+def test_sample_rate_profiles_requests(monkeypatch):
+    monkeypatch.setattr(settings, "profile_sample_rate", 1.0)
+    client.get("/api/users/")
+    client.get("/api/courses/")
+
+    assert [profile["path"] for profile in list_profiles()] == ["/api/courses/", "/api/users/"]
+    assert {profile["trigger"] for profile in list_profiles()} == {"sample"}
+
+
+def test_slow_requests_keep_collapsed_stacks(monkeypatch):
+    monkeypatch.setattr(settings, "profile_slow_ms", 0.001)
+    client.get("/api/users/")
+
+    [profile] = list_profiles()
+    assert profile["trigger"] == "slow"
+    assert profile["format"] == "collapsed"
+    download = client.get(f"/api/admin/profiles/{profile['id']}", headers={"X-Admin-Token": TOKEN})
+    assert download.headers["content-type"].startswith("text/plain")
+
+
+def test_missing_profile_is_404():
+    assert client.get("/api/admin/profiles/12345", headers={"X-Admin-Token": TOKEN}).status_code == 404
+
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_stack_sampler_sees_busy_threads():
+    stack_sampler.ensure_started()
+    started = time.perf_counter()
+    busy_wait(0.1)
+
+    stacks = stack_sampler.collect(started, time.perf_counter())
+    assert any(stack.endswith("test_profiling:busy_wait") for stack in stacks)
\ No newline at end of file
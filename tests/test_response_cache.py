@@ -0,0 +1,154 @@
+from fastapi.testclient import TestClient
+from main import app
+from services.config import settings
+from services.response_cache import ResponseCache, etag_matches, response_cache
+
+client = TestClient(app)
+
+
+def create_user():
+    return client.post(
+        "/api/users/",
+        json={"name": "John", "email": "john@example.com"}
+    ).json()["id"]
+
+
+def create_course():
+    return client.post(
+        "/api/courses/",
+        json={"title": "Python 101", "description": "Learn Python"}
+    ).json()["id"]
+
+
+def test_get_user_is_cached_with_etag():
+    user_id = create_user()
+    before = response_cache.stats()
+
+    first = client.get(f"/api/users/{user_id}")
+    second = client.get(f"/api/users/{user_id}")
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    assert first.json() == {
+        "id": user_id, "name": "John", "email": "john@example.com", "is_active": True,
+        "version": first.json()["version"],
+    }
+    assert first.headers["ETag"] == second.headers["ETag"]
+    after = response_cache.stats()
+    assert after["misses"] == before["misses"] + 1
+    assert after["hits"] == before["hits"] + 1
+
+
+def test_if_none_match_returns_304_without_body():
+    user_id = create_user()
+    etag = client.get(f"/api/users/{user_id}").headers["ETag"]
+
+    response = client.get(f"/api/users/{user_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    stale = client.get(f"/api/users/{user_id}", headers={"If-None-Match": '"other"'})
+    assert stale.status_code == 200
+
+
+def test_user_writes_invalidate_cache():
+    user_id = create_user()
+    etag = client.get(f"/api/users/{user_id}").headers["ETag"]
+
+    client.put(f"/api/users/{user_id}", json={"name": "Johnny"})
+    updated = client.get(f"/api/users/{user_id}", headers={"If-None-Match": etag})
+    assert updated.status_code == 200
+    assert updated.json()["name"] == "Johnny"
+
+    client.patch(f"/api/users/{user_id}/deactivate")
+    assert client.get(f"/api/users/{user_id}").json()["is_active"] is False
+
+    client.delete(f"/api/users/{user_id}")
+    assert client.get(f"/api/users/{user_id}").status_code == 404
+
+
+def test_course_and_enrollment_writes_invalidate_cache():
+    user_id = create_user()
+    course_id = create_course()
+    enrollment_id = client.post(
+        "/api/enrollments/",
+        json={"user_id": user_id, "course_id": course_id}
+    ).json()["id"]
+    assert client.get(f"/api/courses/{course_id}").json()["is_open"] is True
+    assert client.get(f"/api/enrollments/{enrollment_id}").json()["completed"] is False
+
+    client.patch(f"/api/courses/{course_id}/close")
+    client.patch(f"/api/enrollments/{enrollment_id}/complete")
+    assert client.get(f"/api/courses/{course_id}").json()["is_open"] is False
+    assert client.get(f"/api/enrollments/{enrollment_id}").json()["completed"] is True
+
+    client.put(f"/api/courses/{course_id}", json={"title": "Python 102"})
+    assert client.get(f"/api/courses/{course_id}").json()["title"] == "Python 102"
+
+    client.delete(f"/api/enrollments/{enrollment_id}")
+    client.delete(f"/api/courses/{course_id}")
+    assert client.get(f"/api/enrollments/{enrollment_id}").status_code == 404
+    assert client.get(f"/api/courses/{course_id}").status_code == 404
+
+
+def test_cache_stats_endpoint(monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "secret-token")
+    assert client.get("/api/admin/cache").status_code == 403
+
+    response = client.get("/api/admin/cache", headers={"X-Admin-Token": "secret-token"})
+    assert response.status_code == 200
+    assert set(response.json()) == {
+        "entries", "max_entries", "hits", "misses", "hit_rate", "evictions", "invalidations"
+    }
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    for record_id in (1, 2):
+        _, token = cache.lookup("user", record_id)
+        cache.fill("user", record_id, 1, b"%d" % record_id, token)
+    cache.lookup("user", 1)
+    _, token = cache.lookup("user", 3)
+    cache.fill("user", 3, 1, b"3", token)
+
+    assert cache.lookup("user", 1)[0].body == b"1"
+    assert cache.lookup("user", 2)[0] is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_fill_after_invalidation_is_dropped():
+    cache = ResponseCache()
+    _, token = cache.lookup("user", 1)
+    cache.invalidate("user", 1)
+    cache.fill("user", 1, 1, b"stale", token)
+    assert cache.lookup("user", 1)[0] is None
+
+
+def test_entries_are_keyed_by_version():
+    cache = ResponseCache()
+    _, token = cache.lookup("user", 1)
+    cache.fill("user", 1, 5, b"v5", token)
+
+    assert cache.lookup("user", 1)[0].body == b"v5"
+    assert cache.lookup("user", 1, version=5)[0].body == b"v5"
+    # A lookup that knows of a newer version is never served the older body
+    entry, token = cache.lookup("user", 1, version=6)
+    assert entry is None
+    cache.fill("user", 1, 6, b"v6", token)
+    # and a slow reader's older body does not replace the newer one
+    cache.fill("user", 1, 5, b"v5", token)
+    assert cache.lookup("user", 1)[0].body == b"v6"
+    assert cache.stats()["entries"] == 1
+
+
+def test_etag_matching():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"x", "abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert etag_matches('"abc-gzip"', '"abc"')
+    assert etag_matches('W/"abc-br"', '"abc"')
+    assert not etag_matches('"abc-deflate"', '"abc"')
+    assert not etag_matches('"x"', '"abc"')
+    assert not etag_matches(None, '"abc"')
\ No newline at end of file
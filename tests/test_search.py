@@ -0,0 +1,113 @@
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from services import text_search
+from services.text_search import CourseSearchIndex
+
+client = TestClient(app)
+
+
+def create_course(title, description):
+    return client.post("/api/courses/", json={"title": title, "description": description}).json()["id"]
+
+
+def search(q, **params):
+    response = client.get("/api/courses/search", params={"q": q, **params})
+    assert response.status_code == 200
+    return [course["id"] for course in response.json()]
+
+
+def test_title_matches_rank_above_description_matches():
+    in_description = create_course("Data Analysis", "Uses python for every exercise")
+    in_title = create_course("Python Basics", "A first programming course")
+    create_course("Statistics", "Probability and inference")
+
+    assert search("python") == [in_title, in_description]
+
+
+def test_last_word_matches_as_prefix():
+    python_id = create_course("Python Basics", "Intro")
+    pytorch_id = create_course("PyTorch", "Deep learning")
+    create_course("Ruby", "Intro")
+
+    assert search("pyth") == [python_id]
+    assert sorted(search("py")) == sorted([python_id, pytorch_id])
+    assert search("basics py") == [python_id]
+    # Only the last word is a prefix
+    assert search("pyth basics") == []
+
+
+def test_every_word_must_match():
+    both = create_course("Python Web", "Build web apps")
+    create_course("Python Data", "Work with data frames")
+
+    assert search("python web") == [both]
+    assert search("python cobol") == []
+
+
+def test_matching_ignores_case_and_accents():
+    course_id = create_course("Café Économie", "Introduction")
+
+    assert search("CAFE") == [course_id]
+    assert search("économie") == [course_id]
+
+
+def test_index_follows_course_updates_and_deletes():
+    course_id = create_course("Python Basics", "Intro")
+    assert search("python") == [course_id]
+
+    client.put(f"/api/courses/{course_id}", json={"title": "Rust Basics"})
+    assert search("python") == []
+    assert search("rust") == [course_id]
+
+    client.delete(f"/api/courses/{course_id}")
+    assert search("rust") == []
+    new_id = create_course("Rust Advanced", "Ownership")
+    assert search("rust") == [new_id]
+
+
+def test_limit_and_validation():
+    ids = [create_course(f"Python {i}", "Intro") for i in range(5)]
+
+    assert search("python", limit=2) == ids[:2]
+    assert search("!!!") == []
+    assert client.get("/api/courses/search").status_code == 422
+    assert client.get("/api/courses/search", params={"q": "python", "limit": 0}).status_code == 422
+
+
+@pytest.mark.parametrize("impact_map_min_postings, lookup_cost_ratio", [(1000, 16), (0, 16), (1000, 0)])
+def test_index_search_matches_exhaustive_ranking(monkeypatch, impact_map_min_postings, lookup_cost_ratio):
+    monkeypatch.setattr(text_search, "IMPACT_MAP_MIN_POSTINGS", impact_map_min_postings)
+    monkeypatch.setattr(text_search, "LOOKUP_COST_RATIO", lookup_cost_ratio)
+    words = ["alpha", "beta", "gamma", "delta", "delay", "epsilon"]
+    courses = {
+        course_id: {
+            "id": course_id,
+            "title": f"{words[course_id % 6]} {words[course_id % 4]}",
+            "description": " ".join(words[(course_id * 7 + offset) % 6] for offset in range(course_id % 9)),
+        }
+        for course_id in range(1, 300)
+    }
+    index = CourseSearchIndex()
+    index.build(list(courses.values())[:150])
+    for course in list(courses.values())[150:]:
+        index.add(course["id"], course["title"], course["description"])
+    for course_id in (3, 10, 200):
+        course = courses.pop(course_id)
+        index.remove(course_id, course["title"], course["description"])
+
+    for query in ("alpha", "gamma beta", "beta del", "epsilon alpha d"):
+        exact, prefix = text_search.parse_query(query)
+        groups = [[token] for token in exact] + [index._expand(prefix)]
+        expected = []
+        for course_id, course in courses.items():
+            impacts = text_search.term_impacts(course["title"], course["description"])
+            group_scores = [max((index._idf(token) * impacts.get(token, 0) for token in tokens)) for tokens in groups]
+            if all(group_scores):
+                expected.append((sum(group_scores) / text_search.MAX_IMPACT, course_id))
+        expected.sort(key=lambda entry: (-entry[0], entry[1]))
+
+        found = index.search(query, 15, courses.get)
+
+        assert [score for score, _ in found] == pytest.approx([score for score, _ in expected[:15]])
+        assert {course["id"] for _, course in found} <= {course_id for _, course_id in expected}
\ No newline at end of file
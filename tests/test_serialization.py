@@ -0,0 +1,77 @@
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from main import app
+from schemas import Course, User
+from services.config import settings
+from services.database import get_store
+
+client = TestClient(app)
+
+
+def seed():
+    names = ["Zoë Ångström", 'Quote "Marks" \\ Backslash', "Tab\tand\nnewline", "李雷"]
+    user_ids = [
+        client.post(
+            "/api/users/",
+            json={"name": name, "email": f"user{index}@example.com"}
+        ).json()["id"]
+        for index, name in enumerate(names)
+    ]
+    course_id = client.post(
+        "/api/courses/",
+        json={"title": "Café ☕ 101", "description": "Émigré </script> notes"}
+    ).json()["id"]
+    for user_id in user_ids:
+        enrollment_id = client.post(
+            "/api/enrollments/",
+            json={"user_id": user_id, "course_id": course_id}
+        ).json()["id"]
+    client.patch(f"/api/enrollments/{enrollment_id}/complete")
+    client.patch(f"/api/users/{user_ids[0]}/deactivate")
+    client.patch(f"/api/courses/{course_id}/close")
+    return user_ids[0], course_id
+
+
+@pytest.mark.parametrize("path", [
+    "/api/users/",
+    "/api/users/?limit=2",
+    "/api/users/?is_active=false",
+    "/api/courses/",
+    "/api/enrollments/",
+    "/api/enrollments/?completed=true",
+    "/api/enrollments/user/{user_id}",
+    "/api/courses/{course_id}/enrollments",
+    "/api/enrollments/?expand=user,course",
+    "/api/enrollments/user/{user_id}?expand=course",
+    "/api/courses/{course_id}/enrollments?expand=enrollment",
+    "/api/users/?updated_since=0",
+    "/api/courses/?updated_since=1&limit=1",
+    "/api/enrollments/?updated_since=1",
+    "/api/enrollments/user/{user_id}?updated_since=0",
+    "/api/courses/{course_id}/enrollments?updated_since=0",
+])
+def test_fast_serialization_matches_model_output(path, monkeypatch):
+    user_id, course_id = seed()
+    path = path.format(user_id=user_id, course_id=course_id)
+
+    monkeypatch.setattr(settings, "fast_serialization", False)
+    expected = client.get(path)
+    monkeypatch.setattr(settings, "fast_serialization", True)
+    actual = client.get(path)
+
+    assert actual.status_code == expected.status_code == 200
+    assert actual.content == expected.content
+    assert actual.headers["content-type"] == expected.headers["content-type"]
+    assert actual.headers.get("X-Next-Cursor") == expected.headers.get("X-Next-Cursor")
+
+def test_cached_record_matches_model_output():
+    user_id, course_id = seed()
+    store = get_store()
+    for path, model, record in [
+        (f"/api/users/{user_id}", User, store.get_user(user_id)),
+        (f"/api/courses/{course_id}", Course, store.get_course(course_id)),
+    ]:
+        expected = JSONResponse(jsonable_encoder(model.model_validate(record, from_attributes=True))).body
+        assert client.get(path).content == expected
\ No newline at end of file
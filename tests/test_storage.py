@@ -0,0 +1,131 @@
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import pytest
+from services.config import Settings
+from services.database import create_store, init_sample_data
+from services.memory_store import MAX_ID
+from services.repository import AlreadyEnrolledError, DuplicateEmailError, IdRangeError, ParentNotFoundError
+
+
+def test_store_enforces_unique_email(store):
+    user = store.create_user("John", "john@example.com")
+    other = store.create_user("Jane", "jane@example.com")
+
+    with pytest.raises(DuplicateEmailError):
+        store.create_user("Johnny", "John@Example.com")
+    with pytest.raises(DuplicateEmailError):
+        store.update_user(other["id"], {"email": "JOHN@example.com"})
+
+    assert store.find_user_by_email("JOHN@EXAMPLE.COM")["id"] == user["id"]
+
+
+def test_store_enforces_unique_enrollment(store):
+    user = store.create_user("John", "john@example.com")
+    course = store.create_course("Python 101", "Intro to Python")
+    store.create_enrollment(user["id"], course["id"], date(2025, 9, 1))
+
+    with pytest.raises(AlreadyEnrolledError):
+        store.create_enrollment(user["id"], course["id"], date(2025, 9, 2))
+
+
+def test_store_refuses_enrollment_without_user_or_course(store):
+    user = store.create_user("John", "john@example.com")
+    course = store.create_course("Python 101", "Intro to Python")
+
+    with pytest.raises(ParentNotFoundError) as excinfo:
+        store.create_enrollment(user["id"], 999, date(2025, 9, 1))
+    assert excinfo.value.missing == "course"
+    with pytest.raises(ParentNotFoundError) as excinfo:
+        store.create_enrollment(999, course["id"], date(2025, 9, 1))
+    assert excinfo.value.missing == "user"
+    assert store.create_enrollments([(999, course["id"]), (user["id"], course["id"])], date(2025, 9, 1))[0] is None
+    with pytest.raises(ParentNotFoundError):
+        store.create_enrollments([(user["id"], 999)], date(2025, 9, 1), atomic=True)
+    assert len(store.get_enrollments_for_course(course["id"])) == 1
+
+
+def test_enrollments_of_one_course_page_in_id_order(store):
+    course = store.create_course("Python 101", "Intro to Python")
+    other = store.create_course("Rust 101", "Intro to Rust")
+    users = [store.create_user(f"User {i}", f"user{i}@example.com") for i in range(7)]
+    ids = []
+    for user in users:
+        ids.append(store.create_enrollment(user["id"], course["id"], date(2025, 9, 1))["id"])
+        store.create_enrollment(user["id"], other["id"], date(2025, 9, 1))
+    store.delete_enrollment(ids.pop(3))
+
+    pages, after_id = [], 0
+    while after_id is not None:
+        page, after_id = store.list_enrollments(after_id, 2, course_id=course["id"])
+        pages.append([enrollment["id"] for enrollment in page])
+
+    assert pages == [ids[0:2], ids[2:4], ids[4:6]]
+    page, _ = store.list_enrollments(ids[2], 10, user_id=users[4]["id"])
+    assert [enrollment["course_id"] for enrollment in page] == [course["id"], other["id"]]
+
+
+def test_memory_store_keeps_ids_in_its_32_bit_space(store):
+    if store.__class__.__name__ == "SQLiteRepository":
+        pytest.skip("only the memory engine packs IDs into 32 bits")
+    user = store.create_user("John", "john@example.com")
+    course = store.create_course("Python 101", "Intro to Python")
+    enrollment = store.create_enrollment(user["id"], course["id"], date(2025, 9, 1))
+
+    # An out-of-range course ID must not alias the next user's pair
+    assert store.find_enrollment(user["id"] - 1, course["id"] + 2 ** 32) is None
+    assert store.find_enrollment(user["id"], course["id"])["id"] == enrollment["id"]
+    store.course_id_sequence = itertools.count(MAX_ID + 1)
+    with pytest.raises(IdRangeError):
+        store.create_course("Rust 101", "Intro to Rust")
+    with pytest.raises(IdRangeError):
+        store.restore_user(MAX_ID + 1, "Jane", "jane@example.com", True)
+    assert store.get_user(MAX_ID + 1) is None
+
+
+def test_sqlite_store_survives_reopen(store, tmp_path):
+    if store.__class__.__name__ != "SQLiteRepository":
+        pytest.skip("only the SQLite engine is durable")
+    user = store.create_user("John", "john@example.com")
+    course = store.create_course("Python 101", "Intro to Python")
+    enrollment = store.create_enrollment(user["id"], course["id"], date(2025, 9, 1))
+
+    reopened = create_store(Settings(storage="sqlite", sqlite_path=store.path))
+    try:
+        assert reopened.get_user(user["id"]) == user
+        assert reopened.get_course(course["id"]) == course
+        assert reopened.get_enrollment(enrollment["id"]) == enrollment
+    finally:
+        reopened.close()
+
+
+def test_multiple_workers_need_sqlite():
+    with pytest.raises(ValueError):
+        Settings(storage="memory", workers=2)
+    assert Settings(storage="sqlite", workers=2).workers == 2
+
+
+def test_sqlite_stores_share_ids_and_constraints(store):
+    if store.__class__.__name__ != "SQLiteRepository":
+        pytest.skip("only the SQLite engine can be shared by several workers")
+    workers = [create_store(Settings(storage="sqlite", sqlite_path=store.path)) for _ in range(4)]
+    try:
+        def create(index):
+            worker = workers[index % len(workers)]
+            try:
+                # Every email is created twice, by different workers
+                return worker.create_user(f"User {index}", f"user{index // 2}@example.com")["id"]
+            except DuplicateEmailError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            ids = [user_id for user_id in pool.map(create, range(200)) if user_id is not None]
+
+        assert len(ids) == len(set(ids)) == 100
+        for worker in workers:
+            init_sample_data(worker)
+        assert store.find_user_by_email("alice@example.com") is not None
+        assert len(store.list_courses(limit=10)[0]) == 1
+    finally:
+        for worker in workers:
+            worker.close()
\ No newline at end of file
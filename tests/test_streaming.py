@@ -0,0 +1,97 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from services import pagination
+from services.pagination import encode_cursor
+
+client = TestClient(app)
+
+NDJSON = {"Accept": "application/x-ndjson"}
+
+
+@pytest.fixture(autouse=True)
+def small_pages(monkeypatch):
+    # Several store pages per stream, even with a handful of records
+    monkeypatch.setattr(pagination, "STREAM_PAGE_SIZE", 2)
+
+
+def create_users(count):
+    return [
+        client.post("/api/users/", json={"name": f"User {index}", "email": f"user{index}@example.com"}).json()
+        for index in range(count)
+    ]
+
+
+def test_stream_matches_the_paged_list():
+    create_users(5)
+    paged = client.get("/api/users/?limit=1000")
+    streamed = client.get("/api/users/?stream=true")
+
+    assert streamed.status_code == 200
+    assert streamed.headers["content-type"] == "application/json"
+    assert streamed.content == paged.content
+    assert "X-Next-Cursor" not in streamed.headers
+
+
+def test_ndjson_is_chosen_by_accept_header():
+    users = create_users(5)
+    response = client.get("/api/users/", headers=NDJSON)
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    assert [json.loads(line) for line in lines] == client.get("/api/users/").json()
+    assert [json.loads(line)["id"] for line in lines] == [user["id"] for user in users]
+
+
+def test_json_is_preferred_when_rated_higher():
+    create_users(1)
+    response = client.get("/api/users/", headers={"Accept": "application/x-ndjson;q=0.5, application/json"})
+
+    assert response.headers["content-type"] == "application/json"
+
+
+def test_equally_rated_formats_follow_the_client_order():
+    create_users(1)
+    response = client.get("/api/users/", headers={"Accept": "application/x-ndjson, application/json"})
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+
+def test_stream_starts_at_cursor_and_keeps_filters():
+    users = create_users(5)
+    client.patch(f"/api/users/{users[3]['id']}/deactivate")
+
+    response = client.get(
+        "/api/users/",
+        params={"cursor": encode_cursor(users[0]["id"]), "is_active": True},
+        headers=NDJSON,
+    )
+
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [
+        users[1]["id"], users[2]["id"], users[4]["id"]
+    ]
+
+
+def test_enrollment_stream_embeds_related_records():
+    users = create_users(3)
+    course = client.post("/api/courses/", json={"title": "Python 101", "description": "Learn Python"}).json()
+    for user in users:
+        client.post("/api/enrollments/", json={"user_id": user["id"], "course_id": course["id"]})
+
+    streamed = client.get("/api/enrollments/?expand=user,course&stream=true")
+
+    assert streamed.content == client.get("/api/enrollments/?expand=user,course").content
+    assert [item["user"]["id"] for item in streamed.json()] == [user["id"] for user in users]
+
+
+def test_empty_streams():
+    assert client.get("/api/courses/?stream=true").content == b"[]"
+    assert client.get("/api/courses/", headers=NDJSON).content == b""
+
+
+def test_stream_cannot_be_combined_with_updated_since():
+    response = client.get("/api/users/?stream=true&updated_since=0")
+
+    assert response.status_code == 400
+    assert "stream" in response.json()["detail"]
\ No newline at end of file
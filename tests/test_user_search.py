@@ -0,0 +1,92 @@
+from fastapi.testclient import TestClient
+from main import app
+from services.user_search import domain_key, name_keys
+
+client = TestClient(app)
+
+
+def create_user(name, email):
+    return client.post("/api/users/", json={"name": name, "email": email}).json()["id"]
+
+
+def search(**params):
+    response = client.get("/api/users/search", params=params)
+    assert response.status_code == 200
+    return [user["id"] for user in response.json()]
+
+
+def test_keys():
+    assert name_keys("Alice  Johnson-Smith") == ["alice johnson smith", "johnson smith", "smith"]
+    assert domain_key("Ann@CS.School.edu") == "edu.school.cs.@ann"
+
+
+def test_name_prefix_matches_from_any_word():
+    alice = create_user("Alice Johnson", "alice@example.com")
+    john = create_user("John Alison", "john@example.com")
+    create_user("Bob Stone", "bob@example.com")
+
+    # Ordered by the matching key: "alice johnson" before "alison"
+    assert search(name="ali") == [alice, john]
+    assert search(name="jo") == [john, alice]
+    assert search(name="alice jo") == [alice]
+    assert search(name="ALICE") == [alice]
+    assert search(name="stone b") == []
+
+
+def test_name_matching_several_words_is_listed_once():
+    ann = create_user("Ann Annabel", "ann@example.com")
+
+    assert search(name="ann") == [ann]
+
+
+def test_domain_matches_subdomains_only():
+    school = create_user("Ann", "ann@school.edu")
+    department = create_user("Ben", "ben@cs.school.edu")
+    create_user("Cat", "cat@myschool.edu")
+    create_user("Dan", "dan@school.edu.example.com")
+
+    assert search(domain="school.edu") == [school, department]
+    assert search(domain="@School.edu") == [school, department]
+    assert search(domain="cs.school.edu") == [department]
+
+
+def test_name_and_domain_together():
+    create_user("Alice Brown", "alice@other.org")
+    wanted = create_user("Alice Green", "alice.green@school.edu")
+
+    assert search(name="alice", domain="school.edu") == [wanted]
+
+
+def test_index_follows_updates_and_deletes():
+    user_id = create_user("Alice Brown", "alice@school.edu")
+
+    client.put(f"/api/users/{user_id}", json={"name": "Carol Brown", "email": "carol@other.org"})
+    assert search(name="alice") == []
+    assert search(domain="school.edu") == []
+    assert search(name="carol", domain="other.org") == [user_id]
+
+    client.delete(f"/api/users/{user_id}")
+    assert search(name="carol") == []
+
+
+def test_pages_follow_the_cursor():
+    ids = [create_user(f"Pat {letter}", f"pat{letter}@school.edu") for letter in "edcba"]
+
+    seen, cursor = [], None
+    while True:
+        params = {"name": "pat", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/users/search", params=params)
+        seen.extend(user["id"] for user in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert seen == ids[::-1]
+
+
+def test_validation():
+    assert client.get("/api/users/search").status_code == 400
+    assert client.get("/api/users/search", params={"name": "a", "cursor": "bad"}).status_code == 400
+    assert search(name="!!!") == []
\ No newline at end of file